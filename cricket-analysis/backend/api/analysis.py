@@ -2,6 +2,11 @@
 
 from flask import Blueprint, request, jsonify
 from models import db
+from responses import immutable, finished_innings, finished_match
+from services.analytics_engine import chart_series, rebuild_over_summary
+from services.partnership_engine import get_partnerships, best_partnerships, rebuild_partnerships
+from services import leaderboards, match_state, matchup_matrix, player_directory, rollup_cube
+from api import player_table
 
 analysis_bp = Blueprint('analysis', __name__)
 
@@ -22,25 +27,24 @@ def pitch_map_data():
         conditions.append("d.batsman_id = ?")
         params.append(data['batsman_id'])
     if data.get('batting_style'):
-        conditions.append("bp.batting_style = ?")
+        conditions.append("d.batsman_id IN (SELECT id FROM players WHERE batting_style = ?)")
         params.append(data['batting_style'])
     
     where = " AND ".join(conditions)
     
-    deliveries = db.fetch_all(f"""
+    deliveries = db.fetch_scoped(f"""
         SELECT d.pitch_x, d.pitch_y, d.line, d.length, d.delivery_type,
                d.runs_scored, d.runs_off_bat, d.is_wicket, d.is_boundary, d.is_six,
                d.is_dot, d.bowling_type, d.movement, d.pace,
-               d.over_number, d.ball_number,
-               bp.batting_style,
+               d.over_number, d.ball_number, d.batsman_id,
                d.video_timestamp_start
         FROM deliveries d
-        LEFT JOIN players bp ON d.batsman_id = bp.id
         WHERE {where}
         ORDER BY d.over_number, d.ball_number
-    """, params)
+    """, params, innings_id=data.get('innings_id'),
+        sort_key=lambda d: (d['over_number'], d['ball_number']))
     
-    return jsonify(deliveries)
+    return player_table.respond(deliveries, (), 'deliveries', batting_style=True)
 
 @analysis_bp.route('/wagon_wheel', methods=['POST'])
 def wagon_wheel_data():
@@ -67,57 +71,209 @@ def wagon_wheel_data():
     
     where = " AND ".join(conditions)
     
-    deliveries = db.fetch_all(f"""
+    deliveries = db.fetch_scoped(f"""
         SELECT d.wagon_x, d.wagon_y, d.wagon_zone,
                d.runs_off_bat, d.runs_scored, d.is_boundary, d.is_six,
                d.shot_type, d.shot_connection,
-               d.over_number, d.ball_number,
-               bp.first_name || ' ' || bp.last_name as batsman_name,
+               d.over_number, d.ball_number, d.batsman_id,
                d.video_timestamp_start
         FROM deliveries d
-        LEFT JOIN players bp ON d.batsman_id = bp.id
         WHERE {where}
         ORDER BY d.over_number, d.ball_number
-    """, params)
+    """, params, innings_id=data.get('innings_id'),
+        sort_key=lambda d: (d['over_number'], d['ball_number']))
     
-    return jsonify(deliveries)
+    return player_table.respond(deliveries, ('batsman_id',), 'deliveries')
 
 @analysis_bp.route('/over_by_over/<int:innings_id>', methods=['GET'])
+@immutable(finished_innings)
 def over_by_over(innings_id):
     """Over-by-over run progression"""
     overs = db.fetch_all("""
         SELECT 
             over_number,
-            SUM(runs_scored) as runs_in_over,
-            COUNT(CASE WHEN is_wicket = 1 THEN 1 END) as wickets_in_over,
-            COUNT(CASE WHEN is_dot = 1 THEN 1 END) as dots_in_over,
-            COUNT(CASE WHEN is_boundary = 1 THEN 1 END) as fours_in_over,
-            COUNT(CASE WHEN is_six = 1 THEN 1 END) as sixes_in_over,
-            COUNT(CASE WHEN extra_type IN ('None', 'Bye', 'Leg Bye') THEN 1 END) as legal_balls
-        FROM deliveries
+            runs as runs_in_over,
+            wickets as wickets_in_over,
+            dots as dots_in_over,
+            fours as fours_in_over,
+            sixes as sixes_in_over,
+            legal_balls,
+            SUM(runs) OVER w as cumulative_runs,
+            SUM(wickets) OVER w as cumulative_wickets,
+            ROUND(SUM(runs) OVER w * 1.0 / (over_number + 1), 2) as run_rate
+        FROM over_summary
         WHERE innings_id = ?
-        GROUP BY over_number
+        WINDOW w AS (ORDER BY over_number)
         ORDER BY over_number
     """, (innings_id,))
     
-    # Calculate cumulative
-    cumulative = 0
-    cumulative_wickets = 0
-    for over in overs:
-        cumulative += over['runs_in_over']
-        cumulative_wickets += over['wickets_in_over']
-        over['cumulative_runs'] = cumulative
-        over['cumulative_wickets'] = cumulative_wickets
-        over['run_rate'] = round(cumulative / (over['over_number'] + 1), 2)
-    
     return jsonify(overs)
 
+@analysis_bp.route('/over_summary/<int:match_id>', methods=['GET'])
+@immutable(finished_match)
+def match_over_summary(match_id):
+    """Manhattan, worm and run-rate series for both innings of a match"""
+    return jsonify(chart_series([match_id])[0])
+
+@analysis_bp.route('/over_summary/compare', methods=['POST'])
+def compare_over_summary():
+    """Manhattan, worm and run-rate series for many matches in one query"""
+    match_ids = (request.json or {}).get('match_ids')
+    if not match_ids or not isinstance(match_ids, list):
+        return jsonify({'error': 'match_ids required'}), 400
+    try:
+        match_ids = [int(m) for m in match_ids]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'match_ids must be integers'}), 400
+    return jsonify(chart_series(match_ids))
+
+@analysis_bp.route('/over_summary/rebuild', methods=['POST'])
+def rebuild_over_summary_data():
+    """Backfill the over summary table from deliveries"""
+    innings_id = (request.json or {}).get('innings_id')
+    rebuild_over_summary(innings_id)
+    return jsonify({'message': 'Over summary rebuilt'})
+
+@analysis_bp.route('/partnerships/<int:innings_id>', methods=['GET'])
+@immutable(finished_innings)
+def innings_partnerships(innings_id):
+    """Every partnership of an innings, with each batter's contribution"""
+    partnerships = [dict(p) for p in get_partnerships(innings_id)]
+    
+    names = player_directory.names(p[k] for p in partnerships for k in ('batter1_id', 'batter2_id'))
+    for p in partnerships:
+        p['batter1_name'] = names.get(p['batter1_id'])
+        p['batter2_name'] = names.get(p['batter2_id'])
+    
+    return jsonify(partnerships)
+
+@analysis_bp.route('/partnerships/best', methods=['GET'])
+def partnership_leaderboard():
+    """Highest partnerships across all innings"""
+    return jsonify(best_partnerships(
+        limit=request.args.get('limit', 10, type=int),
+        wicket_number=request.args.get('wicket', type=int),
+        match_format=request.args.get('format')
+    ))
+
+@analysis_bp.route('/partnerships/rebuild', methods=['POST'])
+def rebuild_partnership_data():
+    """Recompute partnerships for the whole archive"""
+    return jsonify(rebuild_partnerships())
+
+@analysis_bp.route('/state/<int:innings_id>', methods=['GET'])
+@immutable(finished_innings)
+def innings_state_series(innings_id):
+    """Match state after every ball of an innings, as rows of `fields` in ball order"""
+    entry = match_state.get_states(innings_id)
+    if entry is None:
+        return jsonify({'error': 'Innings not found'}), 404
+    version, target, max_balls, states = entry
+    return jsonify({
+        'innings_id': innings_id,
+        'innings_version': version,
+        'target': target,
+        'max_balls': max_balls,
+        'fields': match_state.BallState._fields,
+        'states': states,
+    })
+
+@analysis_bp.route('/state/<int:innings_id>/ball', methods=['GET'])
+def innings_state_at(innings_id):
+    """Match state after one ball: ?delivery_id=, or ?over= (0-based) with optional &ball="""
+    delivery_id = request.args.get('delivery_id', type=int)
+    over_number = request.args.get('over', type=int)
+    if delivery_id is None and over_number is None:
+        return jsonify({'error': 'delivery_id or over is required'}), 400
+    state = match_state.state_at(
+        innings_id, delivery_id=delivery_id, over_number=over_number,
+        ball_number=request.args.get('ball', type=int)
+    )
+    if state is None:
+        return jsonify({'error': 'Ball not found'}), 404
+    return jsonify(state._asdict())
+
+@analysis_bp.route('/win_probability/<int:innings_id>', methods=['GET'])
+def live_prediction(innings_id):
+    """Projected score and win probability for the current state of an innings"""
+    from services import win_probability  # numpy-backed; loaded on first use
+    prediction = win_probability.latest_prediction(innings_id)
+    if prediction is None:
+        return jsonify({'error': 'Win probability model not built'}), 404
+    return jsonify(prediction)
+
+@analysis_bp.route('/matchups/grid', methods=['POST'])
+def matchup_grid():
+    """Batter x bowler matrix for two squads (player ids or team ids)"""
+    data = request.json
+    batsman_ids = data.get('batsman_ids') or matchup_matrix.squad(data.get('batting_team_id'))
+    bowler_ids = data.get('bowler_ids') or matchup_matrix.squad(data.get('bowling_team_id'))
+    return jsonify(matchup_matrix.batter_bowler_grid(batsman_ids, bowler_ids))
+
+@analysis_bp.route('/matchups/bowling_types', methods=['POST'])
+def matchup_bowling_types():
+    """Batsmen against each bowling type"""
+    data = request.json
+    batsman_ids = data.get('batsman_ids') or matchup_matrix.squad(data.get('batting_team_id'))
+    return jsonify(matchup_matrix.batter_bowling_type_grid(batsman_ids, data.get('bowling_types')))
+
+@analysis_bp.route('/matchups/rebuild', methods=['POST'])
+def rebuild_matchup_data():
+    """Recompute the matchup tables from all deliveries"""
+    matchup_matrix.rebuild_matchups()
+    return jsonify({'message': 'Matchups rebuilt'})
+
+@analysis_bp.route('/cube', methods=['POST'])
+def cube_slice():
+    """Slice and dice the finished-match rollups.
+
+    {"group_by": ["season"], "filters": {"venue": "Wankhede", "phase": "Powerplay", "innings_number": 1}}
+    Dimensions: venue, season, match_format, batting_team_id, phase, innings_number.
+    """
+    data = request.json or {}
+    try:
+        cells = rollup_cube.slice_cube(data.get('group_by') or [], data.get('filters'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(cells)
+
+@analysis_bp.route('/cube/refresh', methods=['POST'])
+def refresh_cube():
+    """Reduce finished matches that are missing from the rollups or were corrected since"""
+    if (request.get_json(silent=True) or {}).get('rebuild'):
+        return jsonify(rollup_cube.rebuild_cube())
+    return jsonify({'matches': rollup_cube.refresh()})
+
+@analysis_bp.route('/leaderboards/<metric>', methods=['GET'])
+def get_leaderboard(metric):
+    """Top players of a season / format by one metric.
+
+    ?season=2024&format=T20&limit=10&min_balls=60 (season and format default
+    to all of them; min_balls qualifies the strike_rate and economy tables).
+    Metrics: runs, sixes, strike_rate, wickets, economy.
+    """
+    try:
+        board = leaderboards.leaderboard(
+            metric, request.args.get('season'), request.args.get('format'),
+            request.args.get('limit'), request.args.get('min_balls')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(board)
+
+@analysis_bp.route('/leaderboards/rebuild', methods=['POST'])
+def rebuild_leaderboards():
+    """Recompute the leaderboard totals from all deliveries"""
+    return jsonify({'rows': leaderboards.rebuild_leaderboards()})
+
 @analysis_bp.route('/batsman_analysis/<int:innings_id>/<int:batsman_id>')
 def batsman_analysis(innings_id, batsman_id):
     """Comprehensive batsman analysis"""
     
+    source = db.for_innings(innings_id)
+    
     # Scoring zones
-    zones = db.fetch_all("""
+    zones = source.fetch_all("""
         SELECT wagon_zone,
                SUM(runs_off_bat) as runs,
                COUNT(*) as balls,
@@ -132,7 +288,7 @@ def batsman_analysis(innings_id, batsman_id):
     return jsonify({"zones": zones})
     
     # Against different bowling types
-    vs_bowling = db.fetch_all("""
+    vs_bowling = source.fetch_all("""
         SELECT bowling_type,
                COUNT(*) as balls,
                SUM(runs_off_bat) as runs,
@@ -146,7 +302,7 @@ def batsman_analysis(innings_id, batsman_id):
     
     # Phase-wise
 # Phase analysis (Powerplay, Middle, Death)
-    phase_stats = db.fetch_all("""
+    phase_stats = source.fetch_all("""
         SELECT phase,
                COUNT(*) as balls,
                SUM(runs_off_bat) as runs,
@@ -0,0 +1,34 @@
+# backend/api/bulk_input.py
+#
+# Bodies of the bulk upsert endpoints (services/roster_import.py): a JSON
+# array, a JSON object holding the array under a key, or CSV with a header
+# row sent as text/csv. Empty CSV cells are left out, so they leave the
+# stored value alone instead of clearing it.
+
+import csv
+import io
+
+from flask import request, jsonify
+
+from services.roster_import import RosterError
+
+CSV_TYPES = ('text/csv', 'application/csv')
+
+
+def rows(key):
+    """The list of row dicts in the request, or None if there is none"""
+    if request.mimetype in CSV_TYPES:
+        reader = csv.DictReader(io.StringIO(request.get_data(as_text=True)))
+        return [{k.strip(): v for k, v in row.items() if k and v not in (None, '')} for row in reader]
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get(key)
+    return data if isinstance(data, list) else None
+
+
+def upsert(fn, *args):
+    """jsonify fn(*args); rejected rows come back as a 400 listing each of them"""
+    try:
+        return jsonify(fn(*args))
+    except RosterError as e:
+        return jsonify({'error': str(e), 'rows': e.errors}), 400
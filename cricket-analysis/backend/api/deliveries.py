@@ -2,58 +2,42 @@
 
 from flask import Blueprint, request, jsonify
 from models import db
+from responses import immutable, finished_innings
+from api import player_table
+from services.analytics_engine import refresh_over_summary
+from services.matchup_matrix import update_matchups
+from services.leaderboards import update_leaderboards
+from services.delivery_search import build_match_query, RANK_SQL
 import json
+import sqlite3
 
 deliveries_bp = Blueprint('deliveries', __name__)
 
+# Player id columns named in responses (see api/player_table.py)
+ALL_PLAYER_COLUMNS = ('batsman_id', 'non_striker_id', 'bowler_id', 'fielder_id', 'dismissed_batsman_id')
+BATTER_BOWLER = ('batsman_id', 'bowler_id')
+
 @deliveries_bp.route('/innings/<int:innings_id>', methods=['GET'])
+@immutable(finished_innings)
 def get_deliveries(innings_id):
-    deliveries = db.fetch_all("""
-        SELECT d.*,
-            bp.first_name || ' ' || bp.last_name as batsman_name,
-            bp.batting_style,
-            nsp.first_name || ' ' || nsp.last_name as non_striker_name,
-            bwp.first_name || ' ' || bwp.last_name as bowler_name,
-            fp.first_name || ' ' || fp.last_name as fielder_name,
-            dp.first_name || ' ' || dp.last_name as dismissed_name
-        FROM deliveries d
-        LEFT JOIN players bp ON d.batsman_id = bp.id
-        LEFT JOIN players nsp ON d.non_striker_id = nsp.id
-        LEFT JOIN players bwp ON d.bowler_id = bwp.id
-        LEFT JOIN players fp ON d.fielder_id = fp.id
-        LEFT JOIN players dp ON d.dismissed_batsman_id = dp.id
+    deliveries = db.for_innings(innings_id).fetch_all("""
+        SELECT d.* FROM deliveries d
         WHERE d.innings_id = ?
         ORDER BY d.over_number, d.ball_number, d.id
     """, (innings_id,))
-    return jsonify(deliveries)
+    return player_table.respond(deliveries, ALL_PLAYER_COLUMNS, 'deliveries', batting_style=True)
 
 @deliveries_bp.route('/<int:delivery_id>', methods=['GET'])
 def get_delivery(delivery_id):
-    delivery = db.fetch_one("""
-        SELECT d.*,
-            bp.first_name || ' ' || bp.last_name as batsman_name,
-            bwp.first_name || ' ' || bwp.last_name as bowler_name
-        FROM deliveries d
-        LEFT JOIN players bp ON d.batsman_id = bp.id
-        LEFT JOIN players bwp ON d.bowler_id = bwp.id
-        WHERE d.id = ?
-    """, (delivery_id,))
-    return jsonify(delivery)
+    delivery = db.for_delivery(delivery_id).fetch_one(
+        "SELECT d.* FROM deliveries d WHERE d.id = ?", (delivery_id,)
+    )
+    return player_table.respond(delivery, BATTER_BOWLER, 'delivery')
 
 @deliveries_bp.route('/', methods=['POST'])
 def create_delivery():
     data = request.json
-    
-    # Determine legal ball number
-    legal_ball = None
-    if data.get('extra_type') in (None, 'None', 'Bye', 'Leg Bye'):
-        # Count existing legal balls in this over
-        count = db.fetch_one("""
-            SELECT COUNT(*) as cnt FROM deliveries 
-            WHERE innings_id = ? AND over_number = ? 
-            AND extra_type IN ('None', 'Bye', 'Leg Bye')
-        """, (data['innings_id'], data['over_number']))
-        legal_ball = (count['cnt'] if count else 0) + 1
+    shard = db.for_match(data['match_id'], create=True)
     
     # Determine if dot ball
     is_dot = 1 if data.get('runs_scored', 0) == 0 and data.get('extra_type', 'None') == 'None' else 0
@@ -91,61 +75,78 @@ def create_delivery():
     
     tags = json.dumps(data.get('tags', [])) if data.get('tags') else None
     
-    delivery_id = db.insert("""
-        INSERT INTO deliveries (
-            innings_id, match_id, over_number, ball_number, legal_ball_number,
-            batsman_id, non_striker_id, bowler_id,
-            video_timestamp_start, video_timestamp_end, video_bookmark,
-            bowling_type, delivery_type, line, length,
-            pitch_x, pitch_y, movement, pace,
-            shot_type, shot_connection,
-            wagon_x, wagon_y, wagon_zone,
-            runs_scored, runs_off_bat, extras, extra_type,
-            is_boundary, is_six, is_dot,
-            is_wicket, wicket_type, fielder_id, dismissed_batsman_id,
-            appeal, drs_review, drs_outcome,
-            control_percentage, is_scoring_shot, is_false_shot,
-            is_beaten, is_play_and_miss,
-            tags, notes, highlight, powerplay, phase
-        ) VALUES (
-            ?, ?, ?, ?, ?,
-            ?, ?, ?,
-            ?, ?, ?,
-            ?, ?, ?, ?,
-            ?, ?, ?, ?,
-            ?, ?,
-            ?, ?, ?,
-            ?, ?, ?, ?,
-            ?, ?, ?,
-            ?, ?, ?, ?,
-            ?, ?, ?,
-            ?, ?, ?,
-            ?, ?,
-            ?, ?, ?, ?, ?
-        )
-    """, (
-        data['innings_id'], data['match_id'], data['over_number'], data['ball_number'], legal_ball,
-        data['batsman_id'], data.get('non_striker_id'), data['bowler_id'],
-        data.get('video_timestamp_start'), data.get('video_timestamp_end'), data.get('video_bookmark'),
-        data.get('bowling_type'), data.get('delivery_type'), data.get('line'), data.get('length'),
-        data.get('pitch_x'), data.get('pitch_y'), data.get('movement'), data.get('pace'),
-        data.get('shot_type'), data.get('shot_connection'),
-        data.get('wagon_x'), data.get('wagon_y'), data.get('wagon_zone'),
-        data.get('runs_scored', 0), data.get('runs_off_bat', 0),
-        data.get('extras', 0), data.get('extra_type', 'None'),
-        data.get('is_boundary', 0), data.get('is_six', 0), is_dot,
-        data.get('is_wicket', 0), data.get('wicket_type'),
-        data.get('fielder_id'), data.get('dismissed_batsman_id'),
-        data.get('appeal', 0), data.get('drs_review', 0), data.get('drs_outcome'),
-        data.get('control_percentage'), is_scoring, data.get('is_false_shot', 0),
-        data.get('is_beaten', 0), data.get('is_play_and_miss', 0),
-        tags, data.get('notes'), data.get('highlight', 0), powerplay, phase
-    ))
-    
-    # Update innings totals
-    _update_innings_totals(data['innings_id'])
-    
-    return jsonify({'id': delivery_id, 'message': 'Delivery recorded'}), 201
+    def record(conn):
+        # Legal ball number is counted inside the write so concurrent scorers can't race
+        legal_ball = None
+        if data.get('extra_type') in (None, 'None', 'Bye', 'Leg Bye'):
+            count = conn.execute("""
+                SELECT COUNT(*) as cnt FROM deliveries 
+                WHERE innings_id = ? AND over_number = ? 
+                AND extra_type IN ('None', 'Bye', 'Leg Bye')
+            """, (data['innings_id'], data['over_number'])).fetchone()
+            legal_ball = count['cnt'] + 1
+        
+        cursor = conn.execute("""
+            INSERT INTO deliveries (
+                innings_id, match_id, over_number, ball_number, legal_ball_number,
+                batsman_id, non_striker_id, bowler_id,
+                video_timestamp_start, video_timestamp_end, video_bookmark,
+                bowling_type, delivery_type, line, length,
+                pitch_x, pitch_y, movement, pace,
+                shot_type, shot_connection,
+                wagon_x, wagon_y, wagon_zone,
+                runs_scored, runs_off_bat, extras, extra_type,
+                is_boundary, is_six, is_dot,
+                is_wicket, wicket_type, fielder_id, dismissed_batsman_id,
+                appeal, drs_review, drs_outcome,
+                control_percentage, is_scoring_shot, is_false_shot,
+                is_beaten, is_play_and_miss,
+                tags, notes, highlight, powerplay, phase
+            ) VALUES (
+                ?, ?, ?, ?, ?,
+                ?, ?, ?,
+                ?, ?, ?,
+                ?, ?, ?, ?,
+                ?, ?, ?, ?,
+                ?, ?,
+                ?, ?, ?,
+                ?, ?, ?, ?,
+                ?, ?, ?,
+                ?, ?, ?, ?,
+                ?, ?, ?,
+                ?, ?, ?,
+                ?, ?,
+                ?, ?, ?, ?, ?
+            )
+        """, (
+            data['innings_id'], data['match_id'], data['over_number'], data['ball_number'], legal_ball,
+            data['batsman_id'], data.get('non_striker_id'), data['bowler_id'],
+            data.get('video_timestamp_start'), data.get('video_timestamp_end'), data.get('video_bookmark'),
+            data.get('bowling_type'), data.get('delivery_type'), data.get('line'), data.get('length'),
+            data.get('pitch_x'), data.get('pitch_y'), data.get('movement'), data.get('pace'),
+            data.get('shot_type'), data.get('shot_connection'),
+            data.get('wagon_x'), data.get('wagon_y'), data.get('wagon_zone'),
+            data.get('runs_scored', 0), data.get('runs_off_bat', 0),
+            data.get('extras', 0), data.get('extra_type', 'None'),
+            data.get('is_boundary', 0), data.get('is_six', 0), is_dot,
+            data.get('is_wicket', 0), data.get('wicket_type'),
+            data.get('fielder_id'), data.get('dismissed_batsman_id'),
+            data.get('appeal', 0), data.get('drs_review', 0), data.get('drs_outcome'),
+            data.get('control_percentage'), is_scoring, data.get('is_false_shot', 0),
+            data.get('is_beaten', 0), data.get('is_play_and_miss', 0),
+            tags, data.get('notes'), data.get('highlight', 0), powerplay, phase
+        ))
+        new = _fetch_delivery(conn, cursor.lastrowid)
+        _update_derived(conn, new=new)
+        return new
+    
+    # Innings totals are refreshed once per committed batch (see _refresh_innings_totals)
+    delivery = shard.write(record, innings=[data['innings_id']])
+    delivery_id = delivery['id']
+    from services import win_probability  # numpy-backed; loaded on first scored ball
+    prediction = win_probability.on_delivery(data['innings_id'])
+    
+    return jsonify({'id': delivery_id, 'message': 'Delivery recorded', 'prediction': prediction}), 201
 
 @deliveries_bp.route('/<int:delivery_id>', methods=['PUT'])
 def update_delivery(delivery_id):
@@ -181,61 +182,130 @@ def update_delivery(delivery_id):
     if fields:
         fields.append("updated_at = CURRENT_TIMESTAMP")
         values.append(delivery_id)
-        db.execute(
-            f"UPDATE deliveries SET {', '.join(fields)} WHERE id = ?",
-            values
-        )
     
-    # Update innings totals
-    delivery = db.fetch_one("SELECT innings_id FROM deliveries WHERE id=?", (delivery_id,))
-    if delivery:
-        _update_innings_totals(delivery['innings_id'])
+    def apply(conn):
+        old = _fetch_delivery(conn, delivery_id)
+        if not old:
+            return None
+        if fields:
+            conn.execute(f"UPDATE deliveries SET {', '.join(fields)} WHERE id = ?", values)
+        return old, _fetch_delivery(conn, delivery_id)
+    
+    # Update innings totals and derived tables
+    shard = db.for_delivery(delivery_id)
+    _write_delivery(shard, delivery_id, apply)
     
     return jsonify({'message': 'Delivery updated'})
 
 @deliveries_bp.route('/<int:delivery_id>', methods=['DELETE'])
 def delete_delivery(delivery_id):
-    delivery = db.fetch_one("SELECT innings_id FROM deliveries WHERE id=?", (delivery_id,))
-    db.execute("DELETE FROM deliveries WHERE id=?", (delivery_id,))
-    if delivery:
-        _update_innings_totals(delivery['innings_id'])
+    def remove(conn):
+        old = _fetch_delivery(conn, delivery_id)
+        if not old:
+            return None
+        conn.execute("DELETE FROM deliveries WHERE id=?", (delivery_id,))
+        return old, None
+    
+    _write_delivery(db.for_delivery(delivery_id), delivery_id, remove)
     return jsonify({'message': 'Delivery deleted'})
 
-@deliveries_bp.route('/last/<int:innings_id>', methods=['GET'])
-def get_last_delivery(innings_id):
-    """Get the last delivery in an innings"""
-    delivery = db.fetch_one("""
-        SELECT d.*, 
-            bp.first_name || ' ' || bp.last_name as batsman_name,
-            bwp.first_name || ' ' || bwp.last_name as bowler_name
-        FROM deliveries d
-        LEFT JOIN players bp ON d.batsman_id = bp.id
-        LEFT JOIN players bwp ON d.bowler_id = bwp.id
+def last_delivery(innings_id):
+    return db.for_innings(innings_id).fetch_one("""
+        SELECT d.* FROM deliveries d
         WHERE d.innings_id = ?
         ORDER BY d.id DESC LIMIT 1
     """, (innings_id,))
-    return jsonify(delivery)
+
+@deliveries_bp.route('/last/<int:innings_id>', methods=['GET'])
+def get_last_delivery(innings_id):
+    """Get the last delivery in an innings"""
+    return player_table.respond(last_delivery(innings_id), BATTER_BOWLER, 'delivery')
 
 @deliveries_bp.route('/over/<int:innings_id>/<int:over_number>', methods=['GET'])
 def get_over(innings_id, over_number):
     """Get all deliveries in a specific over"""
-    deliveries = db.fetch_all("""
-        SELECT d.*,
-            bp.first_name || ' ' || bp.last_name as batsman_name,
-            bwp.first_name || ' ' || bwp.last_name as bowler_name
-        FROM deliveries d
-        LEFT JOIN players bp ON d.batsman_id = bp.id
-        LEFT JOIN players bwp ON d.bowler_id = bwp.id
+    deliveries = db.for_innings(innings_id).fetch_all("""
+        SELECT d.* FROM deliveries d
         WHERE d.innings_id = ? AND d.over_number = ?
         ORDER BY d.ball_number, d.id
     """, (innings_id, over_number))
-    return jsonify(deliveries)
+    return player_table.respond(deliveries, BATTER_BOWLER, 'deliveries')
 
 @deliveries_bp.route('/filter', methods=['POST'])
 def filter_deliveries():
     """Advanced filtering for deliveries"""
     data = request.json
     
+    conditions, params = _filter_conditions(data)
+    where_clause = " AND ".join(conditions)
+    
+    # Analyst query: served from the analytics engine so it never blocks live scoring
+    deliveries = db.analytics().fetch_scoped(f"""
+        SELECT d.* FROM deliveries d
+        WHERE {where_clause}
+        ORDER BY d.over_number, d.ball_number, d.id
+    """, params, innings_id=data.get('innings_id'), match_id=data.get('match_id'),
+        sort_key=lambda d: (d['over_number'], d['ball_number'], d['id']))
+    
+    return player_table.respond(deliveries, BATTER_BOWLER, 'deliveries', batting_style=True)
+
+@deliveries_bp.route('/search', methods=['POST'])
+def search_deliveries():
+    """Ranked full-text / tag search, combinable with the filter fields"""
+    data = request.json
+    match = build_match_query(data.get('q'), data.get('tags'))
+    if not match:
+        return jsonify({'error': 'q or tags required'}), 400
+    
+    limit = min(int(data.get('limit', 50)), 500)
+    offset = int(data.get('offset', 0))
+    
+    conditions, params = _filter_conditions(data)
+    conditions.append("deliveries_fts MATCH ?")
+    params.append(match)
+    where_clause = " AND ".join(conditions)
+    
+    # Each shard returns its best offset+limit hits; they are merged on rank
+    source = db.snapshot()
+    shards = source.shards_for(data.get('innings_id'), data.get('match_id'))
+    window = [limit, offset] if len(shards) == 1 else [offset + limit, 0]
+    
+    try:
+        total = sum(row['cnt'] for row in source.fan_out(f"""
+            SELECT COUNT(*) as cnt
+            FROM deliveries_fts
+            JOIN deliveries d ON d.id = deliveries_fts.rowid
+            WHERE {where_clause}
+        """, params, shards=shards))
+        deliveries = source.fan_out(f"""
+            SELECT d.*, {RANK_SQL} as rank
+            FROM deliveries_fts
+            JOIN deliveries d ON d.id = deliveries_fts.rowid
+            WHERE {where_clause}
+            ORDER BY rank, d.id
+            LIMIT ? OFFSET ?
+        """, params + window, shards=shards)
+    except sqlite3.OperationalError as e:
+        return jsonify({'error': f'Invalid search query: {str(e)}'}), 400
+    
+    if len(shards) > 1:
+        deliveries.sort(key=lambda d: (d['rank'], d['id']))
+        deliveries = deliveries[offset:offset + limit]
+    
+    result = {
+        'results': deliveries,
+        'total': total,
+        'limit': limit,
+        'offset': offset
+    }
+    players = player_table.with_players(deliveries, BATTER_BOWLER, batting_style=True)
+    if players is not None:
+        result['players'] = players
+    return jsonify(result)
+
+
+def _filter_conditions(data):
+    """WHERE conditions shared by the filter and search endpoints"""
     conditions = ["1=1"]
     params = []
     
@@ -303,26 +373,43 @@ def filter_deliveries():
     if data.get('highlight'):
         conditions.append("d.highlight = 1")
     
-    where_clause = " AND ".join(conditions)
-    
-    deliveries = db.fetch_all(f"""
-        SELECT d.*,
-            bp.first_name || ' ' || bp.last_name as batsman_name,
-            bwp.first_name || ' ' || bwp.last_name as bowler_name,
-            bp.batting_style
-        FROM deliveries d
-        LEFT JOIN players bp ON d.batsman_id = bp.id
-        LEFT JOIN players bwp ON d.bowler_id = bwp.id
-        WHERE {where_clause}
-        ORDER BY d.over_number, d.ball_number, d.id
-    """, params)
-    
-    return jsonify(deliveries)
+    return conditions, params
+
+
+def _fetch_delivery(conn, delivery_id):
+    row = conn.execute("SELECT * FROM deliveries WHERE id=?", (delivery_id,)).fetchone()
+    return dict(row) if row else None
+
+def _write_delivery(shard, delivery_id, fn):
+    """Run an edit of one delivery; fn(conn) returns (old, new) rows, or None if it is missing"""
+    def write(conn):
+        change = fn(conn)
+        if change:
+            _update_derived(conn, *change)
+        return change
+
+    # A delivery never moves between innings, so the innings is known up front
+    current = shard.fetch_one("SELECT innings_id FROM deliveries WHERE id=?", (delivery_id,))
+    return shard.write(write, innings=[current['innings_id']] if current else [])
 
+def _update_derived(conn, old=None, new=None):
+    """Per-ball derived tables, updated in the same transaction as the delivery itself"""
+    delivery = new or old
+    refresh_over_summary(conn, delivery['innings_id'], delivery['over_number'])
+    update_matchups(conn, old, new)
+    update_leaderboards(conn, old, new)
+
+def _refresh_innings_totals(innings_ids):
+    """Once per committed write batch, for every innings it touched"""
+    for innings_id in innings_ids:
+        _update_innings_totals(innings_id)
+
+db.on_write_batch(_refresh_innings_totals)
 
 def _update_innings_totals(innings_id):
     """Helper to recalculate innings totals"""
-    totals = db.fetch_one("""
+    source = db.for_innings(innings_id)
+    totals = source.fetch_one("""
         SELECT 
             COALESCE(SUM(runs_scored), 0) as total_runs,
             COUNT(CASE WHEN is_wicket = 1 THEN 1 END) as total_wickets,
@@ -334,7 +421,7 @@ def _update_innings_totals(innings_id):
         FROM deliveries WHERE innings_id = ?
     """, (innings_id,))
     
-    legal_balls = db.fetch_one("""
+    legal_balls = source.fetch_one("""
         SELECT COUNT(*) as cnt FROM deliveries 
         WHERE innings_id = ? AND extra_type IN ('None', 'Bye', 'Leg Bye')
     """, (innings_id,))
@@ -352,4 +439,10 @@ def _update_innings_totals(innings_id):
         totals['total_runs'], totals['total_wickets'], total_overs,
         totals['extras_total'], totals['extras_wides'], totals['extras_noballs'],
         totals['extras_byes'], totals['extras_legbyes'], innings_id
-    ))
\ No newline at end of file
+    ))
+    
+    # Invalidate anything derived from this innings (partnerships etc.)
+    db.execute("""
+        INSERT INTO innings_version (innings_id, version) VALUES (?, 1)
+        ON CONFLICT (innings_id) DO UPDATE SET version = version + 1
+    """, (innings_id,))
\ No newline at end of file
@@ -2,12 +2,13 @@
 
 from flask import Blueprint, request, jsonify
 from models import db
+from responses import immutable, finished_innings
 
 innings_bp = Blueprint('innings', __name__)
 
-@innings_bp.route('/match/<int:match_id>', methods=['GET'])
-def get_innings_for_match(match_id):
-    innings = db.fetch_all("""
+def innings_for_match(match_id):
+    """Every innings of a match with team names: the match scoreboard"""
+    return db.fetch_all("""
         SELECT i.*, bt.name as batting_team_name, bt.short_name as batting_short,
                bwt.name as bowling_team_name, bwt.short_name as bowling_short
         FROM innings i
@@ -16,23 +17,35 @@ def get_innings_for_match(match_id):
         WHERE i.match_id = ?
         ORDER BY i.innings_number
     """, (match_id,))
-    return jsonify(innings)
 
-@innings_bp.route('/<int:innings_id>', methods=['GET'])
-def get_innings(innings_id):
-    innings = db.fetch_one("""
+def innings_detail(innings_id):
+    return db.fetch_one("""
         SELECT i.*, bt.name as batting_team_name, bwt.name as bowling_team_name
         FROM innings i
         LEFT JOIN teams bt ON i.batting_team_id = bt.id
         LEFT JOIN teams bwt ON i.bowling_team_id = bwt.id
         WHERE i.id = ?
     """, (innings_id,))
-    return jsonify(innings)
+
+@innings_bp.route('/match/<int:match_id>', methods=['GET'])
+def get_innings_for_match(match_id):
+    return jsonify(innings_for_match(match_id))
+
+@innings_bp.route('/<int:innings_id>', methods=['GET'])
+def get_innings(innings_id):
+    return jsonify(innings_detail(innings_id))
 
 @innings_bp.route('/<int:innings_id>/scorecard', methods=['GET'])
+@immutable(finished_innings)
 def get_scorecard(innings_id):
+    return jsonify(scorecard(innings_id))
+
+def scorecard(innings_id):
+    """Batting and bowling cards and fall of wickets of one innings"""
+    source = db.for_innings(innings_id)
+    
     # Batting scorecard
-    batting = db.fetch_all("""
+    batting = source.fetch_all("""
         SELECT 
             p.id, p.first_name, p.last_name,
             COUNT(CASE WHEN d.extra_type IN ('None', 'No Ball') THEN 1 END) as balls_faced,
@@ -50,7 +63,7 @@ def get_scorecard(innings_id):
     
     # Add dismissal info
     for bat in batting:
-        dismissal = db.fetch_one("""
+        dismissal = source.fetch_one("""
             SELECT wicket_type, 
                    (SELECT first_name || ' ' || last_name FROM players WHERE id = d.bowler_id) as bowler_name,
                    (SELECT first_name || ' ' || last_name FROM players WHERE id = d.fielder_id) as fielder_name
@@ -60,7 +73,7 @@ def get_scorecard(innings_id):
         bat['dismissal'] = dismissal
     
     # Bowling scorecard
-    bowling = db.fetch_all("""
+    bowling = source.fetch_all("""
         SELECT 
             p.id, p.first_name, p.last_name,
             COUNT(CASE WHEN d.extra_type IN ('None', 'Bye', 'Leg Bye') THEN 1 END) as balls,
@@ -88,7 +101,7 @@ def get_scorecard(innings_id):
             b['economy'] = 0
     
     # Fall of wickets
-    fow = db.fetch_all("""
+    fow = source.fetch_all("""
         SELECT d.over_number, d.ball_number, d.runs_scored,
                p.first_name || ' ' || p.last_name as batsman_name,
                (SELECT SUM(d2.runs_scored) FROM deliveries d2 
@@ -101,16 +114,17 @@ def get_scorecard(innings_id):
         ORDER BY d.id
     """, (innings_id,))
     
-    return jsonify({
+    return {
         'batting': batting,
         'bowling': bowling,
         'fall_of_wickets': fow
-    })
+    }
 
 @innings_bp.route('/<int:innings_id>/update_totals', methods=['POST'])
 def update_innings_totals(innings_id):
     """Recalculate innings totals from deliveries"""
-    totals = db.fetch_one("""
+    source = db.for_innings(innings_id)
+    totals = source.fetch_one("""
         SELECT 
             COALESCE(SUM(runs_scored), 0) as total_runs,
             COUNT(CASE WHEN is_wicket = 1 THEN 1 END) as total_wickets,
@@ -125,7 +139,7 @@ def update_innings_totals(innings_id):
     """, (innings_id,))
     
     if totals:
-        legal_balls = db.fetch_one("""
+        legal_balls = source.fetch_one("""
             SELECT COUNT(*) as cnt FROM deliveries 
             WHERE innings_id = ? AND extra_type IN ('None', 'Bye', 'Leg Bye')
         """, (innings_id,))
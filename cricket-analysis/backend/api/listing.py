@@ -0,0 +1,151 @@
+# backend/api/listing.py
+#
+# Keyset-paginated listings with sparse fieldsets, shared by the matches,
+# teams, clips and playlists endpoints.
+#
+#   GET /api/matches/?limit=20&fields=id,match_title,match_date
+#   GET /api/matches/?limit=20&cursor=<X-Next-Cursor of the previous page>
+#
+# The body stays a plain JSON array; the cursor for the next page (if any)
+# comes back in the X-Next-Cursor header and as a Link: rel="next" URL.
+
+import base64
+import json
+from urllib.parse import urlencode
+
+from flask import request, jsonify
+
+from config import Config
+from models import db
+
+
+class ListingError(ValueError):
+    """Bad fields= or cursor= value (reported as a 400)"""
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ListingError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ListingError('Invalid cursor')
+    return values
+
+
+class Listing:
+    """One table listed in a fixed order, optionally joined for display columns.
+
+    order   -- [(column, 'ASC' | 'DESC')], all one direction, ending in a unique column
+    joins   -- {key: 'LEFT JOIN ...'}, added only when a field needs them
+    computed-- {field: (sql expression, join key or None)}
+    """
+
+    def __init__(self, table, alias, order, joins=None, computed=None):
+        directions = {direction for _, direction in order}
+        assert len(directions) == 1, 'keyset order must use a single direction'
+        self.table = table
+        self.alias = alias
+        self.order = order
+        self.descending = directions == {'DESC'}
+        self.joins = joins or {}
+        self.computed = computed or {}
+        self._columns = None
+
+    def columns(self):
+        if self._columns is None:
+            self._columns = [c['name'] for c in db.fetch_all(f"PRAGMA table_info({self.table})")]
+        return self._columns
+
+    def fields(self, requested):
+        """Selected field names (every column and computed field by default)"""
+        available = self.columns() + list(self.computed)
+        if not requested:
+            return available
+        names = [f.strip() for f in requested.split(',') if f.strip()]
+        unknown = [f for f in names if f not in available]
+        if unknown:
+            raise ListingError(f"Unknown field(s): {', '.join(unknown)}")
+        return list(dict.fromkeys(names))
+
+    def _after(self, values):
+        """WHERE clause for rows strictly after the cursor position"""
+        keys = [f'{self.alias}.{column}' for column, _ in self.order]
+        op = '<' if self.descending else '>'
+        if None not in values:
+            # Row values let SQLite seek straight into the ordering index
+            return f"({', '.join(keys)}) {op} ({', '.join('?' * len(keys))})", list(values)
+
+        # NULLs sort first ascending and last descending; spell the comparison out
+        terms, params = [], []
+        for i, (key, value) in enumerate(zip(keys, values)):
+            equal = [f'{k} IS ?' for k in keys[:i]]
+            if value is None:
+                beyond, extra = ('0', []) if self.descending else (f'{key} IS NOT NULL', [])
+            elif self.descending:
+                beyond, extra = f'({key} < ? OR {key} IS NULL)', [value]
+            else:
+                beyond, extra = f'{key} > ?', [value]
+            terms.append('(' + ' AND '.join(equal + [beyond]) + ')')
+            params += list(values[:i]) + extra
+        return '(' + ' OR '.join(terms) + ')', params
+
+    def page(self, args, filters=(), params=()):
+        """(rows, next cursor or None) for the request args"""
+        limit = args.get('limit', Config.LIST_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, Config.LIST_MAX_PAGE_SIZE))
+        fields = self.fields(args.get('fields'))
+        keys = [column for column, _ in self.order]
+        hidden = [k for k in keys if k not in fields]
+
+        select, joins = [], []
+        for name in fields + hidden:
+            if name in self.computed:
+                expr, join = self.computed[name]
+                select.append(f'{expr} as {name}')
+                if join and self.joins[join] not in joins:
+                    joins.append(self.joins[join])
+            else:
+                select.append(f'{self.alias}.{name}')
+
+        where, params = list(filters), list(params)
+        if args.get('cursor'):
+            clause, values = self._after(decode_cursor(args['cursor'], len(keys)))
+            where.append(clause)
+            params += values
+
+        rows = db.fetch_all(f"""
+            SELECT {', '.join(select)}
+            FROM {self.table} {self.alias}
+            {' '.join(joins)}
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY {', '.join(f'{self.alias}.{c} {d}' for c, d in self.order)}
+            LIMIT ?
+        """, params + [limit + 1])
+
+        cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            cursor = encode_cursor([rows[-1][k] for k in keys])
+        for row in rows:
+            for k in hidden:
+                del row[k]
+        return rows, cursor
+
+    def respond(self, filters=(), params=()):
+        try:
+            rows, cursor = self.page(request.args, filters, params)
+        except ListingError as e:
+            return jsonify({'error': str(e)}), 400
+
+        response = jsonify(rows)
+        if cursor:
+            args = request.args.to_dict(flat=False)
+            args['cursor'] = [cursor]
+            response.headers['X-Next-Cursor'] = cursor
+            response.headers['Link'] = f'<{request.base_url}?{urlencode(args, doseq=True)}>; rel="next"'
+        return response
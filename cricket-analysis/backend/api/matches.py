@@ -2,23 +2,59 @@
 
 from flask import Blueprint, request, jsonify
 from models import db
+from responses import immutable, finished_match
+from api.listing import Listing
+from services import leaderboards, match_storage, rollup_cube, roster_import
+from api import bulk_input
 
 matches_bp = Blueprint('matches', __name__)
 
+MATCHES = Listing(
+    'matches', 'm', order=[('created_at', 'DESC'), ('id', 'DESC')],
+    joins={
+        'home': "LEFT JOIN teams th ON m.team_home_id = th.id",
+        'away': "LEFT JOIN teams ta ON m.team_away_id = ta.id",
+    },
+    computed={
+        'home_team_name': ('th.name', 'home'),
+        'home_short': ('th.short_name', 'home'),
+        'away_team_name': ('ta.name', 'away'),
+        'away_short': ('ta.short_name', 'away'),
+    }
+)
+
+# Shard season of a date, as database.season_for_match() reads it
+_SEASON = "CAST(strftime('%Y', {}) AS INTEGER)"
+
+TEAMS = Listing('teams', 't', order=[('name', 'ASC'), ('id', 'ASC')])
+
 @matches_bp.route('/', methods=['GET'])
 def get_matches():
-    matches = db.fetch_all("""
-        SELECT m.*, 
-            th.name as home_team_name, th.short_name as home_short,
-            ta.name as away_team_name, ta.short_name as away_short
-        FROM matches m
-        LEFT JOIN teams th ON m.team_home_id = th.id
-        LEFT JOIN teams ta ON m.team_away_id = ta.id
-        ORDER BY m.created_at DESC
-    """)
-    return jsonify(matches)
+    """Newest first, a page at a time (see api/listing.py).
+
+    Filters: format, date_from, date_to (match_date, inclusive), team_id, venue, status
+    """
+    filters, params = [], []
+    for arg, condition in (
+        ('format', "m.match_format = ?"),
+        ('date_from', "m.match_date >= ?"),
+        ('date_to', "m.match_date <= ?"),
+        ('venue', "m.venue = ?"),
+        ('status', "m.status = ?"),
+    ):
+        if request.args.get(arg):
+            filters.append(condition)
+            params.append(request.args[arg])
+
+    team_id = request.args.get('team_id', type=int)
+    if team_id:
+        filters.append("(m.team_home_id = ? OR m.team_away_id = ?)")
+        params += [team_id, team_id]
+
+    return MATCHES.respond(filters, params)
 
 @matches_bp.route('/<int:match_id>', methods=['GET'])
+@immutable(finished_match)
 def get_match(match_id):
     match = db.fetch_one("""
         SELECT m.*, 
@@ -94,31 +130,68 @@ def create_match():
 @matches_bp.route('/<int:match_id>', methods=['PUT'])
 def update_match(match_id):
     data = request.json
-    db.execute("""
-        UPDATE matches SET match_title=?, match_format=?, venue=?, match_date=?,
-            status=?, match_result=?, winner_id=?, notes=?, updated_at=CURRENT_TIMESTAMP
-        WHERE id=?
-    """, (
-        data.get('match_title'), data.get('match_format'),
-        data.get('venue'), data.get('match_date'),
-        data.get('status'), data.get('match_result'),
-        data.get('winner_id'), data.get('notes'), match_id
-    ))
+    target = db.for_match(match_id)
+    # Rows scored before sharding was switched on can still sit in core
+    schemas = ('main', 'core') if target is not db else ('main',)
+
+    def update(conn):
+        # One write with the derived tables, so no ball scored meanwhile is
+        # counted under the old scope and then moved again
+        scope = leaderboards.match_scope(conn, match_id)
+        seasons = conn.execute(f"""
+            SELECT {_SEASON.format('match_date')} as old, {_SEASON.format('?')} as new
+            FROM matches WHERE id = ?
+        """, (data.get('match_date'), match_id)).fetchone()
+        moved = db.sharded and seasons and (seasons['old'] or db.live_season) != (seasons['new'] or db.live_season)
+        # A match's deliveries stay in the shard of the season they were scored in
+        if moved and conn.execute("SELECT 1 FROM main.deliveries WHERE match_id = ? LIMIT 1", (match_id,)).fetchone():
+            raise ValueError('match_date cannot move a scored match to another season')
+        conn.execute("""
+            UPDATE matches SET match_title=?, match_format=?, venue=?, match_date=?,
+                status=?, match_result=?, winner_id=?, notes=?, updated_at=CURRENT_TIMESTAMP
+            WHERE id=?
+        """, (
+            data.get('match_title'), data.get('match_format'),
+            data.get('venue'), data.get('match_date'),
+            data.get('status'), data.get('match_result'),
+            data.get('winner_id'), data.get('notes'), match_id
+        ))
+        # Finishing a match adds it to the rollups; reopening one takes it out
+        rollup_cube.add_match(conn, match_id, schemas)
+        # A new date or format moves the match's totals to other leaderboards
+        leaderboards.rescope_match(conn, match_id, scope, schemas)
+        return moved
+
+    try:
+        moved = target.write(update)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if moved:
+        # Its next ball goes to the new season's shard
+        db.forget_match(match_id)
     return jsonify({'message': 'Match updated'})
 
 @matches_bp.route('/<int:match_id>', methods=['DELETE'])
 def delete_match(match_id):
-    db.execute("DELETE FROM deliveries WHERE match_id=?", (match_id,))
-    db.execute("DELETE FROM innings WHERE match_id=?", (match_id,))
-    db.execute("DELETE FROM video_clips WHERE match_id=?", (match_id,))
-    db.execute("DELETE FROM matches WHERE id=?", (match_id,))
-    return jsonify({'message': 'Match deleted'})
+    """Atomic cascade delete; the match's video and clip files go too"""
+    removed = match_storage.delete_match(match_id)
+    if removed is None:
+        return jsonify({'error': 'Match not found'}), 404
+    return jsonify({'message': 'Match deleted', 'removed': removed})
+
+@matches_bp.route('/archive', methods=['POST'])
+def archive_matches():
+    """Move matches played before `before` (YYYY-MM-DD) into a compressed archive file"""
+    data = request.json or {}
+    if not data.get('before'):
+        return jsonify({'error': 'before is required'}), 400
+    result = match_storage.archive_matches(data['before'], limit=data.get('limit'))
+    return jsonify(result)
 
 # Teams endpoints
 @matches_bp.route('/teams', methods=['GET'])
 def get_teams():
-    teams = db.fetch_all("SELECT * FROM teams ORDER BY name")
-    return jsonify(teams)
+    return TEAMS.respond()
 
 @matches_bp.route('/teams', methods=['POST'])
 def create_team():
@@ -127,4 +200,30 @@ def create_team():
         "INSERT INTO teams (name, short_name) VALUES (?, ?)",
         (data['name'], data.get('short_name'))
     )
-    return jsonify({'id': team_id}), 201
\ No newline at end of file
+    return jsonify({'id': team_id}), 201
+
+@matches_bp.route('/teams/bulk', methods=['POST'])
+def bulk_upsert_teams():
+    """Create or update teams matched on name (JSON array, {"teams": [...]} or CSV)"""
+    rows = bulk_input.rows('teams')
+    if rows is None:
+        return jsonify({'error': 'Expected a list of teams or CSV'}), 400
+    return bulk_input.upsert(roster_import.upsert_teams, rows)
+
+@matches_bp.route('/teams/squad', methods=['POST'])
+def upsert_squad():
+    """A team and its players in one transaction.
+
+    {"team": {"name": ..., "short_name": ...}, "players": [...]}, or the
+    players as CSV with ?team=<name>&short_name=<short name>.
+    """
+    if request.mimetype in bulk_input.CSV_TYPES:
+        team = {'name': request.args.get('team')}
+        if request.args.get('short_name'):
+            team['short_name'] = request.args['short_name']
+    else:
+        team = (request.get_json(silent=True) or {}).get('team')
+    players = bulk_input.rows('players')
+    if not isinstance(team, dict) or players is None:
+        return jsonify({'error': 'Expected a team and a list of players'}), 400
+    return bulk_input.upsert(roster_import.upsert_squad, team, players)
@@ -0,0 +1,41 @@
+# backend/api/player_table.py
+#
+# Player names for delivery payloads, from services/player_directory.py.
+# By default rows get their *_name fields as before. With ?players=table they
+# keep bare ids and the response carries one deduplicated players object:
+#
+#   GET /api/deliveries/innings/7?players=table
+#   {"deliveries": [{"batsman_id": 12, ...}, ...], "players": {"12": {"name": ...}}}
+
+from flask import request, jsonify
+
+from services import player_directory
+
+
+def wants_table():
+    return request.args.get('players') == 'table'
+
+
+def with_players(rows, columns, batting_style=False, table=None):
+    """Name rows in place, or return the side table instead when ?players=table"""
+    if wants_table() if table is None else table:
+        return player_directory.side_table(rows, (set(columns) | {'batsman_id'}) if batting_style else columns)
+    player_directory.attach_names(rows, columns, batting_style)
+    return None
+
+
+def payload(data, columns, key, batting_style=False, table=None):
+    """A row or list of rows named in place, or {key: data, "players": {...}} for the side table.
+
+    table defaults to the current request's ?players.
+    """
+    rows = data if isinstance(data, list) else [data] if data else []
+    players = with_players(rows, columns, batting_style, table)
+    if players is None:
+        return data
+    return {key: data, 'players': players}
+
+
+def respond(data, columns, key, batting_style=False):
+    """jsonify a row or list of rows; under ?players=table as {key: data, "players": {...}}"""
+    return jsonify(payload(data, columns, key, batting_style))
@@ -2,6 +2,9 @@
 
 from flask import Blueprint, request, jsonify
 from models import db
+from services import player_directory, roster_import
+from services.player_search import search_players, DEFAULT_LIMIT
+from api import bulk_input
 
 players_bp = Blueprint('players', __name__)
 
@@ -25,6 +28,16 @@ def get_players():
         """)
     return jsonify(players)
 
+@players_bp.route('/search', methods=['GET'])
+def player_typeahead():
+    """Players matching ?q= (name substrings/prefixes), squads of ?match_id= first"""
+    players = search_players(
+        request.args.get('q', ''),
+        match_id=request.args.get('match_id', type=int),
+        limit=request.args.get('limit', DEFAULT_LIMIT, type=int)
+    )
+    return jsonify(players)
+
 @players_bp.route('/<int:player_id>', methods=['GET'])
 def get_player(player_id):
     player = db.fetch_one("SELECT * FROM players WHERE id=?", (player_id,))
@@ -41,8 +54,22 @@ def create_player():
         data.get('batting_style'), data.get('bowling_style'),
         data.get('player_role'), data.get('jersey_number')
     ))
+    player_directory.invalidate(player_id)
     return jsonify({'id': player_id}), 201
 
+@players_bp.route('/bulk', methods=['POST'])
+def bulk_upsert_players():
+    """Create or update many players in one transaction.
+
+    JSON array (or {"players": [...]}) or CSV. Rows match existing players on
+    first_name + last_name + team (team_id, or team by name) and
+    jersey_number; only the fields given are changed.
+    """
+    rows = bulk_input.rows('players')
+    if rows is None:
+        return jsonify({'error': 'Expected a list of players or CSV'}), 400
+    return bulk_input.upsert(roster_import.upsert_players, rows)
+
 @players_bp.route('/<int:player_id>', methods=['PUT'])
 def update_player(player_id):
     data = request.json
@@ -55,6 +82,7 @@ def update_player(player_id):
         data.get('batting_style'), data.get('bowling_style'),
         data.get('player_role'), data.get('jersey_number'), player_id
     ))
+    player_directory.invalidate(player_id)
     return jsonify({'message': 'Player updated'})
 
 @players_bp.route('/<int:player_id>/stats', methods=['GET'])
@@ -73,8 +101,18 @@ def get_player_stats(player_id):
         condition = " AND d.match_id = ?"
         params.append(match_id)
     
+    # Career queries fan out across season shards, so each shard returns
+    # additive partials and the rates are derived after merging. They run on
+    # the analytics engine (snapshot or DuckDB); match/innings figures stay live.
+    source = db if (innings_id or match_id) else db.analytics()
+    shards = source.shards_for(innings_id, match_id)
+    
     # Batting stats
-    batting = db.fetch_one(f"""
+    batting_sums = (
+        'innings_balls', 'total_runs', 'fours', 'sixes', 'dots', 'singles', 'twos', 'threes',
+        'balls_faced', 'false_shots', 'beaten', 'control_total', 'control_balls'
+    )
+    batting = source.fan_out(f"""
         SELECT 
             COUNT(*) as innings_balls,
             SUM(runs_off_bat) as total_runs,
@@ -84,13 +122,20 @@ def get_player_stats(player_id):
             COUNT(CASE WHEN runs_off_bat = 1 THEN 1 END) as singles,
             COUNT(CASE WHEN runs_off_bat = 2 THEN 1 END) as twos,
             COUNT(CASE WHEN runs_off_bat = 3 THEN 1 END) as threes,
-            ROUND(SUM(runs_off_bat) * 100.0 / NULLIF(COUNT(CASE WHEN extra_type IN ('None', 'No Ball') THEN 1 END), 0), 2) as strike_rate,
+            COUNT(CASE WHEN extra_type IN ('None', 'No Ball') THEN 1 END) as balls_faced,
             COUNT(CASE WHEN is_false_shot = 1 THEN 1 END) as false_shots,
             COUNT(CASE WHEN is_beaten = 1 THEN 1 END) as beaten,
-            AVG(control_percentage) as avg_control
+            SUM(control_percentage) as control_total,
+            COUNT(control_percentage) as control_balls
         FROM deliveries d
         WHERE d.batsman_id = ? {condition}
-    """, params)
+    """, params, merge_keys=(), sums=batting_sums, shards=shards)[0]
+    
+    balls_faced = batting.pop('balls_faced')
+    control_total = batting.pop('control_total')
+    control_balls = batting.pop('control_balls')
+    batting['strike_rate'] = round((batting['total_runs'] or 0) * 100.0 / balls_faced, 2) if balls_faced else None
+    batting['avg_control'] = control_total / control_balls if control_balls else None
     
     # Bowling stats
     params2 = [player_id]
@@ -99,7 +144,11 @@ def get_player_stats(player_id):
     elif match_id:
         params2.append(match_id)
     
-    bowling = db.fetch_one(f"""
+    bowling_sums = (
+        'legal_balls', 'runs_conceded', 'wickets', 'dots',
+        'fours_conceded', 'sixes_conceded', 'wides', 'no_balls'
+    )
+    bowling = source.fan_out(f"""
         SELECT 
             COUNT(CASE WHEN extra_type IN ('None', 'Bye', 'Leg Bye') THEN 1 END) as legal_balls,
             SUM(runs_scored) as runs_conceded,
@@ -111,7 +160,7 @@ def get_player_stats(player_id):
             COUNT(CASE WHEN extra_type = 'No Ball' THEN 1 END) as no_balls
         FROM deliveries d
         WHERE d.bowler_id = ? {condition}
-    """, params2)
+    """, params2, merge_keys=(), sums=bowling_sums, shards=shards)[0]
     
     return jsonify({
         'batting': batting,
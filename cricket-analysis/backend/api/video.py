@@ -3,12 +3,17 @@
 from flask import Blueprint, request, jsonify, send_file
 from models import db
 from config import Config
+from api.listing import Listing
+from services import video_processor, player_directory
 import os
 import subprocess
 import json
 
 video_bp = Blueprint('video', __name__)
 
+CLIPS = Listing('video_clips', 'c', order=[('start_time', 'ASC'), ('id', 'ASC')])
+PLAYLISTS = Listing('playlists', 'p', order=[('created_at', 'ASC'), ('id', 'ASC')])
+
 @video_bp.route('/upload', methods=['POST'])
 def upload_video():
     if 'video' not in request.files:
@@ -95,21 +100,22 @@ def create_clip():
 
 @video_bp.route('/clips/<int:match_id>', methods=['GET'])
 def get_clips(match_id):
-    clips = db.fetch_all("""
-        SELECT * FROM video_clips WHERE match_id = ? ORDER BY start_time
-    """, (match_id,))
-    return jsonify(clips)
+    """Clips of a match in video order; ?clip_type= and ?playlist_id= filter"""
+    filters, params = ["c.match_id = ?"], [match_id]
+    if request.args.get('clip_type'):
+        filters.append("c.clip_type = ?")
+        params.append(request.args['clip_type'])
+    if request.args.get('playlist_id'):
+        filters.append("c.playlist_id = ?")
+        params.append(request.args.get('playlist_id', type=int))
+    return CLIPS.respond(filters, params)
 
 @video_bp.route('/playlists', methods=['GET'])
 def get_playlists():
     match_id = request.args.get('match_id')
     if match_id:
-        playlists = db.fetch_all(
-            "SELECT * FROM playlists WHERE match_id=? ORDER BY created_at", (match_id,)
-        )
-    else:
-        playlists = db.fetch_all("SELECT * FROM playlists ORDER BY created_at")
-    return jsonify(playlists)
+        return PLAYLISTS.respond(["p.match_id = ?"], [match_id])
+    return PLAYLISTS.respond()
 
 @video_bp.route('/playlists', methods=['POST'])
 def create_playlist():
@@ -133,10 +139,17 @@ def add_to_playlist(playlist_id):
 def tag_delivery_video():
     """Tag a delivery with video timestamps"""
     data = request.json
-    db.execute("""
+    shard = db.for_delivery(data['delivery_id'])
+    current = shard.fetch_one("SELECT innings_id FROM deliveries WHERE id=?", (data['delivery_id'],))
+    if not current:
+        return jsonify({'error': 'Delivery not found'}), 404
+
+    # Through the innings, so its version moves and cached bodies pick up the tag
+    shard.write(lambda conn: conn.execute("""
         UPDATE deliveries SET video_timestamp_start=?, video_timestamp_end=?, video_bookmark=?
         WHERE id=?
-    """, (data['start_time'], data['end_time'], data.get('bookmark'), data['delivery_id']))
+    """, (data['start_time'], data['end_time'], data.get('bookmark'), data['delivery_id'])),
+        innings=[current['innings_id']])
     return jsonify({'message': 'Video tagged'})
 
 @video_bp.route('/auto_clips/<int:innings_id>', methods=['POST'])
@@ -160,15 +173,12 @@ def auto_generate_clips(innings_id):
     
     clips_created = 0
     for condition, clip_type_name in conditions:
-        deliveries = db.fetch_all(f"""
-            SELECT d.*, p.first_name || ' ' || p.last_name as batsman_name,
-                   b.first_name || ' ' || b.last_name as bowler_name
-            FROM deliveries d
-            LEFT JOIN players p ON d.batsman_id = p.id
-            LEFT JOIN players b ON d.bowler_id = b.id
+        deliveries = db.for_innings(innings_id).fetch_all(f"""
+            SELECT d.* FROM deliveries d
             WHERE d.innings_id = ? AND {condition}
             AND d.video_timestamp_start IS NOT NULL
         """, (innings_id,))
+        player_directory.attach_names(deliveries, ('batsman_id', 'bowler_id'))
         
         for d in deliveries:
             start = max(0, d['video_timestamp_start'] - buffer_before)
@@ -184,6 +194,28 @@ def auto_generate_clips(innings_id):
     
     return jsonify({'message': f'{clips_created} clips created'})
 
+@video_bp.route('/suggest_timestamps/<int:match_id>', methods=['POST'])
+def suggest_timestamps(match_id):
+    """Start scene-change detection on the match video in the background"""
+    if video_processor.video_file(match_id) is None:
+        return jsonify({'error': 'No video found'}), 404
+    return jsonify(video_processor.start_job(match_id)), 202
+
+@video_bp.route('/suggest_timestamps/<int:match_id>', methods=['GET'])
+def get_suggested_timestamps(match_id):
+    """Job progress plus the suggestions stored so far"""
+    return jsonify({
+        'job': video_processor.job_status(match_id),
+        'suggestions': video_processor.suggestions(match_id)
+    })
+
+@video_bp.route('/suggest_timestamps/<int:match_id>/confirm', methods=['POST'])
+def confirm_suggested_timestamps(match_id):
+    """Apply suggestions to deliveries; body {"delivery_ids": [...]} limits which"""
+    delivery_ids = (request.json or {}).get('delivery_ids')
+    updated = video_processor.confirm(match_id, delivery_ids)
+    return jsonify({'message': f'{updated} deliveries tagged'})
+
 
 def get_video_duration(filepath):
     """Get video duration using ffprobe"""
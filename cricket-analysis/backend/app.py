@@ -1,21 +1,131 @@
+import importlib
 import os
+import threading
+import click
 from flask import Flask, jsonify
-import requests
 from flask_cors import CORS
-from models import db, Team
+from instrumentation import init_profiling
+from responses import init_responses
 
-app = Flask(__name__)
-CORS(app) # Allows your React frontend to talk to this backend
-
-# Database Configuration
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'cricket.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-db.init_app(app)
+# (module, blueprint attribute, url prefix)
+BLUEPRINTS = [
+    ('api.matches', 'matches_bp', '/api/matches'),
+    ('api.innings', 'innings_bp', '/api/innings'),
+    ('api.deliveries', 'deliveries_bp', '/api/deliveries'),
+    ('api.players', 'players_bp', '/api/players'),
+    ('api.analysis', 'analysis_bp', '/api/analysis'),
+    ('api.video', 'video_bp', '/api/video'),
+]
+
+_warm_lock = threading.Lock()
+
+
+def create_app(lazy=True):
+    """Build the app without touching the database or importing heavy libraries.
+
+    Schema checks, seeding and the numpy/SQLAlchemy imports happen in
+    warm_up(), either explicitly (`flask --app app warm-up`, a pre-fork hook)
+    or just before the first request is dispatched.
+    """
+    app = Flask(__name__)
+    CORS(app) # Allows your React frontend to talk to this backend
+    init_profiling(app) # /metrics and per-request SQL counts when PROFILING=1
+    init_responses(app) # orjson for jsonify, gzip/brotli above COMPRESS_MIN_SIZE
+
+    # Database Configuration
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'cricket.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    for module, attr, prefix in BLUEPRINTS:
+        app.register_blueprint(getattr(importlib.import_module(module), attr), url_prefix=prefix)
+
+    app.add_url_rule('/api/live-matches', view_func=get_live_matches, methods=['GET'])
+
+    @app.cli.command('warm-up')
+    def warm_up_command():
+        """Check the schema, seed and load heavy modules now instead of on first request."""
+        warm_up(app)
+
+    @app.cli.command('compact')
+    @click.option('--enable', is_flag=True,
+                  help='First switch every file to incremental auto-vacuum (one full VACUUM each).')
+    @click.option('--budget', type=float, default=None, help='Seconds to spend (default COMPACTION_TIME_BUDGET).')
+    def compact_command(enable, budget):
+        """Hand free pages in the core file and shards back to the filesystem."""
+        from models import db
+        if enable:
+            for target in db.shards():
+                if target.enable_incremental_vacuum():
+                    print(f"Incremental vacuum enabled on {target.db_path}")
+        for name, pages in db.compact(budget).items():
+            print(f"{name}: {pages} pages freed")
+
+    @app.cli.command('archive-matches')
+    @click.argument('before')
+    @click.option('--limit', type=int, default=None)
+    def archive_matches_command(before, limit):
+        """Move matches played before BEFORE (YYYY-MM-DD) into a compressed archive."""
+        from services import match_storage
+        result = match_storage.archive_matches(before, limit=limit)
+        print(f"Archived {result['matches']} matches ({result['deliveries']} deliveries) -> {result['path']}")
+
+    @app.cli.command('refresh-cube')
+    @click.option('--rebuild', is_flag=True, help='Drop the rollups and reduce every finished match again.')
+    def refresh_cube_command(rebuild):
+        """Bring the venue/season/phase rollups up to date with finished matches."""
+        from services import rollup_cube
+        matches = rollup_cube.rebuild_cube()['matches'] if rebuild else rollup_cube.refresh()
+        print(f"{matches} matches reduced")
+
+    @app.cli.command('rebuild-leaderboards')
+    def rebuild_leaderboards_command():
+        """Recompute the season/format leaderboards from every delivery (for backfills)."""
+        from services import leaderboards
+        print(f"{leaderboards.rebuild_leaderboards()} leaderboard rows")
+
+    if lazy:
+        # Wrapping wsgi_app (rather than a before_request hook) lets warm_up
+        # still register the SQLAlchemy extension: Flask refuses new setup
+        # once a request has started.
+        dispatch = app.wsgi_app
+
+        def warm_then_dispatch(environ, start_response):
+            if not app.extensions.get('warmed_up'):
+                warm_up(app)
+            return dispatch(environ, start_response)
+
+        app.wsgi_app = warm_then_dispatch
+    return app
+
+
+def warm_up(app):
+    """Everything create_app() deferred. Safe to call more than once."""
+    with _warm_lock:
+        if app.extensions.get('warmed_up'):
+            return
+        from models import db, orm
+
+        db.ensure_schema()
+        orm.init_app(app)
+        with app.app_context():
+            orm.create_all()
+            seed_database()
+
+        # Lookup tables for live win probability (numpy)
+        from services import win_probability
+        win_probability.load_model()
+
+        db.schedule_compaction()  # only when COMPACTION_INTERVAL is set
+
+        app.extensions['warmed_up'] = True
+
 
 # SEED DATA: Automatically adds teams if database is new
 def seed_database():
+    from models import orm, Team
+
     if Team.query.first() is None:
         teams = [
             {"name": "Mumbai Indians", "logo": "https://upload.wikimedia.org/wikipedia/en/c/cd/Mumbai_Indians_Logo.svg"},
@@ -26,30 +136,25 @@ def seed_database():
         ]
         for t in teams:
             new_team = Team(name=t["name"], logo_url=t["logo"])
-            db.session.add(new_team)
-        db.session.commit()
+            orm.session.add(new_team)
+        orm.session.commit()
         print("Database Seeded!")
 
-with app.app_context():
-    db.create_all()
-    seed_database()
 
-@app.route('/api/live-matches', methods=['GET'])
 def get_live_matches():
+    from services import live_feed
+
     try:
-        # The CricketData API endpoint for current matches
-        api_url = "https://api.cricapi.com/v1/currentMatches?apikey=1b3b6e52-10a7-4bb1-94ba-db9800b3ba12&offset=0"
-        
-        # Fetch the data from the API
-        response = requests.get(api_url)
-        data = response.json()
-        
         # Send the live data directly to your React frontend
-        return jsonify(data)
+        return jsonify(live_feed.fetch())
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+app = create_app()
+
 if __name__ == '__main__':
-    # Bind to Render's dynamic port
+    # Bind to Render's dynamic port (`python asgi.py` serves the same app async)
     port = int(os.environ.get("PORT", 5000))
-    app.run(host='0.0.0.0', port=port)
\ No newline at end of file
+    warm_up(app)
+    app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,297 @@
+# backend/asgi.py
+#
+# Async serving mode. The views every viewer of a live match polls run as
+# coroutines on an event loop, so a waiting viewer costs a coroutine rather
+# than a worker thread:
+#
+#   GET /api/live-matches                   cricapi feed (services/live_feed.py)
+#   GET /api/innings/match/<match_id>       scoreboard: every innings with totals
+#   GET /api/innings/<innings_id>
+#   GET /api/innings/<innings_id>/scorecard
+#   GET /api/deliveries/last/<innings_id>
+#
+# Everything else is the Flask app, run on its own thread pool as before.
+# SQLite reads go through a bounded thread pool (ASYNC_DB_WORKERS), and
+# identical reads in flight at the same time are answered by one query and
+# one encoded body. The scorecard and last delivery are kept per innings
+# version, so between two balls they are built once however many viewers
+# poll them. cricapi is fetched through one pooled httpx client.
+# Bodies, compression, the finished-innings cache and CORS headers are the
+# same as the Flask views'; per-request SQL profiling only sees the Flask
+# side.
+#
+#   uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+#   python asgi.py            (one worker on $PORT)
+
+import asyncio
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from werkzeug.http import parse_accept_header
+
+import app as flask_module
+from api import player_table
+from api.deliveries import BATTER_BOWLER, last_delivery
+from api.innings import innings_detail, innings_for_match, scorecard
+from config import Config
+from responses import body_cache, cache_body, dumps_bytes, finished_innings, negotiate, ENCODERS
+from services import live_feed, player_directory
+from services.partnership_engine import innings_version
+
+flask_app = flask_module.app
+
+
+class _Runtime:
+    """Pools and the upstream client, created on lifespan startup (or the first request)"""
+
+    def __init__(self):
+        self.db_pool = None
+        self.http = None
+        self.inflight = {}
+        self._starting = None
+
+    async def start(self):
+        if self.db_pool is not None:
+            return
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._start())
+        await asyncio.shield(self._starting)
+
+    async def _start(self):
+        self.db_pool = ThreadPoolExecutor(max_workers=Config.ASYNC_DB_WORKERS, thread_name_prefix='async-db')
+        self.http = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=Config.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.UPSTREAM_MAX_CONNECTIONS,
+        ))
+        # Schema, seeding and heavy imports before the first viewer
+        await self.run(flask_module.warm_up, flask_app)
+
+    async def stop(self):
+        if self.http is not None:
+            await self.http.aclose()
+        if self.db_pool is not None:
+            self.db_pool.shutdown(wait=False)
+        self.db_pool = self.http = self._starting = None
+
+    async def run(self, fn, *args):
+        """fn(*args) on the database pool"""
+        return await asyncio.get_running_loop().run_in_executor(self.db_pool, fn, *args)
+
+    async def shared(self, key, fn, *args):
+        """run() once for every request with the same key in flight at the same time"""
+        future = self.inflight.get(key)
+        if future is None:
+            future = self.inflight[key] = asyncio.ensure_future(self.run(fn, *args))
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # One viewer disconnecting must not cancel the others' read
+        return await asyncio.shield(future)
+
+
+runtime = _Runtime()
+
+
+class Request:
+    __slots__ = ('path', 'query_string', 'args', 'headers')
+
+    def __init__(self, scope):
+        self.path = scope['path']
+        self.query_string = scope.get('query_string', b'').decode('latin-1')
+        self.args = {k: v[0] for k, v in parse_qs(self.query_string).items()}
+        self.headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope['headers']}
+
+    @property
+    def full_path(self):
+        # As werkzeug spells it, so cache keys match the Flask views'
+        return f'{self.path}?{self.query_string}'
+
+    def encoding(self, body=None):
+        """The best encoding the client accepts; None for a known body too small to pay off"""
+        if body is not None and len(body) < Config.COMPRESS_MIN_SIZE:
+            return None
+        return negotiate(parse_accept_header(self.headers.get('accept-encoding', '')))
+
+
+def _encode(build, encoding, *args):
+    """build(*args) as JSON bytes, compressed when it is big enough to pay off"""
+    body = dumps_bytes(build(*args))
+    if encoding and len(body) >= Config.COMPRESS_MIN_SIZE:
+        return ENCODERS[encoding](body), encoding
+    return body, None
+
+
+# --- Native views ---------------------------------------------------------
+
+# The last feed payload with its body_cache key and entry: encoded (and
+# compressed per encoding) once however many viewers it is sent to
+_live = (None, None, None)
+
+
+async def live_matches(request):
+    global _live
+    try:
+        payload = await live_feed.fetch_async(runtime.http)
+    except Exception as e:
+        return 500, dumps_bytes({"error": str(e)}), None
+    seen, key, entry = _live
+    if seen is not payload:
+        key = ('live-matches', time.monotonic())
+        entry = cache_body(key, dumps_bytes(payload), 'application/json')
+        _live = (payload, key, entry)
+    encoding = request.encoding(entry.body)
+    if encoding is None:
+        return 200, entry.body, None
+    return 200, await runtime.run(body_cache.encoded, key, entry, encoding), encoding
+
+
+async def scoreboard(request, match_id):
+    encoding = request.encoding()
+    body, encoding = await runtime.shared(('scoreboard', match_id, encoding),
+                                          _encode, innings_for_match, encoding, match_id)
+    return 200, body, encoding
+
+
+async def innings(request, innings_id):
+    encoding = request.encoding()
+    body, encoding = await runtime.shared(('innings', innings_id, encoding),
+                                          _encode, innings_detail, encoding, innings_id)
+    return 200, body, encoding
+
+
+async def _versioned(request, endpoint, version, build, *args):
+    """build(*args) served from body_cache while version holds, with the ETag/304 of immutable()"""
+    key = (endpoint, request.full_path, version)
+    entry = body_cache.get(key)
+    if entry is None:
+        body, _ = await runtime.shared(key, _encode, build, None, *args)
+        entry = body_cache.get(key) or cache_body(key, body, 'application/json')
+    encoding = request.encoding(entry.body)
+    etag = f'"{entry.etag}-{encoding or "identity"}"'
+    headers = [('ETag', etag), ('Cache-Control', 'no-cache')]
+    if etag in [t.strip() for t in request.headers.get('if-none-match', '').split(',')]:
+        return 304, b'', None, headers
+    body = entry.body
+    if encoding:
+        body = entry.encoded.get(encoding) or await runtime.run(body_cache.encoded, key, entry, encoding)
+    return 200, body, encoding, headers
+
+
+def _live_token(innings_id):
+    # The innings version moves once per committed write naming the innings
+    # (db.write(..., innings=)): a ball scored, corrected or deleted, a video
+    # tag, or confirmed timestamp suggestions. Any other write to deliveries
+    # leaves it, and so the live bodies, unchanged.
+    return ('live', innings_version(innings_id), player_directory.names_version())
+
+
+def _scorecard_token(innings_id):
+    return finished_innings(innings_id) or _live_token(innings_id)
+
+
+def _last_delivery(innings_id, table):
+    return player_table.payload(last_delivery(innings_id), BATTER_BOWLER, 'delivery', table=table)
+
+
+async def get_last_delivery(request, innings_id):
+    version = await runtime.shared(('live-token', innings_id), _live_token, innings_id)
+    table = request.args.get('players') == 'table'
+    return await _versioned(request, 'deliveries.get_last_delivery', version,
+                            _last_delivery, innings_id, table)
+
+
+async def get_scorecard(request, innings_id):
+    """Between balls every viewer of an innings gets the same body (and a 304 once they have it)"""
+    version = await runtime.shared(('scorecard-token', innings_id), _scorecard_token, innings_id)
+    return await _versioned(request, 'innings.get_scorecard', version, scorecard, innings_id)
+
+
+ROUTES = [
+    (re.compile(r'/api/live-matches'), live_matches),
+    (re.compile(r'/api/innings/match/(\d+)'), scoreboard),
+    (re.compile(r'/api/innings/(\d+)'), innings),
+    (re.compile(r'/api/innings/(\d+)/scorecard'), get_scorecard),
+    (re.compile(r'/api/deliveries/last/(\d+)'), get_last_delivery),
+]
+
+
+def _route(scope):
+    if scope['method'] not in ('GET', 'HEAD'):
+        return None, ()
+    for pattern, view in ROUTES:
+        match = pattern.fullmatch(scope['path'])
+        if match:
+            return view, tuple(int(g) for g in match.groups())
+    return None, ()
+
+
+# --- ASGI plumbing --------------------------------------------------------
+
+def _cors(request):
+    # What flask_cors adds for CORS(app) with its defaults
+    origin = request.headers.get('origin')
+    if origin is None:
+        return [('Access-Control-Allow-Origin', '*')]
+    return [('Access-Control-Allow-Origin', origin), ('Vary', 'Origin')]
+
+
+async def _respond(scope, send, request, view, args):
+    try:
+        status, body, encoding, *extra = await view(request, *args)
+    except Exception:
+        traceback.print_exc()
+        status, body, encoding, extra = 500, dumps_bytes({"error": "Internal Server Error"}), None, ()
+    headers = [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))]
+    if encoding:
+        headers.append(('Content-Encoding', encoding))
+    vary = ['Accept-Encoding']
+    for name, value in _cors(request) + [h for more in extra for h in more]:
+        if name == 'Vary':
+            vary.append(value)
+        else:
+            headers.append((name, value))
+    headers.append(('Vary', ', '.join(vary)))
+    await send({
+        'type': 'http.response.start', 'status': status,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+    })
+    await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await runtime.start()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await runtime.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+_flask = WSGIMiddleware(flask_app, workers=Config.ASYNC_WSGI_WORKERS)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    view, args = _route(scope) if scope['type'] == 'http' else (None, ())
+    if view is None:
+        return await _flask(scope, receive, send)
+    await runtime.start()
+    await _respond(scope, send, Request(scope), view, args)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(application, host='0.0.0.0', port=int(os.environ.get("PORT", 5000)))
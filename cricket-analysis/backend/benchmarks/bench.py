@@ -0,0 +1,368 @@
+# backend/benchmarks/bench.py
+#
+# Endpoint benchmark suite. Every blueprint endpoint is driven through the
+# Flask test client against synthetic archives of several sizes; results are
+# written as a JSON baseline that `compare` checks later runs against.
+#
+#   python -m benchmarks.bench run --seasons 1 3 --output benchmarks/baselines/main.json
+#   python -m benchmarks.bench compare benchmarks/baselines/main.json current.json
+#
+# Each size is measured in a fresh interpreter so module-level caches and
+# the `models.db` binding never leak between sizes.
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'cricket-bench')
+
+# (module, blueprint attribute, url prefix)
+BLUEPRINTS = [
+    ('api.matches', 'matches_bp', '/api/matches'),
+    ('api.innings', 'innings_bp', '/api/innings'),
+    ('api.deliveries', 'deliveries_bp', '/api/deliveries'),
+    ('api.players', 'players_bp', '/api/players'),
+    ('api.analysis', 'analysis_bp', '/api/analysis'),
+    ('api.video', 'video_bp', '/api/video'),
+]
+
+# path and body are filled from the ids picked out of the archive (ctx)
+Case = namedtuple('Case', 'name method path body')
+
+_balls = itertools.count()
+
+
+def _new_ball(c):
+    n = next(_balls)
+    return {
+        'innings_id': c['live_innings_id'], 'match_id': c['live_match_id'],
+        'over_number': n // 6, 'ball_number': n % 6 + 1,
+        'batsman_id': c['batsman_id'], 'non_striker_id': c['non_striker_id'],
+        'bowler_id': c['bowler_id'], 'runs_scored': n % 5 % 3, 'runs_off_bat': n % 5 % 3,
+        'pitch_x': 0.1, 'pitch_y': 6.5, 'tags': ['edge'] if n % 4 == 0 else [],
+    }
+
+
+CASES = [
+    # matches
+    Case('matches.list', 'GET', '/api/matches/', None),
+    Case('matches.get', 'GET', '/api/matches/{match_id}', None),
+    Case('matches.teams', 'GET', '/api/matches/teams', None),
+    Case('matches.create', 'POST', '/api/matches/', lambda c: {
+        'match_title': 'Bench', 'team_home_id': c['team_id'], 'team_away_id': c['other_team_id'],
+        'match_date': c['live_date']}),
+    Case('matches.update', 'PUT', '/api/matches/{match_id}', lambda c: {
+        'match_title': c['match_title'], 'match_format': c['match_format'],
+        'match_date': c['match_date'], 'status': 'Completed'}),
+    Case('matches.create_team', 'POST', '/api/matches/teams', lambda c: {'name': 'Bench XI'}),
+    # innings
+    Case('innings.by_match', 'GET', '/api/innings/match/{match_id}', None),
+    Case('innings.get', 'GET', '/api/innings/{innings_id}', None),
+    Case('innings.scorecard', 'GET', '/api/innings/{innings_id}/scorecard', None),
+    Case('innings.update_totals', 'POST', '/api/innings/{innings_id}/update_totals', None),
+    # deliveries
+    Case('deliveries.by_innings', 'GET', '/api/deliveries/innings/{innings_id}', None),
+    Case('deliveries.get', 'GET', '/api/deliveries/{delivery_id}', None),
+    Case('deliveries.last', 'GET', '/api/deliveries/last/{innings_id}', None),
+    Case('deliveries.over', 'GET', '/api/deliveries/over/{innings_id}/5', None),
+    Case('deliveries.filter_innings', 'POST', '/api/deliveries/filter', lambda c: {
+        'innings_id': c['innings_id']}),
+    Case('deliveries.filter_career', 'POST', '/api/deliveries/filter', lambda c: {
+        'batsman_id': c['batsman_id'], 'line': 'Outside Off'}),
+    Case('deliveries.search', 'POST', '/api/deliveries/search', lambda c: {
+        'q': 'edge', 'limit': 50}),
+    Case('deliveries.create', 'POST', '/api/deliveries/', _new_ball),
+    Case('deliveries.update', 'PUT', '/api/deliveries/{delivery_id}', lambda c: {
+        'notes': 'benchmark edit', 'shot_type': 'Drive'}),
+    # players
+    Case('players.list', 'GET', '/api/players/', None),
+    Case('players.by_team', 'GET', '/api/players/?team_id={team_id}', None),
+    Case('players.get', 'GET', '/api/players/{batsman_id}', None),
+    Case('players.create', 'POST', '/api/players/', lambda c: {
+        'first_name': 'Bench', 'last_name': 'Player', 'team_id': c['team_id']}),
+    Case('players.update', 'PUT', '/api/players/{bowler_id}', lambda c: {
+        'first_name': c['bowler_first_name'], 'last_name': c['bowler_last_name'],
+        'team_id': c['other_team_id']}),
+    Case('players.career_stats', 'GET', '/api/players/{batsman_id}/stats', None),
+    Case('players.innings_stats', 'GET', '/api/players/{batsman_id}/stats?innings_id={innings_id}', None),
+    # analysis
+    Case('analysis.pitch_map', 'POST', '/api/analysis/pitch_map', lambda c: {
+        'bowler_id': c['bowler_id']}),
+    Case('analysis.wagon_wheel', 'POST', '/api/analysis/wagon_wheel', lambda c: {
+        'batsman_id': c['batsman_id']}),
+    Case('analysis.over_by_over', 'GET', '/api/analysis/over_by_over/{innings_id}', None),
+    Case('analysis.over_summary', 'GET', '/api/analysis/over_summary/{match_id}', None),
+    Case('analysis.over_summary_compare', 'POST', '/api/analysis/over_summary/compare', lambda c: {
+        'match_ids': c['recent_match_ids']}),
+    Case('analysis.partnerships', 'GET', '/api/analysis/partnerships/{innings_id}', None),
+    Case('analysis.best_partnerships', 'GET', '/api/analysis/partnerships/best?limit=20', None),
+    Case('analysis.win_probability', 'GET', '/api/analysis/win_probability/{innings_id}', None),
+    Case('analysis.matchup_grid', 'POST', '/api/analysis/matchups/grid', lambda c: {
+        'batting_team_id': c['team_id'], 'bowling_team_id': c['other_team_id']}),
+    Case('analysis.matchup_bowling_types', 'POST', '/api/analysis/matchups/bowling_types', lambda c: {
+        'batting_team_id': c['team_id']}),
+    Case('analysis.batsman', 'GET', '/api/analysis/batsman_analysis/{innings_id}/{opener_id}', None),
+    # video (upload and clip extraction need real media and ffmpeg, so they are not timed)
+    Case('video.clips', 'GET', '/api/video/clips/{match_id}', None),
+    Case('video.playlists', 'GET', '/api/video/playlists', None),
+    Case('video.create_playlist', 'POST', '/api/video/playlists', lambda c: {
+        'name': 'Bench', 'match_id': c['match_id']}),
+    Case('video.tag_delivery', 'POST', '/api/video/tag_delivery', lambda c: {
+        'delivery_id': c['delivery_id'], 'start_time': 120.0, 'end_time': 128.0}),
+    Case('video.auto_clips', 'POST', '/api/video/auto_clips/{innings_id}', lambda c: {
+        'type': 'wickets'}),
+    # rebuild jobs
+    Case('analysis.rebuild_over_summary', 'POST', '/api/analysis/over_summary/rebuild', lambda c: {
+        'innings_id': c['innings_id']}),
+]
+
+# Whole-archive rebuilds are only timed once per size
+SLOW_CASES = [
+    Case('analysis.rebuild_partnerships', 'POST', '/api/analysis/partnerships/rebuild', None),
+    Case('analysis.rebuild_matchups', 'POST', '/api/analysis/matchups/rebuild', None),
+]
+
+
+# --- Measuring one archive (child process) --------------------------------
+
+def build_app():
+    from flask import Flask
+    import importlib
+
+    app = Flask(__name__)
+    for module, attr, prefix in BLUEPRINTS:
+        app.register_blueprint(getattr(importlib.import_module(module), attr), url_prefix=prefix)
+    return app
+
+
+def pick_context(database):
+    """Representative ids: a full completed innings, its players, a fresh live match"""
+    innings = database.fetch_one("""
+        SELECT i.id, i.match_id, i.batting_team_id, i.bowling_team_id,
+               m.match_title, m.match_format, m.match_date
+        FROM innings i JOIN matches m ON i.match_id = m.id
+        WHERE i.innings_number = 1
+        ORDER BY i.total_runs DESC LIMIT 1
+    """)
+    top_batsman = database.fetch_one("""
+        SELECT batsman_id, COUNT(*) as balls FROM deliveries
+        GROUP BY batsman_id ORDER BY balls DESC LIMIT 1
+    """)
+    ball = database.fetch_one("""
+        SELECT id, batsman_id, non_striker_id, bowler_id FROM deliveries
+        WHERE innings_id = ? ORDER BY id LIMIT 1
+    """, (innings['id'],))
+    bowler = database.fetch_one("SELECT first_name, last_name FROM players WHERE id = ?",
+                                (ball['bowler_id'],))
+    latest = database.fetch_one("SELECT MAX(match_date) as d FROM matches")['d']
+    live_match_id = database.insert("""
+        INSERT INTO matches (match_title, match_format, team_home_id, team_away_id, match_date)
+        VALUES ('Live bench match', 'T20', ?, ?, ?)
+    """, (innings['batting_team_id'], innings['bowling_team_id'], latest))
+    live_innings_id = database.insert("""
+        INSERT INTO innings (match_id, innings_number, batting_team_id, bowling_team_id)
+        VALUES (?, 1, ?, ?)
+    """, (live_match_id, innings['batting_team_id'], innings['bowling_team_id']))
+
+    return {
+        'match_id': innings['match_id'], 'innings_id': innings['id'],
+        'match_title': innings['match_title'], 'match_format': innings['match_format'],
+        'match_date': innings['match_date'],
+        'team_id': innings['batting_team_id'], 'other_team_id': innings['bowling_team_id'],
+        'batsman_id': top_batsman['batsman_id'], 'opener_id': ball['batsman_id'],
+        'non_striker_id': ball['non_striker_id'],
+        'bowler_id': ball['bowler_id'],
+        'bowler_first_name': bowler['first_name'], 'bowler_last_name': bowler['last_name'],
+        'delivery_id': ball['id'],
+        'recent_match_ids': [row['id'] for row in database.fetch_all(
+            "SELECT id FROM matches ORDER BY match_date DESC, id DESC LIMIT 10")],
+        'live_match_id': live_match_id, 'live_innings_id': live_innings_id, 'live_date': latest,
+    }
+
+
+def _request(client, case, ctx):
+    path = case.path.format(**ctx)
+    body = case.body(ctx) if case.body else None
+    started = time.perf_counter()
+    response = client.open(path, method=case.method, json=body)
+    elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, response.status_code, len(response.get_data())
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        'median_ms': round(statistics.median(ordered), 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        'min_ms': round(ordered[0], 3),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'runs': len(ordered),
+    }
+
+
+def measure(db_path, repeat=20, warmup=2, only=None):
+    """Time every case against a working copy of db_path"""
+    workdir = tempfile.mkdtemp(prefix='cricket-bench-')
+    work_db = os.path.join(workdir, os.path.basename(db_path))
+    shutil.copyfile(db_path, work_db)
+
+    import models
+    from database import Database
+    models.db = Database(db_path=work_db, shard_dir='')
+    app = build_app()
+    client = app.test_client()
+    ctx = pick_context(models.db)
+
+    results = {}
+    try:
+        for case in CASES + SLOW_CASES:
+            if only and not any(pattern in case.name for pattern in only):
+                continue
+            slow = case in SLOW_CASES
+            for _ in range(0 if slow else warmup):
+                _request(client, case, ctx)
+            samples, statuses, size = [], set(), 0
+            for _ in range(1 if slow else repeat):
+                elapsed, status, size = _request(client, case, ctx)
+                samples.append(elapsed)
+                statuses.add(status)
+            results[case.name] = dict(_summary(samples), status=sorted(statuses), bytes=size)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+# --- Orchestration ---------------------------------------------------------
+
+def archive_path(data_dir, seasons, matches_per_season, seed):
+    return os.path.join(data_dir, f'archive_s{seasons}_m{matches_per_season}_seed{seed}.db')
+
+
+def ensure_archive(data_dir, seasons, matches_per_season, seed):
+    """Generated archives are cached by size and seed"""
+    path = archive_path(data_dir, seasons, matches_per_season, seed)
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        subprocess.run([
+            sys.executable, '-m', 'benchmarks.synthetic_data', path,
+            '--seasons', str(seasons), '--matches-per-season', str(matches_per_season),
+            '--seed', str(seed)
+        ], cwd=BACKEND_DIR, check=True)
+    return path
+
+
+def run(seasons_list, matches_per_season=60, seed=0, repeat=20, data_dir=DEFAULT_DATA_DIR, only=None):
+    baseline = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'matches_per_season': matches_per_season,
+        'seed': seed,
+        'repeat': repeat,
+        'sizes': {},
+    }
+    for seasons in seasons_list:
+        path = ensure_archive(data_dir, seasons, matches_per_season, seed)
+        cmd = [sys.executable, '-m', 'benchmarks.bench', 'measure', path, '--repeat', str(repeat)]
+        for pattern in only or []:
+            cmd += ['--only', pattern]
+        output = subprocess.run(cmd, cwd=BACKEND_DIR, check=True, capture_output=True, text=True)
+        baseline['sizes'][f'{seasons}_seasons'] = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"measured {seasons} season(s)", file=sys.stderr)
+    return baseline
+
+
+def compare(baseline, current, threshold=0.25, min_delta_ms=0.5):
+    """Rows of (size, case, base ms, current ms, ratio, flag); flag is REGRESSION/IMPROVED/''"""
+    rows = []
+    for size, cases in current['sizes'].items():
+        base_cases = baseline['sizes'].get(size, {})
+        for name, result in cases.items():
+            base = base_cases.get(name)
+            if not base:
+                rows.append((size, name, None, result['median_ms'], None, 'NEW'))
+                continue
+            before, after = base['median_ms'], result['median_ms']
+            ratio = after / before if before else None
+            flag = ''
+            # Sub-millisecond noise is not a regression, whatever the ratio
+            if ratio is not None and abs(after - before) >= min_delta_ms:
+                if ratio > 1 + threshold:
+                    flag = 'REGRESSION'
+                elif ratio < 1 / (1 + threshold):
+                    flag = 'IMPROVED'
+            if result.get('status') != base.get('status'):
+                flag = (flag + ' STATUS').strip()
+            rows.append((size, name, before, after, ratio, flag))
+    return rows
+
+
+def _print_comparison(rows):
+    print(f"{'size':<12} {'endpoint':<36} {'base ms':>9} {'now ms':>9} {'ratio':>7}  flag")
+    for size, name, before, after, ratio, flag in rows:
+        print(f"{size:<12} {name:<36} "
+              f"{before if before is not None else '-':>9} {after:>9} "
+              f"{f'{ratio:.2f}' if ratio is not None else '-':>7}  {flag}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Endpoint benchmark suite')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_run = sub.add_parser('run', help='Benchmark every endpoint at several archive sizes')
+    p_run.add_argument('--seasons', type=int, nargs='+', default=[1, 3])
+    p_run.add_argument('--matches-per-season', type=int, default=60)
+    p_run.add_argument('--seed', type=int, default=0)
+    p_run.add_argument('--repeat', type=int, default=20)
+    p_run.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    p_run.add_argument('--only', action='append', help='Only cases whose name contains this')
+    p_run.add_argument('--output', help='Write the JSON baseline here (default: stdout)')
+
+    p_measure = sub.add_parser('measure', help='(internal) time one archive and print JSON')
+    p_measure.add_argument('db_path')
+    p_measure.add_argument('--repeat', type=int, default=20)
+    p_measure.add_argument('--only', action='append')
+
+    p_compare = sub.add_parser('compare', help='Flag regressions between two baselines')
+    p_compare.add_argument('baseline')
+    p_compare.add_argument('current')
+    p_compare.add_argument('--threshold', type=float, default=0.25,
+                           help='Allowed slowdown of the median (0.25 = 25%%)')
+
+    args = parser.parse_args()
+
+    if args.command == 'measure':
+        print(json.dumps(measure(args.db_path, args.repeat, only=args.only)))
+    elif args.command == 'run':
+        result = run(args.seasons, args.matches_per_season, args.seed, args.repeat,
+                     args.data_dir, args.only)
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, 'w') as f:
+                json.dump(result, f, indent=2)
+            print(f"Baseline written to {args.output}")
+        else:
+            print(json.dumps(result, indent=2))
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows = compare(baseline, current, args.threshold)
+        _print_comparison(rows)
+        regressions = [r for r in rows if 'REGRESSION' in r[5] or 'STATUS' in r[5]]
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,121 @@
+# backend/benchmarks/engines.py
+#
+# SQLite against DuckDB for the queries behind Database.analytics(): career
+# stats and cross-match delivery filters. Both engines serve the same
+# requests through the Flask test client on a generated archive; the report
+# has the median latency per case and engine, the time of the first Parquet
+# export, and whether the two engines returned the same JSON.
+#
+#   python -m benchmarks.engines --seasons 3 --repeat 10
+#   python -m benchmarks.engines --db /path/to/archive.db --json
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.bench import DEFAULT_DATA_DIR, Case, _summary, build_app, ensure_archive, pick_context
+
+ENGINES = ('sqlite', 'duckdb')
+
+CASES = [
+    Case('players.career_batting', 'GET', '/api/players/{batsman_id}/stats', None),
+    Case('players.career_bowling', 'GET', '/api/players/{bowler_id}/stats', None),
+    Case('deliveries.filter_career', 'POST', '/api/deliveries/filter', lambda c: {
+        'batsman_id': c['batsman_id'], 'line': 'Outside Off'}),
+    Case('deliveries.filter_death_boundaries', 'POST', '/api/deliveries/filter', lambda c: {
+        'phase': 'Death', 'is_boundary': True}),
+    Case('deliveries.filter_bowling_type', 'POST', '/api/deliveries/filter', lambda c: {
+        'bowling_type': 'Leg Spin', 'over_from': 6, 'over_to': 15}),
+]
+
+
+def _normalize(body):
+    # Engines may differ in the last digits of a float
+    return json.loads(body, parse_float=lambda f: round(float(f), 6))
+
+
+def measure(db_path, repeat=10, warmup=2):
+    """Time every case on both engines against a working copy of db_path"""
+    workdir = tempfile.mkdtemp(prefix='cricket-engines-')
+    work_db = os.path.join(workdir, os.path.basename(db_path))
+    shutil.copyfile(db_path, work_db)
+
+    import models
+    import duckdb_engine
+    from config import Config
+    from database import Database
+    if not duckdb_engine.available():
+        raise SystemExit('duckdb is not installed')
+    models.db = Database(db_path=work_db, shard_dir='')
+    Config.DUCKDB_FOLDER = os.path.join(workdir, 'duckdb')
+    app = build_app()
+    client = app.test_client()
+    ctx = pick_context(models.db)
+
+    report = {'cases': {}, 'same_results': {}}
+    bodies = {}
+    try:
+        for engine in ENGINES:
+            Config.ANALYTICS_ENGINE = engine
+            started = time.perf_counter()
+            models.db.analytics()
+            report[f'{engine}_ready_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+            for case in CASES:
+                path = case.path.format(**ctx)
+                body = case.body(ctx) if case.body else None
+                for _ in range(warmup):
+                    client.open(path, method=case.method, json=body)
+                samples = []
+                for _ in range(repeat):
+                    t = time.perf_counter()
+                    response = client.open(path, method=case.method, json=body)
+                    samples.append((time.perf_counter() - t) * 1000)
+                report['cases'].setdefault(case.name, {})[engine] = dict(
+                    _summary(samples), status=response.status_code, bytes=len(response.get_data()))
+                bodies.setdefault(case.name, {})[engine] = _normalize(response.get_data())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for name, by_engine in bodies.items():
+        report['same_results'][name] = by_engine['sqlite'] == by_engine['duckdb']
+    return report
+
+
+def _print_report(report):
+    print(f"{'':<36}{'sqlite ms':>12}{'duckdb ms':>12}{'speedup':>10}  same")
+    for name, by_engine in report['cases'].items():
+        sqlite_ms = by_engine['sqlite']['median_ms']
+        duck_ms = by_engine['duckdb']['median_ms']
+        speedup = sqlite_ms / duck_ms if duck_ms else float('inf')
+        print(f"{name:<36}{sqlite_ms:>12.2f}{duck_ms:>12.2f}{speedup:>9.1f}x  "
+              f"{'yes' if report['same_results'][name] else 'NO'}")
+    print(f"first use: sqlite {report['sqlite_ready_ms']} ms, "
+          f"duckdb {report['duckdb_ready_ms']} ms (includes the Parquet export)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SQLite vs DuckDB analytics engine')
+    parser.add_argument('--db', help='Archive to run against (default: generated)')
+    parser.add_argument('--seasons', type=int, default=3)
+    parser.add_argument('--matches-per-season', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--json', action='store_true', help='Print the raw report as JSON')
+    args = parser.parse_args()
+
+    db_path = args.db or ensure_archive(args.data_dir, args.seasons, args.matches_per_season, args.seed)
+    report = measure(db_path, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
@@ -0,0 +1,424 @@
+# backend/benchmarks/match_load.py
+#
+# End-to-end load of a match day, for capacity planning. A server (sync or
+# async mode, see benchmarks/viewers.py) is started on a throwaway copy of an
+# archive, and a recorded match from that archive is replayed ball by ball
+# through POST /api/deliveries/ into --matches fresh live matches, one scorer
+# each. Balls keep the recorded gaps between them (from the video
+# timestamps, --ball-seconds where there are none), divided by --speed.
+#
+# Alongside the scorers, for as long as the replay lasts:
+#   viewers   every --poll seconds: the last delivery, the scorecard and the
+#             over-by-over chart of the innings in play, revalidating with
+#             ETags like a browser
+#   analysts  every --think seconds: a POST /api/deliveries/filter query
+#   taggers   every --tag-interval seconds: the latest ball, then a PUT
+#             tagging its shot
+#
+# The report has throughput, p50/p95/p99 latency and error rate per endpoint,
+# and how far the scorers fell behind the replay schedule.
+#
+#   python -m benchmarks.match_load --speed 30 --viewers 500 --analysts 10 --taggers 4
+#   python -m benchmarks.match_load --db archive.db --match-id 17 --matches 4 --balls 120 --json
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.bench import DEFAULT_DATA_DIR, _summary, ensure_archive
+from benchmarks.viewers import MODES, _Connection, _start_server, _stop_server
+
+# Fields of a recorded delivery that the scorer posts again
+POSTED_FIELDS = (
+    'over_number', 'ball_number', 'batsman_id', 'non_striker_id', 'bowler_id',
+    'video_timestamp_start', 'video_timestamp_end', 'video_bookmark',
+    'bowling_type', 'delivery_type', 'line', 'length',
+    'pitch_x', 'pitch_y', 'movement', 'pace',
+    'shot_type', 'shot_connection', 'wagon_x', 'wagon_y', 'wagon_zone',
+    'runs_scored', 'runs_off_bat', 'extras', 'extra_type',
+    'is_boundary', 'is_six', 'is_wicket', 'wicket_type', 'fielder_id', 'dismissed_batsman_id',
+    'appeal', 'drs_review', 'drs_outcome',
+    'control_percentage', 'is_false_shot', 'is_beaten', 'is_play_and_miss',
+    'tags', 'notes', 'highlight',
+)
+
+# What a live-match page polls; {innings_id} is the innings in play
+VIEWER_PATHS = (
+    ('deliveries.last', '/api/deliveries/last/{innings_id}'),
+    ('innings.scorecard', '/api/innings/{innings_id}/scorecard'),
+    ('analysis.over_by_over', '/api/analysis/over_by_over/{innings_id}'),
+)
+
+# Longest pause kept from the recording (innings breaks, rain)
+MAX_GAP = 300
+
+# Seconds between the servers being ready and the first ball
+LEAD_IN = 3.0
+
+
+# --- Replay ---------------------------------------------------------------
+
+def _source_match(database, match_id=None):
+    """The recorded match to replay: match_id, or the archive's longest completed one"""
+    if match_id is None:
+        row = database.fetch_one("""
+            SELECT m.id FROM matches m JOIN deliveries d ON d.match_id = m.id
+            GROUP BY m.id ORDER BY COUNT(*) DESC, m.id LIMIT 1
+        """)
+        if row is None:
+            raise SystemExit('The archive has no deliveries to replay')
+        match_id = row['id']
+    match = database.fetch_one("SELECT * FROM matches WHERE id = ?", (match_id,))
+    if match is None:
+        raise SystemExit(f'No match {match_id} in the archive')
+    innings = database.fetch_all(
+        "SELECT * FROM innings WHERE match_id = ? ORDER BY innings_number", (match_id,))
+    deliveries = database.fetch_all("""
+        SELECT d.*, i.innings_number FROM deliveries d
+        JOIN innings i ON i.id = d.innings_id
+        WHERE d.match_id = ? ORDER BY i.innings_number, d.id
+    """, (match_id,))
+    return match, innings, deliveries
+
+
+def _schedule(deliveries, speed, ball_seconds):
+    """Seconds after the first ball at which each ball is posted"""
+    offsets, at, previous = [], 0.0, None
+    for d in deliveries:
+        started = d['video_timestamp_start']
+        if previous is not None:
+            gap = started - previous if started is not None and started > previous else ball_seconds
+            at += min(gap, MAX_GAP) / speed
+        offsets.append(round(at, 3))
+        previous = started if started is not None else (previous or 0) + ball_seconds
+    return offsets
+
+
+def _posted(d, match_id, innings_id):
+    body = {f: d[f] for f in POSTED_FIELDS if d.get(f) is not None}
+    if isinstance(body.get('tags'), str):
+        body['tags'] = json.loads(body['tags'])
+    body.update(match_id=match_id, innings_id=innings_id)
+    return body
+
+
+def _prepare(db_path, workdir, source_id, matches, speed, ball_seconds, limit):
+    """Throwaway copy of the archive with `matches` empty live copies of the source match"""
+    from database import Database
+
+    work_db = os.path.join(workdir, os.path.basename(db_path))
+    shutil.copyfile(db_path, work_db)
+    database = Database(db_path=work_db, shard_dir='')
+    match, innings, deliveries = _source_match(database, source_id)
+    deliveries = deliveries[:limit] if limit else deliveries
+    if not deliveries:
+        raise SystemExit(f"Match {match['id']} has no deliveries to replay")
+    offsets = _schedule(deliveries, speed, ball_seconds)
+
+    replays = []
+    for n in range(matches):
+        match_id = database.insert("""
+            INSERT INTO matches (match_title, match_format, venue, match_date, team_home_id, team_away_id, status)
+            VALUES (?, ?, ?, ?, ?, ?, 'Live')
+        """, (f"Replay {n + 1} of {match['match_title']}", match['match_format'], match['venue'],
+              match['match_date'], match['team_home_id'], match['team_away_id']))
+        innings_ids = {i['innings_number']: database.insert("""
+            INSERT INTO innings (match_id, innings_number, batting_team_id, bowling_team_id)
+            VALUES (?, ?, ?, ?)
+        """, (match_id, i['innings_number'], i['batting_team_id'], i['bowling_team_id'])) for i in innings}
+        balls = [_posted(d, match_id, innings_ids[d['innings_number']]) for d in deliveries]
+        # The innings in play from each offset on, for viewers and taggers
+        phases = [(offsets[k], b['innings_id']) for k, b in enumerate(balls)
+                  if k == 0 or b['innings_id'] != balls[k - 1]['innings_id']]
+        replays.append({'match_id': match_id, 'balls': balls, 'phases': phases})
+
+    # Analysts ask across the archive and of the live matches
+    top = database.fetch_one("""
+        SELECT batsman_id, bowler_id FROM deliveries WHERE match_id = ?
+        GROUP BY batsman_id ORDER BY SUM(runs_off_bat) DESC LIMIT 1
+    """, (match['id'],))
+    queries = [
+        {'batsman_id': top['batsman_id']},
+        {'bowler_id': top['bowler_id'], 'phase': 'Death'},
+        {'phase': 'Death', 'is_boundary': True},
+        {'batsman_id': top['batsman_id'], 'line': 'Outside Off'},
+    ] + [{'match_id': r['match_id'], 'is_wicket': True} for r in replays]
+    return work_db, {'source_match_id': match['id'], 'offsets': offsets, 'replays': replays, 'queries': queries}
+
+
+# --- Clients --------------------------------------------------------------
+
+class _Stats:
+    """Latencies (ms) of successful requests and failure count, per endpoint"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.failures = {}
+
+    def record(self, endpoint, started, ok):
+        elapsed = (time.perf_counter() - started) * 1000
+        self.latencies.setdefault(endpoint, [])
+        self.failures.setdefault(endpoint, 0)
+        if ok:
+            self.latencies[endpoint].append(elapsed)
+        else:
+            self.failures[endpoint] += 1
+
+
+_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError)
+
+
+async def _call(connection, stats, endpoint, timeout, method, path, headers=(), body=None, expect=(200,)):
+    """One request, recorded under endpoint; returns (status, headers, body) or None if it failed"""
+    t = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(connection.request(method, path, headers, body), timeout)
+    except _ERRORS:
+        connection.close()
+        stats.record(endpoint, t, False)
+        return None
+    stats.record(endpoint, t, response[0] in expect)
+    return response
+
+
+def _in_play(phases, offset):
+    innings_id = phases[0][1]
+    for starts_at, innings in phases:
+        if offset < starts_at:
+            break
+        innings_id = innings
+    return innings_id
+
+
+async def _scorer(host, port, replay, offsets, start, stop, timeout, stats, lags):
+    connection = _Connection(host, port)
+    try:
+        for at, ball in zip(offsets, replay['balls']):
+            if start + at >= stop:
+                break
+            await asyncio.sleep(max(start + at - time.time(), 0))
+            # Behind schedule when the previous post took longer than the gap
+            lags.append(max(time.time() - start - at, 0))
+            await _call(connection, stats, 'deliveries.create', timeout, 'POST', '/api/deliveries/',
+                        body=ball, expect=(201,))
+    finally:
+        connection.close()
+
+
+async def _viewer(host, port, replay, start, arrival, stop, poll, timeout, stats):
+    await asyncio.sleep(max(start + arrival - time.time(), 0))
+    connection = _Connection(host, port)
+    etags = {}
+    try:
+        while time.time() < stop:
+            round_started = time.time()
+            innings_id = _in_play(replay['phases'], round_started - start)
+            for endpoint, template in VIEWER_PATHS:
+                path = template.format(innings_id=innings_id)
+                headers = [('If-None-Match', etags[path])] if path in etags else ()
+                response = await _call(connection, stats, endpoint, timeout, 'GET', path, headers,
+                                       expect=(200, 304))
+                if response and 'etag' in response[1]:
+                    etags[path] = response[1]['etag']
+            await asyncio.sleep(max(poll - (time.time() - round_started), 0))
+    finally:
+        connection.close()
+
+
+async def _analyst(host, port, queries, first, start, arrival, stop, think, timeout, stats):
+    await asyncio.sleep(max(start + arrival - time.time(), 0))
+    connection = _Connection(host, port)
+    n = first
+    try:
+        while time.time() < stop:
+            started = time.time()
+            await _call(connection, stats, 'deliveries.filter', timeout, 'POST', '/api/deliveries/filter',
+                        body=queries[n % len(queries)])
+            n += 1
+            await asyncio.sleep(max(think - (time.time() - started), 0))
+    finally:
+        connection.close()
+
+
+async def _tagger(host, port, replay, start, arrival, stop, interval, timeout, stats):
+    await asyncio.sleep(max(start + arrival - time.time(), 0))
+    connection = _Connection(host, port)
+    shots = ('Drive', 'Cut', 'Pull', 'Sweep', 'Flick', 'Defend')
+    n = 0
+    try:
+        while time.time() < stop:
+            started = time.time()
+            innings_id = _in_play(replay['phases'], started - start)
+            response = await _call(connection, stats, 'deliveries.last', timeout, 'GET',
+                                   f'/api/deliveries/last/{innings_id}', [('Accept-Encoding', 'identity')])
+            latest = json.loads(response[2]) if response and response[0] == 200 else None
+            if latest and latest.get('id'):
+                await _call(connection, stats, 'deliveries.update', timeout, 'PUT',
+                            f"/api/deliveries/{latest['id']}",
+                            body={'shot_type': shots[n % len(shots)], 'tags': ['tagged'], 'notes': 'load test'})
+                n += 1
+            await asyncio.sleep(max(interval - (time.time() - started), 0))
+    finally:
+        connection.close()
+
+
+async def _drive(host, port, plan, share, start, stop, settings):
+    """One load process's share of scorers, viewers, analysts and taggers"""
+    stats, lags = _Stats(), []
+    replays, poll, timeout = plan['replays'], settings['poll'], settings['timeout']
+    clients = []
+    for n in share['scorers']:
+        clients.append(_scorer(host, port, replays[n], plan['offsets'], start, stop, timeout, stats, lags))
+    # Clients of a kind arrive spread over one of their intervals, not in lockstep
+    for n in share['viewers']:
+        clients.append(_viewer(host, port, replays[n % len(replays)], start, poll * n / settings['viewers'],
+                               stop, poll, timeout, stats))
+    for n in share['analysts']:
+        think = settings['think']
+        clients.append(_analyst(host, port, plan['queries'], n, start, think * n / settings['analysts'],
+                                stop, think, timeout, stats))
+    for n in share['taggers']:
+        interval = settings['tag_interval']
+        clients.append(_tagger(host, port, replays[n % len(replays)], start, interval * n / settings['taggers'],
+                               stop, interval, timeout, stats))
+    await asyncio.gather(*clients)
+    return stats.latencies, stats.failures, lags
+
+
+def _drive_process(args):
+    return asyncio.run(_drive(*args))
+
+
+def _shares(load_procs, **counts):
+    """Client numbers dealt round-robin over the load processes"""
+    return [{kind: list(range(n, count, load_procs)) for kind, count in counts.items()}
+            for n in range(load_procs)]
+
+
+# --- Benchmark ------------------------------------------------------------
+
+def measure(db_path, mode='sync', match_id=None, matches=1, speed=1.0, ball_seconds=30.0, balls=None,
+            viewers=100, analysts=5, taggers=2, poll=2.0, think=5.0, tag_interval=10.0, timeout=10.0,
+            duration=None, load_procs=None, port=5078):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    load_procs = load_procs or max((os.cpu_count() or 2) // 2, 1)
+    settings = {'poll': poll, 'think': think, 'tag_interval': tag_interval, 'timeout': timeout,
+                'viewers': viewers, 'analysts': analysts, 'taggers': taggers}
+
+    workdir = tempfile.mkdtemp(prefix='cricket-match-load-')
+    try:
+        work_db, plan = _prepare(db_path, workdir, match_id, matches, speed, ball_seconds, balls)
+        env = dict(os.environ, PROFILING='0', PYTHONUNBUFFERED='1')
+        process = _start_server(mode, work_db, port, env)
+        try:
+            start = time.time() + LEAD_IN
+            replay_s = plan['offsets'][-1]
+            # Pollers stay one refresh past the last ball, to see it
+            stop = start + (duration if duration is not None else replay_s + poll)
+            shares = _shares(load_procs, scorers=matches, viewers=viewers, analysts=analysts, taggers=taggers)
+            latencies, failures, lags = {}, {}, []
+            with ProcessPoolExecutor(max_workers=load_procs) as pool:
+                jobs = [('127.0.0.1', port, plan, share, start, stop, settings) for share in shares]
+                for ok, failed, lagged in pool.map(_drive_process, jobs):
+                    for endpoint, samples in ok.items():
+                        latencies.setdefault(endpoint, []).extend(samples)
+                    for endpoint, count in failed.items():
+                        failures[endpoint] = failures.get(endpoint, 0) + count
+                    lags.extend(lagged)
+            elapsed = stop - start
+        finally:
+            _stop_server(process)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    endpoints = {}
+    for endpoint in sorted(set(latencies) | set(failures)):
+        ok, failed = latencies.get(endpoint, []), failures.get(endpoint, 0)
+        total = len(ok) + failed
+        result = {
+            'requests': total,
+            'requests_per_s': round(total / elapsed, 1),
+            'error_rate': round(failed / total, 4) if total else 0.0,
+        }
+        if ok:
+            ordered = sorted(ok)
+            result.update(_summary(ordered))
+            result['p99_ms'] = round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3)
+        endpoints[endpoint] = result
+    return {
+        'settings': {
+            'mode': mode, 'source_match_id': plan['source_match_id'], 'matches': matches,
+            'balls_per_match': len(plan['offsets']), 'speed': speed, 'replay_s': round(replay_s, 1),
+            'viewers': viewers, 'analysts': analysts, 'taggers': taggers, 'poll_s': poll,
+            'think_s': think, 'tag_interval_s': tag_interval, 'load_procs': load_procs,
+        },
+        'elapsed_s': round(elapsed, 1),
+        'scorers': {
+            'balls_posted': len(lags),
+            'max_lag_s': round(max(lags), 3) if lags else None,
+            'p95_lag_s': round(sorted(lags)[min(len(lags) - 1, int(len(lags) * 0.95))], 3) if lags else None,
+        },
+        'endpoints': endpoints,
+    }
+
+
+def _print_report(report):
+    settings, scorers = report['settings'], report['scorers']
+    print(f"{settings['mode']} server: {settings['matches']} x match {settings['source_match_id']} "
+          f"({settings['balls_per_match']} balls at {settings['speed']}x, {settings['replay_s']} s), "
+          f"{settings['viewers']} viewers, {settings['analysts']} analysts, {settings['taggers']} taggers")
+    print(f"{'endpoint':<24}{'requests':>10}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for endpoint, r in report['endpoints'].items():
+        print(f"{endpoint:<24}{r['requests']:>10}{r['requests_per_s']:>9}{r.get('median_ms', '-'):>10}"
+              f"{r.get('p95_ms', '-'):>10}{r.get('p99_ms', '-'):>10}{r['error_rate']:>9.2%}")
+    print(f"scorers: {scorers['balls_posted']} balls, behind schedule by up to {scorers['max_lag_s']} s "
+          f"(p95 {scorers['p95_lag_s']} s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay a match under live-match load')
+    parser.add_argument('--db', help='Archive to copy and replay from (default: generated)')
+    parser.add_argument('--seasons', type=int, default=1)
+    parser.add_argument('--matches-per-season', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--mode', choices=MODES, default='sync', help='Serving mode of the local instance')
+    parser.add_argument('--match-id', type=int, default=None, help='Recorded match to replay (default: the longest)')
+    parser.add_argument('--matches', type=int, default=1, help='Live matches replayed at once, one scorer each')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay pace; 1 = as recorded')
+    parser.add_argument('--ball-seconds', type=float, default=30.0,
+                        help='Gap between balls where the recording has no video timestamps')
+    parser.add_argument('--balls', type=int, default=None, help='Replay only the first N balls')
+    parser.add_argument('--viewers', type=int, default=100)
+    parser.add_argument('--analysts', type=int, default=5)
+    parser.add_argument('--taggers', type=int, default=2)
+    parser.add_argument('--poll', type=float, default=2.0, help='Seconds between a viewer\'s refreshes')
+    parser.add_argument('--think', type=float, default=5.0, help='Seconds between an analyst\'s queries')
+    parser.add_argument('--tag-interval', type=float, default=10.0, help='Seconds between a tagger\'s edits')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Seconds before a request counts as failed')
+    parser.add_argument('--duration', type=float, default=None, help='Stop after this many seconds')
+    parser.add_argument('--load-procs', type=int, default=None)
+    parser.add_argument('--port', type=int, default=5078)
+    parser.add_argument('--json', action='store_true', help='Print the raw report as JSON')
+    args = parser.parse_args()
+
+    db_path = args.db or ensure_archive(args.data_dir, args.seasons, args.matches_per_season, args.seed)
+    report = measure(db_path, args.mode, args.match_id, args.matches, args.speed, args.ball_seconds, args.balls,
+                     args.viewers, args.analysts, args.taggers, args.poll, args.think, args.tag_interval,
+                     args.timeout, args.duration, args.load_procs, args.port)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
@@ -0,0 +1,131 @@
+# backend/benchmarks/startup.py
+#
+# Cold-start timing for the app factory. Each run is a fresh interpreter:
+# import + create_app(), then the first and second request, either with the
+# deferred work left to the first request (lazy) or done up front by an
+# explicit warm_up() (eager).
+#
+#   python -m benchmarks.startup --runs 10
+#   python -m benchmarks.startup --db /path/to/archive.db --path /api/players/
+#
+# Without --db a one-season synthetic archive is generated (and cached).
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.bench import DEFAULT_DATA_DIR, ensure_archive
+
+HEAVY_MODULES = ('numpy', 'sqlalchemy', 'requests', 'cv2', 'pandas')
+MODES = ('lazy', 'eager')
+
+
+def probe(db_path, mode, path):
+    """One cold start in this interpreter; returns timings in ms"""
+    workdir = tempfile.mkdtemp(prefix='cricket-startup-')
+    work_db = os.path.join(workdir, os.path.basename(db_path))
+    shutil.copyfile(db_path, work_db)
+    try:
+        started = time.perf_counter()
+        import models
+        from database import Database
+        models.db = Database(db_path=work_db, shard_dir='')
+        import app as app_module
+        app = app_module.app
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'teams.db')
+        ready = time.perf_counter()
+        result = {
+            'import_ms': (ready - started) * 1000,
+            'heavy_at_import': [m for m in HEAVY_MODULES if m in sys.modules],
+        }
+
+        if mode == 'eager':
+            app_module.warm_up(app)
+            result['warm_up_ms'] = (time.perf_counter() - ready) * 1000
+
+        client = app.test_client()
+        for label in ('first_request_ms', 'second_request_ms'):
+            t = time.perf_counter()
+            response = client.get(path)
+            result[label] = (time.perf_counter() - t) * 1000
+            result['status'] = response.status_code
+        result['to_first_response_ms'] = result['import_ms'] + result.get('warm_up_ms', 0) + result['first_request_ms']
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(db_path, runs=5, path='/api/players/'):
+    """Median of `runs` fresh processes per mode"""
+    report = {}
+    for mode in MODES:
+        samples = []
+        for _ in range(runs):
+            t = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.startup', 'probe', db_path, mode, '--path', path],
+                cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+            )
+            sample = json.loads(output.stdout.strip().splitlines()[-1])
+            sample['process_ms'] = (time.perf_counter() - t) * 1000
+            samples.append(sample)
+
+        summary = {}
+        for key in samples[0]:
+            if key.endswith('_ms'):
+                summary[key] = round(statistics.median(s[key] for s in samples), 2)
+        summary['status'] = samples[-1]['status']
+        summary['heavy_at_import'] = samples[-1]['heavy_at_import']
+        report[mode] = summary
+    return report
+
+
+def _print_report(report):
+    keys = ['import_ms', 'warm_up_ms', 'first_request_ms', 'second_request_ms',
+            'to_first_response_ms', 'process_ms']
+    print(f"{'':<22}" + ''.join(f'{mode:>12}' for mode in report))
+    for key in keys:
+        cells = ''.join(
+            f"{report[mode][key]:>12.1f}" if key in report[mode] else f"{'-':>12}"
+            for mode in report
+        )
+        print(f'{key:<22}{cells}')
+    for mode, summary in report.items():
+        print(f"{mode}: status {summary['status']}, heavy modules at import: "
+              f"{', '.join(summary['heavy_at_import']) or 'none'}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'probe':
+        p_probe = argparse.ArgumentParser()
+        p_probe.add_argument('db_path')
+        p_probe.add_argument('mode', choices=MODES)
+        p_probe.add_argument('--path', default='/api/players/')
+        args = p_probe.parse_args(sys.argv[2:])
+        print(json.dumps(probe(args.db_path, args.mode, args.path)))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description='Cold-start time of the app factory')
+    parser.add_argument('--db', help='Archive to start against (default: 1-season synthetic)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/api/players/', help='Endpoint for the first request')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--json', action='store_true', help='Print the raw report as JSON')
+    args = parser.parse_args()
+
+    db_path = args.db or ensure_archive(args.data_dir, 1, 60, 0)
+    report = run(db_path, args.runs, args.path)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
@@ -0,0 +1,309 @@
+# backend/benchmarks/synthetic_data.py
+#
+# Reproducible synthetic archive for benchmarking: N seasons of simulated
+# matches with ball-by-ball deliveries (coordinates, tags, video timestamps)
+# and every derived table rebuilt, so endpoints see realistic shapes.
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import models
+from database import Database
+
+TEAMS = [
+    ('Mumbai Indians', 'MI'), ('Chennai Super Kings', 'CSK'),
+    ('Royal Challengers', 'RCB'), ('Kolkata Knight Riders', 'KKR'),
+    ('Gujarat Titans', 'GT'), ('Rajasthan Royals', 'RR'),
+    ('Delhi Capitals', 'DC'), ('Sunrisers Hyderabad', 'SRH'),
+]
+FIRST_NAMES = ['Rohit', 'Virat', 'Jos', 'Rashid', 'Jasprit', 'Kane', 'Shubman', 'Faf',
+               'Trent', 'Sanju', 'David', 'Quinton', 'Hardik', 'Ravindra', 'Mitchell', 'Kagiso']
+LAST_NAMES = ['Sharma', 'Kohli', 'Buttler', 'Khan', 'Bumrah', 'Williamson', 'Gill', 'Plessis',
+              'Boult', 'Samson', 'Warner', 'Kock', 'Pandya', 'Jadeja', 'Starc', 'Rabada']
+VENUES = ['Wankhede', 'Chepauk', 'Chinnaswamy', 'Eden Gardens', 'Narendra Modi Stadium',
+          'Sawai Mansingh', 'Arun Jaitley', 'Rajiv Gandhi']
+
+SQUAD_SIZE = 15
+BATTING_STYLES = ['Right-hand bat', 'Left-hand bat']
+BOWLING_TYPES = ['Fast', 'Medium', 'Off Spin', 'Leg Spin', 'Left-arm Orthodox']
+LINES = ['Outside Off', 'Off Stump', 'Middle', 'Leg Stump', 'Outside Leg']
+LENGTHS = ['Yorker', 'Full', 'Good', 'Short of Good', 'Short']
+SHOTS = ['Drive', 'Cut', 'Pull', 'Flick', 'Sweep', 'Defence', 'Leave', 'Slog', 'Glance']
+TAGS = ['edge', 'slower ball', 'yorker', 'bouncer', 'drop catch', 'misfield', 'review', 'swing']
+NOTES = ['thick edge past slip', 'beaten outside off', 'top edge over keeper',
+         'clean strike down the ground', 'dropped at midwicket', None, None, None]
+WICKET_TYPES = ['Bowled', 'Caught', 'Caught', 'Caught', 'LBW', 'Run Out', 'Stumped']
+
+# Per legal ball outcome weights (runs off the bat)
+RUN_WEIGHTS = {0: 38, 1: 35, 2: 8, 3: 1, 4: 12, 6: 6}
+P_WICKET = 0.045
+P_EXTRA = {'Wide': 0.03, 'No Ball': 0.008, 'Bye': 0.01, 'Leg Bye': 0.012}
+
+SECONDS_PER_BALL = 35
+
+_DELIVERY_COLUMNS = (
+    'innings_id', 'match_id', 'over_number', 'ball_number', 'legal_ball_number',
+    'batsman_id', 'non_striker_id', 'bowler_id',
+    'video_timestamp_start', 'video_timestamp_end',
+    'bowling_type', 'line', 'length', 'pitch_x', 'pitch_y', 'pace',
+    'shot_type', 'wagon_x', 'wagon_y', 'wagon_zone',
+    'runs_scored', 'runs_off_bat', 'extras', 'extra_type',
+    'is_boundary', 'is_six', 'is_dot',
+    'is_wicket', 'wicket_type', 'fielder_id', 'dismissed_batsman_id',
+    'control_percentage', 'is_scoring_shot', 'is_false_shot', 'is_beaten',
+    'tags', 'notes', 'highlight', 'powerplay', 'phase'
+)
+
+
+def _phase(match_format, over):
+    powerplay, death = (6, 16) if match_format == 'T20' else (10, 40)
+    if over < powerplay:
+        return 'Powerplay'
+    return 'Death' if over >= death else 'Middle'
+
+
+def _wagon(rng, runs):
+    if runs == 0:
+        return None, None, None
+    angle = rng.uniform(0, 360)
+    distance = 1.0 if runs >= 4 else rng.uniform(0.2, 0.8)
+    zone = str(int(angle // 45) + 1)
+    return round(distance * rng.uniform(-1, 1), 3), round(distance * rng.uniform(-1, 1), 3), zone
+
+
+def simulate_innings(rng, ctx, batting, bowling, target=None):
+    """Ball-by-ball rows for one innings, stopping at all out, overs or the target"""
+    overs = ctx['overs']
+    order = rng.sample(batting, len(batting))[:11]
+    bowlers = rng.sample(bowling, 5)
+    striker, non_striker, next_in = order[0], order[1], 2
+    score = wickets = 0
+    clock = ctx['clock']
+    rows = []
+
+    for over in range(overs):
+        bowler = bowlers[over % len(bowlers)]
+        bowling_type = ctx['bowling_types'][bowler]
+        legal = ball = 0
+        while legal < 6:
+            ball += 1
+            extra_type, extras, runs_off_bat = 'None', 0, 0
+            roll = rng.random()
+            for kind, p in P_EXTRA.items():
+                if roll < p:
+                    extra_type = kind
+                    break
+                roll -= p
+            is_wicket = 0
+            if extra_type in ('Wide', 'No Ball'):
+                extras = 1
+            elif extra_type in ('Bye', 'Leg Bye'):
+                extras = rng.choice((1, 1, 2, 4))
+            elif rng.random() < P_WICKET:
+                is_wicket = 1
+            else:
+                runs_off_bat = rng.choices(list(RUN_WEIGHTS), weights=list(RUN_WEIGHTS.values()))[0]
+            if extra_type not in ('Wide', 'No Ball'):
+                legal += 1
+
+            runs = runs_off_bat + extras
+            score += runs
+            wicket_type = rng.choice(WICKET_TYPES) if is_wicket else None
+            wagon_x, wagon_y, zone = _wagon(rng, runs_off_bat)
+            tags = rng.sample(TAGS, rng.randint(1, 2)) if rng.random() < 0.15 else None
+            control = rng.choice((100, 100, 100, 80, 50, 0))
+            phase = _phase(ctx['format'], over)
+            rows.append((
+                ctx['innings_id'], ctx['match_id'], over, ball, legal if extra_type not in ('Wide', 'No Ball') else None,
+                striker, non_striker, bowler,
+                clock, clock + 8,
+                bowling_type, rng.choice(LINES), rng.choice(LENGTHS),
+                round(rng.uniform(-1.2, 1.2), 3), round(rng.uniform(0.5, 12), 2),
+                round(rng.uniform(110, 150) if bowling_type in ('Fast', 'Medium') else rng.uniform(75, 95), 1),
+                rng.choice(SHOTS), wagon_x, wagon_y, zone,
+                runs, runs_off_bat, extras, extra_type,
+                1 if runs_off_bat == 4 else 0, 1 if runs_off_bat == 6 else 0,
+                1 if runs == 0 and extra_type == 'None' else 0,
+                is_wicket, wicket_type,
+                rng.choice(bowling) if wicket_type in ('Caught', 'Run Out', 'Stumped') else None,
+                striker if is_wicket else None,
+                control, 1 if runs_off_bat > 0 else 0, 1 if control <= 50 else 0, 1 if control == 0 else 0,
+                json.dumps(tags) if tags else None, rng.choice(NOTES),
+                1 if is_wicket or runs_off_bat == 6 else 0,
+                1 if phase == 'Powerplay' else 0, phase
+            ))
+            clock += SECONDS_PER_BALL
+
+            if is_wicket:
+                wickets += 1
+                if wickets == 10 or next_in >= len(order):
+                    ctx['clock'] = clock
+                    return rows, score
+                striker = order[next_in]
+                next_in += 1
+            elif runs_off_bat % 2 == 1:
+                striker, non_striker = non_striker, striker
+            if target is not None and score >= target:
+                ctx['clock'] = clock
+                return rows, score
+        striker, non_striker = non_striker, striker
+        clock += 60  # change of ends
+
+    ctx['clock'] = clock
+    return rows, score
+
+
+def generate(db_path, seasons=1, matches_per_season=60, seed=0, first_season=2020, rebuild=True):
+    """Create db_path from schema.sql and fill it; returns row counts"""
+    started = time.time()
+    rng = random.Random(seed)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    # Always a single file (an empty shard_dir overrides DELIVERY_SHARDING)
+    database = Database(db_path=db_path, shard_dir='')
+    database.init_db()
+
+    conn = database.get_connection()
+    try:
+        team_ids, team_names, squads, bowling_types = [], {}, {}, {}
+        for name, short in TEAMS:
+            team_id = conn.execute(
+                "INSERT INTO teams (name, short_name) VALUES (?, ?)", (name, short)
+            ).lastrowid
+            team_ids.append(team_id)
+            team_names[team_id] = name
+            squads[team_id] = []
+            for n in range(SQUAD_SIZE):
+                role = 'Batsman' if n < 6 else ('All-rounder' if n < 8 else 'Bowler')
+                bowling_style = rng.choice(BOWLING_TYPES)
+                player_id = conn.execute("""
+                    INSERT INTO players (first_name, last_name, team_id, batting_style,
+                                         bowling_style, player_role, jersey_number)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), team_id,
+                    rng.choice(BATTING_STYLES), bowling_style, role, n + 1
+                )).lastrowid
+                squads[team_id].append(player_id)
+                bowling_types[player_id] = bowling_style
+
+        placeholders = ', '.join('?' for _ in _DELIVERY_COLUMNS)
+        insert_sql = f"INSERT INTO deliveries ({', '.join(_DELIVERY_COLUMNS)}) VALUES ({placeholders})"
+        deliveries = 0
+        match_count = 0
+
+        for season in range(first_season, first_season + seasons):
+            for n in range(matches_per_season):
+                home, away = rng.sample(team_ids, 2)
+                match_format = 'ODI' if rng.random() < 0.2 else 'T20'
+                toss_winner = rng.choice((home, away))
+                bat_first = toss_winner if rng.random() < 0.5 else (away if toss_winner == home else home)
+                bat_second = away if bat_first == home else home
+                match_id = conn.execute("""
+                    INSERT INTO matches (match_title, match_format, team_home_id, team_away_id,
+                                         venue, match_date, toss_winner_id, toss_decision,
+                                         status, video_path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'Completed', ?)
+                """, (
+                    f'Match {n + 1}, {season}', match_format, home, away, rng.choice(VENUES),
+                    f'{season}-{3 + n * 8 // matches_per_season:02d}-{1 + n % 28:02d}',
+                    toss_winner, 'Bat' if toss_winner == bat_first else 'Bowl',
+                    f'match_{season}_{n + 1}.mp4'
+                )).lastrowid
+                match_count += 1
+
+                ctx = {
+                    'match_id': match_id, 'format': match_format,
+                    'overs': 20 if match_format == 'T20' else 50,
+                    'bowling_types': bowling_types, 'clock': 0.0,
+                }
+                target = None
+                scores = {}
+                for number, (batting, bowling) in enumerate(
+                        ((bat_first, bat_second), (bat_second, bat_first)), start=1):
+                    ctx['innings_id'] = conn.execute("""
+                        INSERT INTO innings (match_id, innings_number, batting_team_id, bowling_team_id)
+                        VALUES (?, ?, ?, ?)
+                    """, (match_id, number, batting, bowling)).lastrowid
+                    rows, scores[batting] = simulate_innings(
+                        rng, ctx, squads[batting], squads[bowling], target
+                    )
+                    conn.executemany(insert_sql, rows)
+                    deliveries += len(rows)
+                    target = scores[batting] + 1
+                    ctx['clock'] += 20 * 60  # innings break
+
+                if scores[bat_first] != scores[bat_second]:
+                    winner = max(scores, key=scores.get)
+                    conn.execute(
+                        "UPDATE matches SET winner_id = ?, match_result = ?, video_duration = ? WHERE id = ?",
+                        (winner, f'{team_names[winner]} won', ctx['clock'], match_id)
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE matches SET match_result = 'Tie', video_duration = ? WHERE id = ?",
+                        (ctx['clock'], match_id)
+                    )
+            conn.commit()
+
+        conn.execute("""
+            UPDATE innings SET
+                total_runs = (SELECT COALESCE(SUM(runs_scored), 0) FROM deliveries d WHERE d.innings_id = innings.id),
+                total_wickets = (SELECT COUNT(CASE WHEN is_wicket = 1 THEN 1 END) FROM deliveries d WHERE d.innings_id = innings.id),
+                total_overs = (SELECT (COUNT(*) / 6) + (COUNT(*) % 6) / 10.0 FROM deliveries d
+                               WHERE d.innings_id = innings.id AND extra_type IN ('None', 'Bye', 'Leg Bye')),
+                extras_total = (SELECT COALESCE(SUM(extras), 0) FROM deliveries d WHERE d.innings_id = innings.id)
+        """)
+        conn.commit()
+    finally:
+        conn.close()
+
+    if rebuild:
+        _rebuild_derived(database)
+
+    return {
+        'seasons': seasons,
+        'matches': match_count,
+        'deliveries': deliveries,
+        'seconds': round(time.time() - started, 2),
+        'path': db_path,
+    }
+
+
+def _rebuild_derived(database):
+    """Fill the derived tables the way a live archive would have them"""
+    # Services bind models.db when first imported
+    models.db = database
+    from services.analytics_engine import rebuild_over_summary
+    from services.partnership_engine import rebuild_partnerships
+    from services.matchup_matrix import rebuild_matchups
+    from services.leaderboards import rebuild_leaderboards
+
+    rebuild_over_summary()
+    rebuild_partnerships()
+    rebuild_matchups()
+    rebuild_leaderboards()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic cricket archive')
+    parser.add_argument('db_path')
+    parser.add_argument('--seasons', type=int, default=1)
+    parser.add_argument('--matches-per-season', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--first-season', type=int, default=2020)
+    parser.add_argument('--no-rebuild', action='store_true', help='Skip the derived tables')
+    args = parser.parse_args()
+
+    result = generate(args.db_path, args.seasons, args.matches_per_season, args.seed,
+                      args.first_season, rebuild=not args.no_rebuild)
+    print(f"{result['matches']} matches, {result['deliveries']} deliveries "
+          f"in {result['seconds']}s -> {result['path']}")
@@ -0,0 +1,382 @@
+# backend/benchmarks/viewers.py
+#
+# Concurrent-viewer capacity of the two serving modes: sync (the Flask app
+# under app.run, a thread per connection) and async (asgi.py under uvicorn).
+# Each mode is started as a server on a copy of a generated archive, with
+# cricapi replaced by a local stub that answers after --upstream-delay, and
+# a scorer posts a ball every --ball-interval seconds into a live innings.
+#
+# Every simulated viewer keeps one connection open and, every --poll
+# seconds, fetches what a live-match page polls: the live-matches feed, the
+# scoreboard, the last delivery and the scorecard, revalidating with the
+# ETag of its previous answer where there was one. Viewer counts go up in
+# --steps until the 95th percentile latency passes --slo or more than 1% of
+# requests fail; a mode's capacity is the last step that held.
+#
+#   python -m benchmarks.viewers --steps 100 200 400 800 1600
+#   python -m benchmarks.viewers --modes async --poll 1 --duration 20 --json
+#
+# The viewers run in --load-procs processes next to the server; on a small
+# machine they compete with it for CPU, so compare modes on the same box.
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.bench import DEFAULT_DATA_DIR, _new_ball, _summary, ensure_archive, pick_context
+
+MODES = ('sync', 'async')
+
+VIEWER_PATHS = (
+    '/api/live-matches',
+    '/api/innings/match/{live_match_id}',
+    '/api/deliveries/last/{live_innings_id}',
+    '/api/innings/{live_innings_id}/scorecard',
+)
+
+# Balls already bowled in the live innings when viewers arrive
+OPENING_BALLS = 60
+
+
+# --- Servers --------------------------------------------------------------
+
+def serve(mode, db_path, port):
+    """Run one mode's server in this process (the benchmark starts it as a subprocess)"""
+    import logging
+    import models
+    from database import Database
+
+    models.db = Database(db_path=db_path, shard_dir='')
+    import app as app_module
+    app_module.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(
+        os.path.dirname(db_path), 'teams.db')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    if mode == 'sync':
+        app_module.warm_up(app_module.app)
+        app_module.app.run(host='127.0.0.1', port=port, threaded=True)
+    else:
+        import uvicorn
+        import asgi
+        uvicorn.run(asgi.application, host='127.0.0.1', port=port, log_level='warning',
+                    backlog=4096, timeout_keep_alive=60)
+
+
+class _Upstream(BaseHTTPRequestHandler):
+    """cricapi's currentMatches, after a delay"""
+
+    protocol_version = 'HTTP/1.1'
+    delay = 0.3
+    body = json.dumps({
+        'status': 'success',
+        'data': [{'id': f'match-{n}', 'name': f'Team {n} vs Team {n + 1}', 'matchType': 't20',
+                  'status': 'Live', 'venue': 'Stadium', 'score': [{'r': 150, 'w': 4, 'o': 18.2}]}
+                 for n in range(30)],
+    }).encode()
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_upstream(delay):
+    _Upstream.delay = delay
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Upstream)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _start_server(mode, db_path, port, env):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.viewers', 'serve', mode, db_path, str(port)],
+        cwd=BACKEND_DIR, env=env,
+    )
+    import httpx
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'{mode} server exited with {process.returncode}')
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/api/matches/teams', timeout=2).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f'{mode} server did not start')
+
+
+def _stop_server(process):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# --- Viewers --------------------------------------------------------------
+
+class _Connection:
+    """One client's keep-alive HTTP/1.1 connection: a request out, a Content-Length body in.
+
+    Far cheaper per request than a general client, so the viewers rather
+    than the client library set the load.
+    """
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=(), body=None):
+        """Send one request (body as JSON); returns status, lower-cased headers and the raw body"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        headers = list(headers)
+        if not any(k.lower() == 'accept-encoding' for k, _ in headers):
+            headers.append(('Accept-Encoding', 'gzip, br'))
+        payload = b''
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers += [('Content-Type', 'application/json'), ('Content-Length', str(len(payload)))]
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}']
+        lines.extend(f'{k}: {v}' for k, v in headers)
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+        head = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(head[0].split(' ', 2)[1])
+        response_headers = {}
+        for line in head[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                response_headers[name.strip().lower()] = value.strip()
+        if 'content-length' in response_headers:
+            data = await self.reader.readexactly(int(response_headers['content-length']))
+        elif status != 304:
+            data = await self.reader.read()  # Body runs to the end of the connection
+            self.close()
+        else:
+            data = b''
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, response_headers, data
+
+    async def get(self, path, headers=()):
+        status, response_headers, _ = await self.request('GET', path, headers)
+        return status, response_headers
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def _viewer(host, port, paths, start_at, stop_at, poll, timeout, latencies, failures):
+    await asyncio.sleep(max(start_at - time.monotonic(), 0))
+    connection = _Connection(host, port)
+    etags = {}
+    try:
+        while time.monotonic() < stop_at:
+            round_started = time.monotonic()
+            for path in paths:
+                t = time.perf_counter()
+                try:
+                    # Revalidate like a browser would when the last answer had an ETag
+                    headers = [('If-None-Match', etags[path])] if path in etags else ()
+                    status, response_headers = await asyncio.wait_for(connection.get(path, headers), timeout)
+                    ok = status in (200, 304)
+                    if 'etag' in response_headers:
+                        etags[path] = response_headers['etag']
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    connection.close()
+                    ok = False
+                (latencies if ok else failures).append((time.perf_counter() - t) * 1000)
+            await asyncio.sleep(max(poll - (time.monotonic() - round_started), 0))
+    finally:
+        connection.close()
+
+
+async def _drive(host, port, paths, viewers, duration, poll, timeout):
+    latencies, failures = [], []
+    now = time.monotonic()
+    # Viewers arrive spread over one poll interval, not in lockstep
+    await asyncio.gather(*[
+        _viewer(host, port, paths, now + poll * n / viewers, now + duration, poll, timeout, latencies, failures)
+        for n in range(viewers)
+    ])
+    return latencies, failures
+
+
+def _drive_process(args):
+    return asyncio.run(_drive(*args))
+
+
+def _scorer(base_url, ctx, interval, stop):
+    import httpx
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        while not stop.wait(interval):
+            try:
+                client.post('/api/deliveries/', json=_new_ball(ctx))
+            except httpx.HTTPError:
+                pass
+
+
+def load_step(port, paths, viewers, duration, poll, timeout, load_procs, ctx, ball_interval):
+    """One step: viewers spread over load_procs processes for duration seconds"""
+    base_url = f'http://127.0.0.1:{port}'
+    per_proc = [viewers // load_procs + (1 if n < viewers % load_procs else 0) for n in range(load_procs)]
+    stop = threading.Event()
+    scorer = threading.Thread(target=_scorer, args=(base_url, ctx, ball_interval, stop), daemon=True)
+    scorer.start()
+    started = time.perf_counter()
+    latencies, failures = [], []
+    with ProcessPoolExecutor(max_workers=load_procs) as pool:
+        jobs = [('127.0.0.1', port, paths, n, duration, poll, timeout) for n in per_proc if n]
+        for ok, failed in pool.map(_drive_process, jobs):
+            latencies.extend(ok)
+            failures.extend(failed)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    scorer.join()
+
+    total = len(latencies) + len(failures)
+    result = {
+        'viewers': viewers,
+        'requests': total,
+        'requests_per_s': round(total / elapsed, 1),
+        'error_rate': round(len(failures) / total, 4) if total else 1.0,
+    }
+    if latencies:
+        ordered = sorted(latencies)
+        result.update(_summary(ordered))
+        result['p99_ms'] = round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3)
+    return result
+
+
+# --- Benchmark ------------------------------------------------------------
+
+def _prepare(db_path, workdir):
+    """Working copy of the archive with a live match in progress; returns it and the ids"""
+    work_db = os.path.join(workdir, os.path.basename(db_path))
+    shutil.copyfile(db_path, work_db)
+    from database import Database
+    database = Database(db_path=work_db, shard_dir='')
+    return work_db, pick_context(database)
+
+
+def measure(db_path, modes=MODES, steps=(50, 100, 200, 400, 800), duration=15, poll=2.0, slo=500.0,
+            timeout=10.0, upstream_delay=0.3, live_ttl=None, ball_interval=2.0, load_procs=None, port=5077):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    load_procs = load_procs or max((os.cpu_count() or 2) // 2, 1)
+
+    upstream = _start_upstream(upstream_delay)
+    report = {'settings': {
+        'steps': list(steps), 'duration_s': duration, 'poll_s': poll, 'slo_p95_ms': slo,
+        'upstream_delay_s': upstream_delay, 'load_procs': load_procs,
+    }, 'modes': {}}
+    try:
+        for mode in modes:
+            workdir = tempfile.mkdtemp(prefix=f'cricket-viewers-{mode}-')
+            work_db, ctx = _prepare(db_path, workdir)
+            env = dict(os.environ, CRICAPI_URL=f'http://127.0.0.1:{upstream.server_port}/v1/currentMatches',
+                       PROFILING='0', PYTHONUNBUFFERED='1')
+            if live_ttl is not None:
+                env['LIVE_MATCHES_TTL'] = str(live_ttl)
+            process = _start_server(mode, work_db, port, env)
+            base_url = f'http://127.0.0.1:{port}'
+            try:
+                import httpx
+                with httpx.Client(base_url=base_url, timeout=30) as client:
+                    for _ in range(OPENING_BALLS):
+                        client.post('/api/deliveries/', json=_new_ball(ctx))
+                paths = [p.format(**ctx) for p in VIEWER_PATHS]
+                results, capacity = [], 0
+                for viewers in steps:
+                    result = load_step(port, paths, viewers, duration, poll, timeout,
+                                       load_procs, ctx, ball_interval)
+                    held = result['error_rate'] <= 0.01 and result.get('p95_ms', float('inf')) <= slo
+                    result['held'] = held
+                    results.append(result)
+                    print(f"{mode:>5} {viewers:>6} viewers: {result['requests_per_s']:>8} req/s  "
+                          f"p95 {result.get('p95_ms', '-'):>9} ms  errors {result['error_rate']:.2%}",
+                          file=sys.stderr)
+                    if not held:
+                        break
+                    capacity = viewers
+                report['modes'][mode] = {'capacity': capacity, 'steps': results}
+            finally:
+                _stop_server(process)
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        upstream.shutdown()
+    return report
+
+
+def _print_report(report):
+    settings = report['settings']
+    print(f"p95 under {settings['slo_p95_ms']} ms, polling every {settings['poll_s']} s, "
+          f"cricapi answering in {settings['upstream_delay_s']} s")
+    print(f"{'mode':<8}{'viewers':>9}{'req/s':>10}{'median ms':>11}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for mode, data in report['modes'].items():
+        for step in data['steps']:
+            print(f"{mode:<8}{step['viewers']:>9}{step['requests_per_s']:>10}"
+                  f"{step.get('median_ms', '-'):>11}{step.get('p95_ms', '-'):>10}{step.get('p99_ms', '-'):>10}"
+                  f"{step['error_rate']:>9.2%}{'' if step['held'] else '  <- over'}")
+    print('capacity: ' + ', '.join(f"{mode} {data['capacity']} viewers" for mode, data in report['modes'].items()))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description='Concurrent-viewer capacity, sync vs async serving')
+    parser.add_argument('--db', help='Archive to run against (default: generated)')
+    parser.add_argument('--seasons', type=int, default=1)
+    parser.add_argument('--matches-per-season', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--steps', nargs='+', type=int, default=[50, 100, 200, 400, 800])
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per step')
+    parser.add_argument('--poll', type=float, default=2.0, help='Seconds between a viewer\'s refreshes')
+    parser.add_argument('--slo', type=float, default=500.0, help='p95 latency limit in ms')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Seconds before a request counts as failed')
+    parser.add_argument('--upstream-delay', type=float, default=0.3, help='Seconds the cricapi stub takes')
+    parser.add_argument('--live-ttl', type=float, default=None, help='LIVE_MATCHES_TTL for the servers')
+    parser.add_argument('--ball-interval', type=float, default=2.0, help='Seconds between scored balls')
+    parser.add_argument('--load-procs', type=int, default=None)
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--json', action='store_true', help='Print the raw report as JSON')
+    args = parser.parse_args()
+
+    db_path = args.db or ensure_archive(args.data_dir, args.seasons, args.matches_per_season, args.seed)
+    report = measure(db_path, args.modes, args.steps, args.duration, args.poll, args.slo, args.timeout,
+                     args.upstream_delay, args.live_ttl, args.ball_interval, args.load_procs, args.port)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
@@ -1,5 +1,6 @@
 # backend/config.py
 
+import datetime
 import os
 
 class Config:
@@ -13,4 +14,86 @@ class Config:
     
     # FFmpeg path (adjust for your system)
     FFMPEG_PATH = os.environ.get('FFMPEG_PATH', 'ffmpeg')
-    FFPROBE_PATH = os.environ.get('FFPROBE_PATH', 'ffprobe')
\ No newline at end of file
+    FFPROBE_PATH = os.environ.get('FFPROBE_PATH', 'ffprobe')
+    
+    # Projected-score / win-probability lookup tables (rebuilt offline)
+    WIN_PROBABILITY_MODEL_PATH = os.environ.get(
+        'WIN_PROBABILITY_MODEL_PATH',
+        os.path.join(BASE_DIR, '..', 'database', 'win_probability.npz')
+    )
+    
+    # Season sharding of deliveries (one SQLite file per season)
+    DELIVERY_SHARDING = os.environ.get('DELIVERY_SHARDING', '0') == '1'
+    SHARD_FOLDER = os.environ.get('SHARD_FOLDER', os.path.join(BASE_DIR, '..', 'database', 'shards'))
+    LIVE_SEASON = int(os.environ.get('LIVE_SEASON', datetime.date.today().year))
+    SHARD_FANOUT_WORKERS = int(os.environ.get('SHARD_FANOUT_WORKERS', os.cpu_count() or 4))
+    ARCHIVE_MMAP_SIZE = 256 * 1024 * 1024  # mmap for read-only archived seasons
+    
+    # Read-only copy for heavy analytic queries, refreshed via the backup API
+    ANALYTICS_SNAPSHOT = os.environ.get('ANALYTICS_SNAPSHOT', '0') == '1'
+    SNAPSHOT_FOLDER = os.environ.get('SNAPSHOT_FOLDER', os.path.join(BASE_DIR, '..', 'database', 'snapshot'))
+    SNAPSHOT_MAX_STALENESS = float(os.environ.get('SNAPSHOT_MAX_STALENESS', 30))  # seconds
+    
+    # Engine for long deliveries scans: 'sqlite' (the snapshot above) or 'duckdb'
+    ANALYTICS_ENGINE = os.environ.get('ANALYTICS_ENGINE', 'sqlite')
+    DUCKDB_SOURCE = os.environ.get('DUCKDB_SOURCE', 'parquet')  # or 'attach' (sqlite extension installed)
+    DUCKDB_FOLDER = os.environ.get('DUCKDB_FOLDER', os.path.join(BASE_DIR, '..', 'database', 'duckdb'))
+    DUCKDB_MAX_STALENESS = float(os.environ.get('DUCKDB_MAX_STALENESS', 60))  # seconds
+    DUCKDB_THREADS = int(os.environ.get('DUCKDB_THREADS', 0))  # 0 = DuckDB's default (all cores)
+    
+    # Single writer thread; writes arriving within the window share one commit
+    WRITE_QUEUE = os.environ.get('WRITE_QUEUE', '1') == '1'
+    GROUP_COMMIT_WINDOW = float(os.environ.get('GROUP_COMMIT_WINDOW', 0.002))  # seconds
+    GROUP_COMMIT_MAX_OPS = int(os.environ.get('GROUP_COMMIT_MAX_OPS', 256))
+    
+    # Per-request SQL/latency profiling exposed on /metrics (off: no hooks installed)
+    PROFILING = os.environ.get('PROFILING', '0') == '1'
+    PROFILING_QUERY_BUDGET = int(os.environ.get('PROFILING_QUERY_BUDGET', 50))  # statements per request
+    PROFILING_SLOW_STATEMENTS = 20
+    
+    # Keyset-paginated listings (matches, teams, clips, playlists)
+    LIST_PAGE_SIZE = int(os.environ.get('LIST_PAGE_SIZE', 50))
+    LIST_MAX_PAGE_SIZE = 500
+    
+    # Old matches moved out of the live database (gzip'd JSON lines)
+    MATCH_ARCHIVE_FOLDER = os.environ.get('MATCH_ARCHIVE_FOLDER', os.path.join(BASE_DIR, '..', 'database', 'archive'))
+    
+    # Incremental vacuum in short slices through the writer; interval 0 = no background job
+    COMPACTION_INTERVAL = float(os.environ.get('COMPACTION_INTERVAL', 0))  # seconds
+    COMPACTION_TIME_BUDGET = float(os.environ.get('COMPACTION_TIME_BUDGET', 2))  # seconds per run
+    COMPACTION_PAGES_PER_SLICE = 256
+    
+    # Scene-change detection for suggested delivery video timestamps
+    VIDEO_WORKERS = int(os.environ.get('VIDEO_WORKERS', os.cpu_count() or 4))
+    SCENE_SEGMENT_SECONDS = 120  # video handed to each pool task
+    SCENE_SAMPLE_FPS = 5
+    SCENE_CUT_THRESHOLD = 0.4  # Bhattacharyya distance between frame histograms
+    CUT_MERGE_GAP = 1.0  # seconds
+    DELIVERY_MIN_SECONDS = 3
+    DELIVERY_MAX_SECONDS = 20
+    
+    # Response encoding: compressed above the threshold, finished-match bodies cached
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # bytes
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5
+    RESPONSE_CACHE_BYTES = int(os.environ.get('RESPONSE_CACHE_BYTES', 64 * 1024 * 1024))
+    
+    # Player id -> name cache for delivery payloads (bounds staleness across workers)
+    PLAYER_CACHE_TTL = float(os.environ.get('PLAYER_CACHE_TTL', 300))  # seconds
+    
+    # Live-match feed proxied from CricketData (cricapi); one upstream answer serves every viewer for the TTL
+    CRICAPI_URL = os.environ.get('CRICAPI_URL', 'https://api.cricapi.com/v1/currentMatches')
+    CRICAPI_KEY = os.environ.get('CRICAPI_KEY', '1b3b6e52-10a7-4bb1-94ba-db9800b3ba12')
+    LIVE_MATCHES_TTL = float(os.environ.get('LIVE_MATCHES_TTL', 5))  # seconds; 0 = every request goes upstream
+    UPSTREAM_TIMEOUT = float(os.environ.get('UPSTREAM_TIMEOUT', 10))  # seconds
+    UPSTREAM_MAX_CONNECTIONS = int(os.environ.get('UPSTREAM_MAX_CONNECTIONS', 20))  # pooled, per worker
+    
+    # Season / format leaderboards (services/leaderboards.py)
+    LEADERBOARD_SIZE = int(os.environ.get('LEADERBOARD_SIZE', 10))
+    LEADERBOARD_MAX_SIZE = 100
+    LEADERBOARD_MIN_BALLS_FACED = int(os.environ.get('LEADERBOARD_MIN_BALLS_FACED', 60))  # to rank on strike rate
+    LEADERBOARD_MIN_BALLS_BOWLED = int(os.environ.get('LEADERBOARD_MIN_BALLS_BOWLED', 60))  # to rank on economy
+    
+    # Async serving (asgi.py): SQLite reads of the native views and the wrapped Flask app each get a thread pool
+    ASYNC_DB_WORKERS = int(os.environ.get('ASYNC_DB_WORKERS', 16))
+    ASYNC_WSGI_WORKERS = int(os.environ.get('ASYNC_WSGI_WORKERS', 10))
@@ -1,16 +1,105 @@
 import sqlite3
+import contextvars
 import os
+import queue
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from config import Config
+
+# Deliveries written to a season shard get ids from season * SHARD_ID_SPAN,
+# so a delivery id alone tells us which file to open.
+SHARD_ID_SPAN = 10 ** 7
+
+_fanout_pool = None
+_fanout_lock = threading.Lock()
+
+
+def _pool():
+    global _fanout_pool
+    with _fanout_lock:
+        if _fanout_pool is None:
+            _fanout_pool = ThreadPoolExecutor(
+                max_workers=Config.SHARD_FANOUT_WORKERS, thread_name_prefix='shard'
+            )
+    return _fanout_pool
+
+
+def dict_rows():
+    """Row factory that builds the plain dicts handlers and the JSON encoder use.
+
+    Column names are worked out once per statement rather than per row, and
+    there is no sqlite3.Row to copy into a dict afterwards.
+    """
+    last = [None, ()]
+
+    def factory(cursor, row):
+        description = cursor.description
+        if description is not last[0]:
+            last[0], last[1] = description, tuple(column[0] for column in description)
+        return dict(zip(last[1], row))
+    return factory
+
+
+def schema_statements(script):
+    """Split a SQL script into whole statements (trigger bodies stay in one piece)."""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        if not statement and (not line.strip() or line.lstrip().startswith('--')):
+            continue
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ''
+
+
+def merge_partials(rows, keys, sums):
+    """Combine per-shard partial aggregates: group on keys, add up the sums."""
+    merged = {}
+    for row in rows:
+        group = tuple(row[k] for k in keys)
+        if group not in merged:
+            merged[group] = dict(row)
+            continue
+        target = merged[group]
+        for field in sums:
+            target[field] = (target[field] or 0) + (row[field] or 0)
+    return list(merged.values())
+
 
 class Database:
-    def __init__(self):
+    # Swapped for a timing subclass when request profiling is on
+    connection_factory = sqlite3.Connection
+
+    def __init__(self, db_path=None, shard_dir=None, live_season=None):
         # Point to the database folder we created earlier
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self.db_path = os.path.join(base_dir, 'database', 'cricket.db')
+        self.db_path = db_path or os.path.join(base_dir, 'database', 'cricket.db')
         self.schema_path = os.path.join(base_dir, 'database', 'schema.sql')
 
+        # Deliveries can be partitioned into one file per season; matches,
+        # innings, players and derived tables always stay in this (core) file.
+        if shard_dir is None and Config.DELIVERY_SHARDING:
+            shard_dir = Config.SHARD_FOLDER
+        self.shard_dir = shard_dir
+        self.live_season = live_season or Config.LIVE_SEASON
+        self._shards = {}
+        self._match_seasons = {}
+        self._innings_matches = {}
+        self._shard_lock = threading.Lock()
+        self._snapshot = None
+        self._duckdb = None
+        self._writer = None
+        self._compactor = None
+        self._write_hooks = []
+
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Allows accessing columns by name
+        conn = sqlite3.connect(self.db_path, factory=self.connection_factory)
+        conn.row_factory = dict_rows()  # Rows are dicts keyed by column name
         return conn
 
     def init_db(self):
@@ -20,21 +109,744 @@ class Database:
             return
 
         with self.get_connection() as conn:
+            # Only takes effect on a new file; existing ones need enable_incremental_vacuum()
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
             with open(self.schema_path, 'r') as f:
                 conn.executescript(f.read())
         print("Database initialized successfully.")
 
+    def upgrade_schema(self):
+        """Create whatever schema.sql defines that this database lacks.
+
+        Every CREATE in the schema is IF NOT EXISTS; the DROP TABLE lines at
+        its top belong to init_db() only and are skipped here, so existing
+        rows are never touched. Returns the names of the tables added.
+        """
+        with open(self.schema_path, 'r') as f:
+            statements = [s for s in schema_statements(f.read())
+                          if not s.upper().startswith('DROP ')]
+        with self.get_connection() as conn:
+            before = {r['name'] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for statement in statements:
+                conn.execute(statement)
+            after = {r['name'] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        added = sorted(after - before)
+        if added:
+            # Derived tables start empty; their rebuild commands backfill them
+            print(f"Schema upgraded, new tables: {', '.join(added)}")
+        return added
+
+    def ensure_schema(self):
+        """Initialize a new database, or bring an existing one up to schema.sql."""
+        if not os.path.exists(self.schema_path):
+            print(f"Warning: Schema file not found at {self.schema_path}")
+            return
+        if self.fetch_one("SELECT 1 FROM sqlite_master WHERE type = 'table'") is None:
+            self.init_db()
+        else:
+            self.upgrade_schema()
+
     def fetch_all(self, query, params=()):
         """Helper to fetch all results as a list of dictionaries."""
         with self.get_connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def fetch_one(self, query, params=()):
+        """Helper to fetch a single row as a dictionary (or None)."""
+        with self.get_connection() as conn:
+            return conn.execute(query, params).fetchone()
+
+    def iterate(self, query, params=(), batch_size=5000):
+        """Stream rows as dictionaries without loading the whole result."""
+        conn = self.get_connection()
+        try:
             cursor = conn.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
 
     def execute(self, query, params=()):
         """Helper to execute a query (insert/update/delete)."""
-        with self.get_connection() as conn:
+        def run(conn):
             conn.execute(query, params)
+        self.write(run)
+
+    def insert(self, query, params=()):
+        """Helper to execute an insert and return the new row id."""
+        return self.write(lambda conn: conn.execute(query, params).lastrowid)
+
+    def execute_many(self, query, seq_of_params):
+        """Helper to run one statement for many parameter sets in a single commit."""
+        def run(conn):
+            conn.executemany(query, seq_of_params)
+        self.write(run)
+
+    # --- Writes ----------------------------------------------------------
+
+    def _primary(self):
+        return self
+
+    def _write_connection(self):
+        return self.get_connection()
+
+    def on_write_batch(self, hook):
+        """Register hook(innings_ids), called once per committed batch that touched those innings."""
+        self._write_hooks.append(hook)
+
+    def writer(self):
+        """The single writer thread for this database (None when WRITE_QUEUE is off)."""
+        if not Config.WRITE_QUEUE:
+            return None
+        with self._shard_lock:
+            if self._writer is None:
+                self._writer = WriteQueue(self)
+        return self._writer
+
+    def write(self, fn, innings=(), after=None):
+        """Run fn(conn) as one write on this file and return its result once committed.
+
+        Through the writer queue, fn shares a group commit with other requests'
+        writes; it must only write through conn. after(result) and the
+        innings hooks run once the batch is committed.
+        """
+        primary = self._primary()
+        writer = primary.writer()
+        if writer is not None and not writer.in_writer():
+            return writer.submit(self, fn, innings, after).result()
+
+        with self.transaction(writable=True) as conn:
+            result = fn(conn)
+        if after:
+            after(result)
+        primary.run_write_hooks(set(innings) - {None})
+        return result
+
+    def run_write_hooks(self, innings_ids):
+        if not innings_ids:
+            return
+        for hook in self._write_hooks:
+            hook(innings_ids)
+
+    @contextmanager
+    def transaction(self, writable=True):
+        """Yield a connection whose statements commit (or roll back) together.
+
+        The core file is always writable; the flag matters for archived shards.
+        """
+        conn = self.get_connection()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # --- Analytics snapshot --------------------------------------------
+
+    def snapshot(self):
+        """Handle for heavy read-only queries.
+
+        With ANALYTICS_SNAPSHOT on this is a backup copy at most
+        SNAPSHOT_MAX_STALENESS seconds old, so career/filter queries never
+        hold locks on the files the scorer writes to. Otherwise the primary.
+        """
+        if not Config.ANALYTICS_SNAPSHOT:
+            return self
+        with self._shard_lock:
+            if self._snapshot is None:
+                self._snapshot = AnalyticsSnapshot(self)
+        return self._snapshot.current()
+
+    def analytics(self):
+        """Handle for long scans over deliveries alone (career stats, cross-match filters).
+
+        With ANALYTICS_ENGINE=duckdb (and duckdb installed) these run
+        vectorized in DuckDB, see duckdb_engine.py. Otherwise snapshot().
+        """
+        if Config.ANALYTICS_ENGINE != 'duckdb':
+            return self.snapshot()
+        import duckdb_engine  # duckdb is optional and heavy; loaded on first use
+        if not duckdb_engine.available():
+            return self.snapshot()
+        with self._shard_lock:
+            if self._duckdb is None:
+                self._duckdb = duckdb_engine.DuckDBAnalytics(self)
+        return self._duckdb.current()
+
+    # --- Compaction ----------------------------------------------------
+
+    def free_pages(self):
+        return self.fetch_one("PRAGMA freelist_count")['freelist_count']
+
+    def enable_incremental_vacuum(self):
+        """Switch this file to auto_vacuum = INCREMENTAL (False if it already was).
+
+        The switch needs one full VACUUM, which rewrites the file and holds the
+        write lock while it runs, so it is meant for a maintenance window.
+        """
+        conn = self._write_connection()
+        try:
+            conn.isolation_level = None
+            if conn.execute("PRAGMA auto_vacuum").fetchone()['auto_vacuum'] == 2:
+                return False
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return True
+        finally:
+            conn.close()
+
+    def incremental_vacuum(self, budget=None, pages=None):
+        """Hand free pages back to the filesystem until none are left or budget seconds pass.
+
+        Each slice of `pages` pages is an ordinary write, so through the writer
+        queue live scoring waits for one slice at most. Returns pages freed.
+        """
+        budget = Config.COMPACTION_TIME_BUDGET if budget is None else budget
+        pages = pages or Config.COMPACTION_PAGES_PER_SLICE
+        if self.fetch_one("PRAGMA auto_vacuum")['auto_vacuum'] != 2:
+            return 0
+
+        def vacuum_slice(conn, count):
+            # One page per statement: the pragma frees a page per step, and
+            # the sqlite3 module only steps a row-less statement once
+            for _ in range(count):
+                conn.execute("PRAGMA incremental_vacuum(1)").close()
+            return count
+
+        freed = 0
+        deadline = time.monotonic() + budget
+        while time.monotonic() < deadline:
+            count = min(pages, self.free_pages())
+            if not count:
+                break
+            freed += self.write(lambda conn: vacuum_slice(conn, count))
+        if freed:
+            # Moves the truncation from the WAL into the file without waiting on readers
+            conn = self._write_connection()
+            try:
+                conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+            finally:
+                conn.close()
+        return freed
+
+    def compact(self, budget=None):
+        """Incremental vacuum of the core file and each shard within one shared time budget.
+
+        Returns the pages freed per file.
+        """
+        budget = Config.COMPACTION_TIME_BUDGET if budget is None else budget
+        deadline = time.monotonic() + budget
+        freed = {}
+        for target in self.shards():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            freed[os.path.basename(target.db_path)] = target.incremental_vacuum(remaining)
+        return freed
+
+    def schedule_compaction(self, interval=None):
+        """Run compact() every interval seconds on a background thread (once per process)."""
+        interval = interval or Config.COMPACTION_INTERVAL
+        with self._shard_lock:
+            if self._compactor is not None or not interval:
+                return
+            self._compactor = threading.Thread(
+                target=self._compact_loop, args=(interval,), name='db-compactor', daemon=True
+            )
+        self._compactor.start()
+
+    def _compact_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.compact()
+            except sqlite3.Error as e:
+                print(f"Compaction failed: {e}")
+
+    # --- Season shards -------------------------------------------------
+
+    @property
+    def sharded(self):
+        return bool(self.shard_dir)
+
+    def shard_path(self, season):
+        return os.path.join(self.shard_dir, f'deliveries_{season}.db')
+
+    def season_for_match(self, match_id):
+        if match_id not in self._match_seasons:
+            row = self.fetch_one(
+                "SELECT CAST(strftime('%Y', match_date) AS INTEGER) as season FROM matches WHERE id = ?",
+                (match_id,)
+            )
+            if not row:
+                # Not cached: the match may simply not have reached a snapshot yet
+                return self.live_season
+            self._match_seasons[match_id] = row['season'] or self.live_season
+        return self._match_seasons[match_id]
+
+    def shard(self, season, create=False):
+        """Handle for one season's file (None if it does not exist yet)."""
+        with self._shard_lock:
+            if season in self._shards:
+                return self._shards[season]
+            path = self.shard_path(season)
+            if not os.path.exists(path):
+                if not create:
+                    return None
+                self._create_shard(season, path)
+            shard = DeliveryShard(self, season, path, read_only=season < self.live_season)
+            self._shards[season] = shard
+            return shard
+
+    def shards(self):
+        """Every file that can hold deliveries: the core file (legacy rows) plus each season."""
+        if not self.sharded:
+            return [self]
+        if os.path.isdir(self.shard_dir):
+            for name in sorted(os.listdir(self.shard_dir)):
+                match = re.fullmatch(r'deliveries_(\d+)\.db', name)
+                if match:
+                    self.shard(int(match.group(1)))
+        return [self] + [self._shards[s] for s in sorted(self._shards)]
+
+    def for_match(self, match_id, create=False):
+        """Database holding a match's deliveries (create=True for writes)."""
+        if not self.sharded:
+            return self
+        return self.shard(self.season_for_match(match_id), create=create) or self
+
+    def for_innings(self, innings_id, create=False):
+        if not self.sharded:
+            return self
+        if innings_id not in self._innings_matches:
+            row = self.fetch_one("SELECT match_id FROM innings WHERE id = ?", (innings_id,))
+            if not row:
+                return self
+            self._innings_matches[innings_id] = row['match_id']
+        return self.for_match(self._innings_matches[innings_id], create=create)
+
+    def for_delivery(self, delivery_id):
+        if not self.sharded:
+            return self
+        hinted = self.shard(delivery_id // SHARD_ID_SPAN)
+        candidates = ([hinted] if hinted else []) + [s for s in self.shards() if s is not hinted]
+        for candidate in candidates:
+            if candidate.fetch_one("SELECT 1 as found FROM deliveries WHERE id = ?", (delivery_id,)):
+                return candidate
+        return self
+
+    def forget_match(self, match_id, innings_ids=()):
+        """Drop the cached shard routing of a deleted match"""
+        self._match_seasons.pop(match_id, None)
+        for innings_id in innings_ids:
+            self._innings_matches.pop(innings_id, None)
+
+    def shards_for(self, innings_id=None, match_id=None):
+        """The single shard for an innings/match scoped query, otherwise all of them."""
+        if innings_id:
+            return [self.for_innings(innings_id)]
+        if match_id:
+            return [self.for_match(match_id)]
+        return self.shards()
+
+    def fan_out(self, query, params=(), merge_keys=None, sums=(), shards=None):
+        """Run a deliveries query on every shard in parallel and combine the rows."""
+        shards = shards or self.shards()
+        if len(shards) == 1:
+            return shards[0].fetch_all(query, params)
+        rows = []
+        # Each task runs in a copy of the caller's context (request profiling)
+        futures = [
+            _pool().submit(contextvars.copy_context().run, s.fetch_all, query, params)
+            for s in shards
+        ]
+        for future in futures:
+            rows.extend(future.result())
+        if merge_keys is not None:
+            rows = merge_partials(rows, merge_keys, sums)
+        return rows
+
+    def fetch_scoped(self, query, params=(), innings_id=None, match_id=None, sort_key=None):
+        """Route to one shard when the query is innings/match scoped, otherwise fan out."""
+        shards = self.shards_for(innings_id, match_id)
+        rows = self.fan_out(query, params, shards=shards)
+        if sort_key and len(shards) > 1:
+            rows.sort(key=sort_key)
+        return rows
+
+    def _shard_ddl(self):
+        """CREATE statements for deliveries (and its indexes / search table) from the core schema."""
+        with self.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT type, name, sql FROM sqlite_master
+                WHERE tbl_name IN ('deliveries', 'deliveries_fts') AND sql IS NOT NULL
+                ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END
+            """).fetchall()
+        return [r['sql'] for r in rows if r['type'] in ('table', 'index')]
+
+    def _create_shard(self, season, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            for ddl in self._shard_ddl():
+                conn.execute(ddl)
+            has_sequence = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'"
+            ).fetchone()
+            if has_sequence:
+                conn.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES ('deliveries', ?)",
+                    (season * SHARD_ID_SPAN,)
+                )
             conn.commit()
+        finally:
+            conn.close()
+
+    def shard_triggers(self):
+        """The core deliveries triggers, re-created as TEMP triggers on shard connections.
+
+        Triggers stored in a shard file could not see players in the core file.
+        """
+        if not hasattr(self, '_shard_trigger_sql'):
+            with self.get_connection() as conn:
+                rows = conn.execute("""
+                    SELECT sql FROM sqlite_master
+                    WHERE type = 'trigger' AND tbl_name = 'deliveries'
+                """).fetchall()
+            self._shard_trigger_sql = [
+                re.sub(r'\bON\s+deliveries\b', 'ON main.deliveries',
+                       re.sub(r'CREATE\s+TRIGGER\s+(IF\s+NOT\s+EXISTS\s+)?',
+                              'CREATE TEMP TRIGGER IF NOT EXISTS ', r['sql'], count=1),
+                       count=1)
+                for r in rows
+            ]
+        return self._shard_trigger_sql
+
+    def migrate_to_shards(self):
+        """Move deliveries out of the core file into per-season shard files."""
+        moved = {}
+        seasons = self.fetch_all("""
+            SELECT DISTINCT CAST(strftime('%Y', m.match_date) AS INTEGER) as season
+            FROM deliveries d JOIN matches m ON d.match_id = m.id
+            WHERE m.match_date IS NOT NULL
+        """)
+        for row in seasons:
+            season = row['season']
+            shard = self.shard(season, create=True)
+            with shard.transaction(writable=True) as conn:
+                cursor = conn.execute("""
+                    INSERT INTO main.deliveries
+                    SELECT d.* FROM core.deliveries d
+                    JOIN core.matches m ON d.match_id = m.id
+                    WHERE CAST(strftime('%Y', m.match_date) AS INTEGER) = ?
+                """, (season,))
+                moved[season] = cursor.rowcount
+                conn.execute("""
+                    DELETE FROM core.deliveries WHERE match_id IN (
+                        SELECT id FROM core.matches
+                        WHERE CAST(strftime('%Y', match_date) AS INTEGER) = ?
+                    )
+                """, (season,))
+        return moved
+
+
+class DeliveryShard(Database):
+    """One season's deliveries file, with the core file attached as `core`.
+
+    Unqualified table names resolve to the shard first and then to core, so
+    the existing queries (joins to players, innings, matches, and writes to
+    derived tables) run unchanged against a shard.
+    """
+
+    def __init__(self, core, season, path, read_only=False):
+        self.core = core
+        self.season = season
+        self.db_path = path
+        self.schema_path = core.schema_path
+        self.read_only = read_only
+        self.shard_dir = None
+        self.live_season = core.live_season
+
+    def get_connection(self, writable=False):
+        if self.read_only and not writable:
+            conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True,
+                                   factory=self.connection_factory)
+            conn.execute(f"PRAGMA mmap_size = {Config.ARCHIVE_MMAP_SIZE}")
+            # Only the archived file is read-only; derived tables in core stay writable
+            conn.execute("ATTACH DATABASE ? AS core", (f'file:{self.core.db_path}?mode=rw',))
+        else:
+            conn = sqlite3.connect(self.db_path, uri=True, factory=self.connection_factory)
+            conn.execute("ATTACH DATABASE ? AS core", (self.core.db_path,))
+            for trigger in self.core.shard_triggers():
+                conn.execute(trigger)
+        conn.row_factory = dict_rows()
+        return conn
+
+    # Writes (backfills, corrections) always use a writable connection,
+    # even on an archived season; only reads get the read-only mmap path.
+    def _primary(self):
+        return self.core
+
+    def _write_connection(self):
+        return self.get_connection(writable=True)
+
+    @contextmanager
+    def transaction(self, writable=False):
+        conn = self.get_connection(writable=writable)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+_WriteOp = namedtuple('_WriteOp', 'target fn innings after future context')
+
+
+class WriteQueue:
+    """Single thread that owns the write connections and group-commits queued writes.
+
+    Writes arriving within GROUP_COMMIT_WINDOW of the first one (up to
+    GROUP_COMMIT_MAX_OPS) share one transaction per file. Each runs inside
+    its own savepoint, so a failing write is rolled back and reported to
+    its caller without affecting the rest of the batch.
+    """
+
+    def __init__(self, core, window=None, max_ops=None):
+        self.core = core
+        self.window = Config.GROUP_COMMIT_WINDOW if window is None else window
+        self.max_ops = max_ops or Config.GROUP_COMMIT_MAX_OPS
+        self._queue = queue.Queue()
+        self._connections = {}
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def in_writer(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, target, fn, innings=(), after=None):
+        future = Future()
+        self._queue.put(_WriteOp(
+            target, fn, tuple(innings), after, future, contextvars.copy_context()
+        ))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_ops:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._commit(batch)
+            except Exception as e:
+                for op in batch:
+                    if not op.future.done():
+                        op.future.set_exception(e)
+
+    def _connection(self, target):
+        conn = self._connections.get(target.db_path)
+        if conn is None:
+            conn = target._write_connection()
+            conn.isolation_level = None  # Transactions are managed per batch
+            if not getattr(target, 'read_only', False):
+                # Readers keep going while a batch commits
+                conn.execute("PRAGMA journal_mode = WAL")
+            self._connections[target.db_path] = conn
+        return conn
+
+    def _commit(self, batch):
+        # Writes from different requests are independent, so the batch is
+        # grouped by file and each file gets one transaction, committed before
+        # the next opens (a shard connection can also write the attached core).
+        by_file = {}
+        for op in batch:
+            if op.future.set_running_or_notify_cancel():
+                by_file.setdefault(op.target.db_path, []).append(op)
+
+        committed = []
+        for ops in by_file.values():
+            try:
+                conn = self._connection(ops[0].target)
+                conn.execute("BEGIN")
+            except sqlite3.Error as e:
+                for op in ops:
+                    op.future.set_exception(e)
+                continue
+            done = []
+            aborted = None
+            for op in ops:
+                if aborted is not None:
+                    op.future.set_exception(aborted)
+                    continue
+                conn.execute("SAVEPOINT write_op")
+                try:
+                    # In the submitter's context, so its SQL is profiled against its request
+                    result = op.context.run(op.fn, conn)
+                    conn.execute("RELEASE write_op")
+                except Exception as e:
+                    op.future.set_exception(e)
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK TO write_op")
+                        conn.execute("RELEASE write_op")
+                    else:
+                        # SQLite rolled back the whole transaction (disk full, I/O error)
+                        aborted = e
+                    continue
+                done.append((op, result))
+            if aborted is None:
+                try:
+                    conn.execute("COMMIT")
+                except sqlite3.Error as e:
+                    aborted = e
+            if aborted is not None:
+                if conn.in_transaction:
+                    try:
+                        conn.execute("ROLLBACK")
+                    except sqlite3.Error:
+                        pass
+                for op, _ in done:
+                    op.future.set_exception(aborted)
+                continue
+            committed.extend(done)
+
+        # Follow-up work runs after the commit, on ordinary connections
+        innings_ids = set()
+        for op, result in committed:
+            innings_ids.update(op.innings)
+            if op.after:
+                try:
+                    op.after(result)
+                except Exception as e:
+                    print(f"Post-write hook failed: {e}")
+        try:
+            self.core.run_write_hooks(innings_ids - {None})
+        except Exception as e:
+            print(f"Write batch hook failed: {e}")
+
+        for op, result in committed:
+            op.future.set_result(result)
+
+
+class AnalyticsSnapshot:
+    """Read-only copy of the core file and every shard, refreshed with the online backup API.
+
+    A background thread refreshes every half staleness bound; a reader that
+    still finds the copy too old refreshes it in-line before querying. Files
+    whose source has not changed since the last copy are skipped, so archived
+    seasons are copied once.
+    """
+
+    def __init__(self, primary, folder=None, max_staleness=None):
+        self.primary = primary
+        self.folder = folder or Config.SNAPSHOT_FOLDER
+        self.max_staleness = Config.SNAPSHOT_MAX_STALENESS if max_staleness is None else max_staleness
+        self.refreshed_at = 0
+        self.db = Database(
+            db_path=os.path.join(self.folder, os.path.basename(primary.db_path)),
+            shard_dir=os.path.join(self.folder, 'shards') if primary.sharded else None,
+            live_season=primary.live_season
+        )
+        self._signatures = {}
+        self._wal_enabled = set()
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def age(self):
+        return time.time() - self.refreshed_at
+
+    def current(self):
+        if self.age() > self.max_staleness:
+            self.refresh()
+        if self._refresher is None:
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, name='analytics-snapshot', daemon=True
+            )
+            self._refresher.start()
+        return self.db
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(max(self.max_staleness / 2, 1))
+            try:
+                self.refresh(force=True)
+            except sqlite3.Error as e:
+                print(f"Analytics snapshot refresh failed: {e}")
+
+    def refresh(self, force=False):
+        """Copy every changed primary file; returns the number of files copied."""
+        with self._lock:
+            if not force and self.age() <= self.max_staleness:
+                return 0
+            started = time.time()
+            copied = 0
+            for source in self.primary.shards():
+                if source is self.primary:
+                    target = self.db.db_path
+                else:
+                    target = os.path.join(self.db.shard_dir, os.path.basename(source.db_path))
+                if not getattr(source, 'read_only', False):
+                    self._enable_wal(source.db_path)
+                copied += self._copy(source.db_path, target)
+            self.refreshed_at = started
+            return copied
+
+    def _enable_wal(self, path):
+        # In WAL mode the backup's read transaction never blocks a scorer's commit
+        if path in self._wal_enabled:
+            return
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            self._wal_enabled.add(path)
+        except sqlite3.OperationalError:
+            pass  # Busy; retried on the next refresh
+        finally:
+            conn.close()
+
+    def _copy(self, source_path, target_path):
+        signature = tuple(
+            (st.st_mtime_ns, st.st_size) if st else None
+            for st in (_stat(source_path), _stat(source_path + '-wal'))
+        )
+        if self._signatures.get(target_path) == signature and os.path.exists(target_path):
+            return 0
+
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        partial = target_path + '.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+        src = sqlite3.connect(source_path)
+        dst = sqlite3.connect(partial)
+        try:
+            src.backup(dst)
+            # No -wal beside the copy, so swapping the file below is safe
+            dst.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            dst.close()
+            src.close()
+        # Open snapshot connections keep reading the file they started on
+        os.replace(partial, target_path)
+        self._signatures[target_path] = signature
+        return 1
+
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
 
 # --- THIS IS THE PART YOU WERE MISSING ---
 # Create the instance that app.py imports
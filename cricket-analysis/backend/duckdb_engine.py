@@ -0,0 +1,227 @@
+# backend/duckdb_engine.py
+#
+# DuckDB execution for long scans over deliveries (career stats, cross-match
+# filters). Database.analytics() hands out a DuckDBAnalytics instead of the
+# SQLite snapshot when ANALYTICS_ENGINE=duckdb; it answers the same
+# fetch_all / fan_out / fetch_scoped calls with the same row dicts, so views
+# do not change. Only the deliveries table is visible to it.
+#
+# Two sources, picked by DUCKDB_SOURCE:
+#   parquet  every file holding deliveries (core + season shards) is exported
+#            to one Parquet file, re-exported once its source changed and the
+#            copy is older than DUCKDB_MAX_STALENESS. Needs nothing but duckdb.
+#   attach   the SQLite files are attached read-only through DuckDB's sqlite
+#            extension. That extension is not bundled with the wheel, so it
+#            has to have been installed beforehand to work offline.
+
+import csv
+import os
+import sqlite3
+import threading
+import time
+
+from config import Config
+
+try:
+    import duckdb
+except ImportError:  # Analytics stay on SQLite
+    duckdb = None
+
+# Spooled rows per CSV write; the CSV is only a hand-off to DuckDB's reader
+EXPORT_CHUNK = 50000
+NULL = '\\N'
+
+
+def available():
+    return duckdb is not None
+
+
+def duck_type(declared, sample=()):
+    """DuckDB column type for a SQLite declared type, by SQLite's affinity rules.
+
+    Columns declared without a type take whatever was stored; their type is
+    read off sample values instead.
+    """
+    declared = (declared or '').upper()
+    if not declared:
+        kinds = {type(v) for v in sample if v is not None}
+        if kinds and kinds <= {int}:
+            return 'BIGINT'
+        if kinds and kinds <= {int, float}:
+            return 'DOUBLE'
+        return 'VARCHAR'
+    if 'INT' in declared or 'BOOL' in declared:
+        return 'BIGINT'
+    if any(t in declared for t in ('CHAR', 'CLOB', 'TEXT')):
+        return 'VARCHAR'
+    if any(t in declared for t in ('REAL', 'FLOA', 'DOUB', 'NUM', 'DEC')):
+        return 'DOUBLE'
+    # Timestamps and dates come back from SQLite as text
+    return 'VARCHAR'
+
+
+def _sql_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class DuckDBAnalytics:
+    """Deliveries of the primary database (and its shards) queried through DuckDB"""
+
+    def __init__(self, primary, source=None, folder=None, max_staleness=None):
+        self.primary = primary
+        self.source = source or Config.DUCKDB_SOURCE
+        self.folder = folder or Config.DUCKDB_FOLDER
+        self.max_staleness = Config.DUCKDB_MAX_STALENESS if max_staleness is None else max_staleness
+        self.refreshed_at = 0
+        self._signatures = {}
+        self._files = []
+        self._lock = threading.Lock()
+        self._refresher = None
+
+        config = {'autoinstall_known_extensions': 'false'}
+        if Config.DUCKDB_THREADS:
+            config['threads'] = Config.DUCKDB_THREADS
+        self._conn = duckdb.connect(':memory:', config=config)
+        if self.source == 'attach':
+            self._conn.execute("LOAD sqlite")
+
+    # --- Handle interface shared with Database ------------------------
+
+    def current(self):
+        if self.age() > self.max_staleness:
+            self.refresh()
+        if self._refresher is None:
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, name='duckdb-export', daemon=True
+            )
+            self._refresher.start()
+        return self
+
+    def fetch_all(self, query, params=()):
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute(query, list(params))
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def fetch_one(self, query, params=()):
+        rows = self.fetch_all(query, params)
+        return rows[0] if rows else None
+
+    def shards(self):
+        # Every file is already behind the one deliveries view
+        return [self]
+
+    def shards_for(self, innings_id=None, match_id=None):
+        return [self]
+
+    def fan_out(self, query, params=(), merge_keys=None, sums=(), shards=None):
+        return self.fetch_all(query, params)
+
+    def fetch_scoped(self, query, params=(), innings_id=None, match_id=None, sort_key=None):
+        return self.fetch_all(query, params)
+
+    # --- Refresh ------------------------------------------------------
+
+    def age(self):
+        return time.time() - self.refreshed_at
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(max(self.max_staleness / 2, 1))
+            try:
+                self.refresh(force=True)
+            except (sqlite3.Error, duckdb.Error) as e:
+                print(f"DuckDB analytics refresh failed: {e}")
+
+    def refresh(self, force=False):
+        """Re-point the deliveries view at the current files; returns the number of files exported."""
+        with self._lock:
+            if not force and self.age() <= self.max_staleness:
+                return 0
+            started = time.time()
+            sources = [s.db_path for s in self.primary.shards()]
+            if self.source == 'attach':
+                exported = 0
+                files = sources
+            else:
+                exported = sum(self._export(path) for path in sources)
+                files = [self._parquet_path(path) for path in sources]
+            if files != self._files:
+                self._define_view(files)
+            self.refreshed_at = started
+            return exported
+
+    def _define_view(self, files):
+        if self.source == 'attach':
+            parts = []
+            for n, path in enumerate(files):
+                alias = f"src{n}"
+                if self._conn.execute(
+                    "SELECT 1 FROM duckdb_databases() WHERE database_name = ?", [alias]
+                ).fetchone() is None:
+                    self._conn.execute(f"ATTACH {_sql_literal(path)} AS {alias} (TYPE sqlite, READ_ONLY)")
+                parts.append(f"SELECT * FROM {alias}.deliveries")
+            body = ' UNION ALL BY NAME '.join(parts)
+        else:
+            body = f"SELECT * FROM read_parquet([{', '.join(_sql_literal(f) for f in files)}], union_by_name = true)"
+        self._conn.execute(f"CREATE OR REPLACE VIEW deliveries AS {body}")
+        self._files = files
+
+    def _parquet_path(self, source_path):
+        name = os.path.splitext(os.path.basename(source_path))[0]
+        return os.path.join(self.folder, f'{name}.deliveries.parquet')
+
+    def _export(self, source_path):
+        """Write one file's deliveries to Parquet if it changed since the last export"""
+        target = self._parquet_path(source_path)
+        signature = tuple(
+            (st.st_mtime_ns, st.st_size) if st else None
+            for st in (_stat(source_path), _stat(source_path + '-wal'))
+        )
+        if self._signatures.get(target) == signature and os.path.exists(target):
+            return 0
+
+        os.makedirs(self.folder, exist_ok=True)
+        spool = target + '.csv'
+        partial = target + '.partial'
+        conn = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+        try:
+            declared = [(r[1], r[2]) for r in conn.execute("PRAGMA table_info(deliveries)")]
+            cursor = conn.execute(f"SELECT {', '.join(c for c, _ in declared)} FROM deliveries")
+            rows = cursor.fetchmany(EXPORT_CHUNK)
+            columns = [(c, duck_type(t, [row[n] for row in rows])) for n, (c, t) in enumerate(declared)]
+            with open(spool, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                while rows:
+                    writer.writerows([NULL if v is None else v for v in row] for row in rows)
+                    rows = cursor.fetchmany(EXPORT_CHUNK)
+        finally:
+            conn.close()
+
+        try:
+            # Read as text and cast leniently: SQLite lets any value into any column
+            text_columns = ', '.join(f"{_sql_literal(c)}: 'VARCHAR'" for c, _ in columns)
+            casts = ', '.join(f'TRY_CAST("{c}" AS {t}) AS "{c}"' for c, t in columns)
+            self._conn.execute(f"""
+                COPY (
+                    SELECT {casts} FROM read_csv({_sql_literal(spool)},
+                        auto_detect = false, header = false, delim = ',', quote = '"', escape = '"',
+                        nullstr = {_sql_literal(NULL)}, columns = {{{text_columns}}})
+                ) TO {_sql_literal(partial)} (FORMAT parquet, COMPRESSION zstd)
+            """)
+        finally:
+            os.remove(spool)
+        # Running queries keep reading the file they opened
+        os.replace(partial, target)
+        self._signatures[target] = signature
+        return 1
+
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,268 @@
+# backend/instrumentation.py
+#
+# Per-request profiling: latency histograms, SQL statement counts and time,
+# the slowest statements, and response sizes, exposed Prometheus-style on
+# /metrics. Nothing is installed unless Config.PROFILING is on.
+
+import contextvars
+import re
+import sqlite3
+import threading
+import time
+
+from flask import Response, g, request
+
+from config import Config
+from database import Database
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """SQL activity of one request (shared with its fan-out and writer work)"""
+
+    __slots__ = ('queries', 'sql_seconds', 'statements', '_lock')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = []
+        self._lock = threading.Lock()
+
+    def record(self, sql, params):
+        entry = [sql, params, 0.0]
+        with self._lock:
+            self.queries += 1
+            self.statements.append(entry)
+        return entry
+
+    def add_time(self, entry, seconds):
+        with self._lock:
+            entry[2] += seconds
+            self.sql_seconds += seconds
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Times execution and fetching, charging both to the statement that produced the rows"""
+
+    _entry = None
+
+    def _timed(self, method, *args):
+        profile = _current.get()
+        if profile is None or self._entry is None:
+            return method(*args)
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            profile.add_time(self._entry, time.perf_counter() - started)
+
+    def execute(self, sql, parameters=()):
+        profile = _current.get()
+        if profile is not None:
+            self._entry = profile.record(sql, parameters)
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        profile = _current.get()
+        if profile is not None:
+            self._entry = profile.record(sql, seq_of_parameters)
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        return self._timed(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed(super().fetchmany, size or self.arraysize)
+
+    def fetchall(self):
+        return self._timed(super().fetchall)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    def execute(self, sql, parameters=()):
+        return self.cursor(ProfiledCursor).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor(ProfiledCursor).executemany(sql, seq_of_parameters)
+
+
+def _normalize(sql, limit=200):
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    return sql if len(sql) <= limit else sql[:limit] + '...'
+
+
+def params_shape(params):
+    """Types, not values: '(int, int, str)', '{batsman_id: int}', 'many x120 (int, str)'"""
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in params.items()) + '}'
+    if isinstance(params, (list, tuple)):
+        types = [type(p).__name__ for p in params[:8]]
+        more = f', +{len(params) - 8}' if len(params) > 8 else ''
+        return f"({', '.join(types)}{more})"
+    try:
+        rows = list(params)
+    except TypeError:
+        return type(params).__name__
+    return f"many x{len(rows)} {params_shape(rows[0]) if rows else '()'}"
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {round(self.total, 6)}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+class Metrics:
+    """Process-wide aggregates, rendered in the Prometheus text format"""
+
+    def __init__(self, slow_statements=None):
+        self.slow_limit = slow_statements or Config.PROFILING_SLOW_STATEMENTS
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._queries = {}
+        self._sizes = {}
+        self._sql_seconds = {}
+        self._over_budget = {}
+        self._slow = {}  # (endpoint, statement, params shape) -> worst seconds
+
+    def observe(self, endpoint, method, seconds, profile, size):
+        key = (endpoint, method)
+        with self._lock:
+            self._latency.setdefault(key, _Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self._queries.setdefault(key, _Histogram(QUERY_BUCKETS)).observe(profile.queries)
+            self._sizes.setdefault(key, _Histogram(SIZE_BUCKETS)).observe(size)
+            self._sql_seconds[key] = self._sql_seconds.get(key, 0.0) + profile.sql_seconds
+            if profile.queries > Config.PROFILING_QUERY_BUDGET:
+                self._over_budget[key] = self._over_budget.get(key, 0) + 1
+            for sql, params, elapsed in profile.statements:
+                if len(self._slow) >= self.slow_limit and elapsed <= min(self._slow.values()):
+                    continue
+                key = (endpoint, _normalize(sql), params_shape(params))
+                self._slow[key] = max(elapsed, self._slow.get(key, 0.0))
+                if len(self._slow) > self.slow_limit:
+                    del self._slow[min(self._slow, key=self._slow.get)]
+
+    def render(self):
+        with self._lock:
+            lines = [
+                '# HELP http_request_duration_seconds Request latency by endpoint',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (endpoint, method), hist in sorted(self._latency.items()):
+                lines += hist.render('http_request_duration_seconds',
+                                     f'endpoint="{_label(endpoint)}",method="{method}"')
+            lines += [
+                '# HELP http_request_sql_queries SQL statements executed per request',
+                '# TYPE http_request_sql_queries histogram',
+            ]
+            for (endpoint, method), hist in sorted(self._queries.items()):
+                lines += hist.render('http_request_sql_queries',
+                                     f'endpoint="{_label(endpoint)}",method="{method}"')
+            lines += [
+                '# HELP http_request_sql_seconds_total Time spent in SQL by endpoint',
+                '# TYPE http_request_sql_seconds_total counter',
+            ]
+            for (endpoint, method), total in sorted(self._sql_seconds.items()):
+                lines.append(f'http_request_sql_seconds_total{{endpoint="{_label(endpoint)}",'
+                             f'method="{method}"}} {round(total, 6)}')
+            lines += [
+                '# HELP http_response_size_bytes Response body size by endpoint',
+                '# TYPE http_response_size_bytes histogram',
+            ]
+            for (endpoint, method), hist in sorted(self._sizes.items()):
+                lines += hist.render('http_response_size_bytes',
+                                     f'endpoint="{_label(endpoint)}",method="{method}"')
+            lines += [
+                '# HELP http_requests_over_query_budget_total Requests above PROFILING_QUERY_BUDGET statements',
+                '# TYPE http_requests_over_query_budget_total counter',
+            ]
+            for (endpoint, method), n in sorted(self._over_budget.items()):
+                lines.append(f'http_requests_over_query_budget_total{{endpoint="{_label(endpoint)}",'
+                             f'method="{method}"}} {n}')
+            lines += [
+                '# HELP sql_slowest_statement_seconds Slowest statements seen since start',
+                '# TYPE sql_slowest_statement_seconds gauge',
+            ]
+            for (endpoint, sql, shape), elapsed in sorted(self._slow.items(), key=lambda i: -i[1]):
+                lines.append(
+                    f'sql_slowest_statement_seconds{{endpoint="{_label(endpoint)}",'
+                    f'statement="{_label(sql)}",params="{_label(shape)}"}} '
+                    f'{round(elapsed, 6)}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def init_profiling(app):
+    """Attach profiling hooks and /metrics to app (no-op unless Config.PROFILING)"""
+    if not Config.PROFILING:
+        return
+
+    Database.connection_factory = ProfiledConnection
+
+    @app.before_request
+    def _start_profile():
+        g.profile_started = time.perf_counter()
+        g.profile = RequestProfile()
+        g.profile_token = _current.set(g.profile)
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = g.get('profile')
+        if profile is None or request.endpoint == 'metrics':
+            return response
+        seconds = time.perf_counter() - g.profile_started
+        endpoint = request.endpoint or 'unmatched'
+        size = response.calculate_content_length() or 0
+        metrics.observe(endpoint, request.method, seconds, profile, size)
+
+        response.headers['X-SQL-Queries'] = str(profile.queries)
+        response.headers['X-SQL-Time-Ms'] = f'{profile.sql_seconds * 1000:.2f}'
+        if profile.queries > Config.PROFILING_QUERY_BUDGET:
+            print(f"[profiling] {request.method} {request.path} ran {profile.queries} SQL statements "
+                  f"(budget {Config.PROFILING_QUERY_BUDGET}) in {seconds * 1000:.1f} ms")
+        return response
+
+    @app.teardown_request
+    def _reset_profile(exc=None):
+        token = g.pop('profile_token', None)
+        if token is not None:
+            _current.reset(token)
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
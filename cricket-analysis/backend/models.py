@@ -1,16 +1,11 @@
-from flask_sqlalchemy import SQLAlchemy
+# The api blueprints and services all query SQLite through this helper
+from database import db
 
-db = SQLAlchemy()
 
-class Team(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    # This stores the URL for the team logo image
-    logo_url = db.Column(db.String(500), nullable=True)
-
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "logo_url": self.logo_url or "https://via.placeholder.com/150"
-        }
\ No newline at end of file
+# The landing-page Team model needs SQLAlchemy, which costs more to import
+# than the rest of the app; load it only when something asks for it.
+def __getattr__(name):
+    if name in ('orm', 'Team'):
+        import team_model
+        return getattr(team_model, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
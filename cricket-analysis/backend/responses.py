@@ -0,0 +1,266 @@
+# backend/responses.py
+#
+# How API payloads go on the wire. jsonify() encodes with orjson when it is
+# installed (rows are already plain dicts, see database.dict_rows), bodies
+# above COMPRESS_MIN_SIZE are brotli- or gzip-compressed per Accept-Encoding,
+# and views over finished matches keep their serialized and compressed bodies
+# in memory until the match changes again.
+
+import functools
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+from config import Config
+from models import db
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE = {'application/json', 'text/plain', 'text/csv', 'text/html'}
+
+# Matches whose rows no longer change in normal use
+FINISHED_STATUSES = ('Completed',)
+
+
+def _default(o):
+    # numpy scalars from the win-probability model
+    if hasattr(o, 'item'):
+        return o.item()
+    # Sets, and namedtuples (orjson only takes plain tuples)
+    if isinstance(o, (set, frozenset, tuple)):
+        return list(o)
+    return DefaultJSONProvider.default(o)
+
+
+def dumps_bytes(obj):
+    """obj as compact JSON bytes, the way jsonify() encodes it"""
+    if orjson is None:
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode()
+    return orjson.dumps(obj, default=_default,
+                        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify() through orjson: compact, unsorted keys, bytes straight into the response"""
+
+    def dumps_bytes(self, obj):
+        return dumps_bytes(obj)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs or orjson is None:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def _gzip(body):
+    return gzip.compress(body, compresslevel=Config.GZIP_LEVEL)
+
+
+def _brotli(body):
+    return brotli.compress(body, quality=Config.BROTLI_QUALITY)
+
+
+ENCODERS = {'gzip': _gzip}
+if brotli is not None:
+    ENCODERS = {'br': _brotli, 'gzip': _gzip}  # Preferred first
+
+
+def negotiate(accepted=None):
+    """The best encoding the client accepts, or None for identity.
+
+    accepted defaults to the current request's Accept-Encoding.
+    """
+    if accepted is None:
+        accepted = request.accept_encodings
+    for encoding in ENCODERS:
+        if accepted[encoding]:
+            return encoding
+    return None
+
+
+def compress_response(response):
+    """after_request hook: compress a finished body when it is big enough to pay off"""
+    if (response.direct_passthrough or response.status_code in (204, 206, 304)
+            or response.status_code < 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate()
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < Config.COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(ENCODERS[encoding](body))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+class _CachedBody:
+    __slots__ = ('body', 'mimetype', 'headers', 'etag', 'encoded')
+
+    def __init__(self, body, mimetype, headers, etag):
+        self.body = body
+        self.mimetype = mimetype
+        self.headers = headers
+        self.etag = etag
+        self.encoded = {}
+
+    def size(self):
+        return len(self.body) + sum(len(b) for b in self.encoded.values())
+
+
+class BodyCache:
+    """LRU of response bodies (and their compressed forms), bounded in bytes"""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes or Config.RESPONSE_CACHE_BYTES
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size()
+            self._entries[key] = entry
+            self._bytes += entry.size()
+            self._evict()
+
+    def encoded(self, key, entry, encoding):
+        """entry's body compressed with encoding, compressed at most once"""
+        body = entry.encoded.get(encoding)
+        if body is None:
+            body = ENCODERS[encoding](entry.body)
+            with self._lock:
+                if encoding not in entry.encoded:
+                    entry.encoded[encoding] = body
+                    if self._entries.get(key) is entry:
+                        self._bytes += len(body)
+                        self._evict()
+        return body
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size()
+
+
+body_cache = BodyCache()
+
+
+def cache_body(key, body, mimetype, headers=()):
+    """Keep a finished view's body in body_cache under key; returns the entry"""
+    etag = hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+    entry = _CachedBody(body, mimetype, list(headers), etag)
+    body_cache.put(key, entry)
+    return entry
+
+
+def immutable(token):
+    """Serve a view from body_cache while token(**view_args) is unchanged.
+
+    token returns None while the data can still change (a match in
+    progress); the view then runs as normal. Cached responses carry an ETag,
+    so clients revalidate with a 304 instead of downloading again.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            version = token(**kwargs)
+            if version is None:
+                return view(**kwargs)
+
+            key = (request.endpoint, request.full_path, version)
+            entry = body_cache.get(key)
+            if entry is None:
+                response = current_app.make_response(view(**kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                headers = [(k, v) for k, v in response.headers
+                           if k not in ('Content-Type', 'Content-Length')]
+                entry = cache_body(key, response.get_data(), response.mimetype, headers)
+
+            encoding = negotiate() if len(entry.body) >= Config.COMPRESS_MIN_SIZE else None
+            body = body_cache.encoded(key, entry, encoding) if encoding else entry.body
+            response = current_app.response_class(body, mimetype=entry.mimetype, headers=entry.headers)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            response.set_etag(f'{entry.etag}-{encoding or "identity"}')
+            response.cache_control.no_cache = True  # Always revalidate; corrections change the token
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+# Tokens are read from the database, so an edit made through any worker
+# process moves them; names_version covers the player and team names the
+# bodies carry.
+_NAMES_VERSION_SQL = "(SELECT version FROM names_version WHERE id = 1) as names"
+
+
+def finished_match(match_id):
+    """Cache token for a finished match (None while it is still being scored)"""
+    row = db.fetch_one(f"""
+        SELECT m.status, m.updated_at,
+            (SELECT COALESCE(SUM(v.version), 0) FROM innings i
+             JOIN innings_version v ON v.innings_id = i.id
+             WHERE i.match_id = m.id) as versions,
+            {_NAMES_VERSION_SQL}
+        FROM matches m WHERE m.id = ?
+    """, (match_id,))
+    if not row or row['status'] not in FINISHED_STATUSES:
+        return None
+    return (row['updated_at'], row['versions'], row['names'])
+
+
+def finished_innings(innings_id):
+    """Cache token for an innings of a finished match"""
+    row = db.fetch_one(f"""
+        SELECT m.status, m.updated_at, COALESCE(v.version, 0) as version,
+            {_NAMES_VERSION_SQL}
+        FROM innings i
+        JOIN matches m ON m.id = i.match_id
+        LEFT JOIN innings_version v ON v.innings_id = i.id
+        WHERE i.id = ?
+    """, (innings_id,))
+    if not row or row['status'] not in FINISHED_STATUSES:
+        return None
+    return (row['updated_at'], row['version'], row['names'])
+
+
+def init_responses(app):
+    """Fast JSON encoding for jsonify() and negotiated compression for every response"""
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
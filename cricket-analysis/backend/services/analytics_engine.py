@@ -0,0 +1,153 @@
+# backend/services/analytics_engine.py
+
+from models import db
+
+# Aggregates for one (innings, over) straight from the deliveries table.
+# Uses idx_deliveries_innings_over, so a refresh only touches the balls of that over.
+_OVER_AGGREGATE_SQL = """
+    SELECT
+        innings_id,
+        MAX(match_id) as match_id,
+        over_number,
+        COALESCE(SUM(runs_scored), 0) as runs,
+        COUNT(CASE WHEN is_wicket = 1 THEN 1 END) as wickets,
+        COUNT(CASE WHEN is_dot = 1 THEN 1 END) as dots,
+        COUNT(CASE WHEN is_boundary = 1 THEN 1 END) as fours,
+        COUNT(CASE WHEN is_six = 1 THEN 1 END) as sixes,
+        COALESCE(SUM(extras), 0) as extras,
+        COUNT(CASE WHEN extra_type IN ('None', 'Bye', 'Leg Bye') THEN 1 END) as legal_balls
+    FROM deliveries
+    WHERE {where}
+    GROUP BY innings_id, over_number
+"""
+
+_OVER_UPSERT_SQL = """
+    INSERT INTO over_summary (
+        innings_id, match_id, over_number,
+        runs, wickets, dots, fours, sixes, extras, legal_balls
+    )
+    {select}
+    ON CONFLICT (innings_id, over_number) DO UPDATE SET
+        match_id = excluded.match_id,
+        runs = excluded.runs,
+        wickets = excluded.wickets,
+        dots = excluded.dots,
+        fours = excluded.fours,
+        sixes = excluded.sixes,
+        extras = excluded.extras,
+        legal_balls = excluded.legal_balls,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def refresh_over_summary(conn, innings_id, over_number):
+    """Recalculate the over_summary row for one over, inside the delivery write's transaction"""
+    # conn is the innings' shard; over_summary resolves to the core file
+    select = _OVER_AGGREGATE_SQL.format(where="innings_id = ? AND over_number = ?")
+    conn.execute(_OVER_UPSERT_SQL.format(select=select), (innings_id, over_number))
+
+    # The last ball of an over may have been deleted
+    conn.execute("""
+        DELETE FROM over_summary
+        WHERE innings_id = ? AND over_number = ?
+        AND NOT EXISTS (
+            SELECT 1 FROM deliveries WHERE innings_id = ? AND over_number = ?
+        )
+    """, (innings_id, over_number, innings_id, over_number))
+
+
+def rebuild_over_summary(innings_id=None):
+    """Backfill over_summary from deliveries, for one innings or the whole archive
+
+    The DELETE and the refill are one write: readers keep the old rows until
+    it commits, and a failed refill leaves them in place.
+    """
+    if innings_id is not None:
+        select = _OVER_AGGREGATE_SQL.format(where="innings_id = ?")
+
+        def rebuild_innings(conn):
+            # conn is the innings' shard; over_summary resolves to the core file
+            conn.execute("DELETE FROM over_summary WHERE innings_id = ?", (innings_id,))
+            conn.execute(_OVER_UPSERT_SQL.format(select=select), (innings_id,))
+        db.for_innings(innings_id).write(rebuild_innings)
+        return
+
+    select = _OVER_AGGREGATE_SQL.format(where="1=1")
+    values = f"VALUES ({', '.join('?' for _ in range(10))})"
+
+    def rebuild(conn):
+        conn.execute("DELETE FROM over_summary")
+        # Shards are aggregated one at a time, each into its own innings' rows
+        for shard in db.shards():
+            if shard is db:
+                conn.execute(_OVER_UPSERT_SQL.format(select=select))
+            else:
+                conn.executemany(_OVER_UPSERT_SQL.format(select=values),
+                                 [tuple(row.values()) for row in shard.fetch_all(select)])
+    db.write(rebuild)
+
+
+def over_summary_rows(match_ids):
+    """Per-over rows with running totals, computed in SQL with window functions"""
+    placeholders = ', '.join('?' for _ in match_ids)
+    return db.fetch_all(f"""
+        SELECT
+            os.match_id, os.innings_id, i.innings_number,
+            i.batting_team_id, bt.name as batting_team_name,
+            os.over_number, os.runs, os.wickets, os.dots,
+            os.fours, os.sixes, os.extras, os.legal_balls,
+            SUM(os.runs) OVER w as cumulative_runs,
+            SUM(os.wickets) OVER w as cumulative_wickets,
+            SUM(os.legal_balls) OVER w as cumulative_balls,
+            ROUND(SUM(os.runs) OVER w * 6.0 / NULLIF(SUM(os.legal_balls) OVER w, 0), 2) as run_rate
+        FROM over_summary os
+        JOIN innings i ON os.innings_id = i.id
+        LEFT JOIN teams bt ON i.batting_team_id = bt.id
+        WHERE os.match_id IN ({placeholders})
+        WINDOW w AS (PARTITION BY os.innings_id ORDER BY os.over_number)
+        ORDER BY os.match_id, i.innings_number, os.over_number
+    """, list(match_ids))
+
+
+def chart_series(match_ids):
+    """Manhattan, worm and run-rate series for every innings of the given matches"""
+    series = {match_id: [] for match_id in match_ids}
+    current = None
+
+    for row in over_summary_rows(match_ids):
+        if current is None or current['innings_id'] != row['innings_id']:
+            current = {
+                'innings_id': row['innings_id'],
+                'innings_number': row['innings_number'],
+                'batting_team_id': row['batting_team_id'],
+                'batting_team_name': row['batting_team_name'],
+                'overs': [],
+                'manhattan': [],
+                'wickets': [],
+                'worm': [],
+                'run_rate': [],
+            }
+            series.setdefault(row['match_id'], []).append(current)
+
+        current['overs'].append(row['over_number'] + 1)
+        current['manhattan'].append(row['runs'])
+        current['wickets'].append(row['wickets'])
+        current['worm'].append(row['cumulative_runs'])
+        current['run_rate'].append(row['run_rate'])
+
+    for innings_list in series.values():
+        for innings in innings_list:
+            innings['total_runs'] = innings['worm'][-1]
+            innings['total_wickets'] = sum(innings['wickets'])
+
+    return [{'match_id': match_id, 'innings': series[match_id]} for match_id in match_ids]
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild_over_summary':
+        rebuild_over_summary(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+        print("over_summary rebuilt.")
+    else:
+        print("Usage: python -m services.analytics_engine rebuild_over_summary [innings_id]")
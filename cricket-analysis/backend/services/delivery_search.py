@@ -0,0 +1,51 @@
+# backend/services/delivery_search.py
+
+from models import db
+
+# bm25 weights, in deliveries_fts column order:
+# notes, tags, shot_type, wicket_type, batsman_name, bowler_name, fielder_name
+RANK_SQL = "bm25(deliveries_fts, 1.0, 3.0, 2.0, 2.0, 1.5, 1.5, 1.0)"
+
+
+def _phrase(text):
+    return '"' + str(text).replace('"', '""') + '"'
+
+
+def build_match_query(q=None, tags=None):
+    """Combine a free-text query and exact tag phrases into one FTS5 MATCH string"""
+    parts = []
+    if q:
+        parts.append(f"({q})")
+    for tag in tags or []:
+        parts.append(f"tags : {_phrase(tag)}")
+    return " AND ".join(parts)
+
+
+def rebuild_search_index():
+    """Repopulate deliveries_fts from the deliveries table (each shard has its own index)"""
+    for shard in db.shards():
+        with shard.transaction(writable=True) as conn:
+            conn.execute("DELETE FROM main.deliveries_fts")
+            conn.execute("""
+                INSERT INTO main.deliveries_fts (rowid, notes, tags, shot_type, wicket_type,
+                                                 batsman_name, bowler_name, fielder_name)
+                SELECT d.id, d.notes, d.tags, d.shot_type, d.wicket_type,
+                    bp.first_name || ' ' || bp.last_name,
+                    bwp.first_name || ' ' || bwp.last_name,
+                    fp.first_name || ' ' || fp.last_name
+                FROM main.deliveries d
+                LEFT JOIN players bp ON d.batsman_id = bp.id
+                LEFT JOIN players bwp ON d.bowler_id = bwp.id
+                LEFT JOIN players fp ON d.fielder_id = fp.id
+            """)
+            conn.execute("INSERT INTO main.deliveries_fts (deliveries_fts) VALUES ('optimize')")
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        rebuild_search_index()
+        print("Delivery search index rebuilt.")
+    else:
+        print("Usage: python -m services.delivery_search rebuild")
@@ -0,0 +1,296 @@
+# backend/services/leaderboards.py
+#
+# Tournament leaderboards. leaderboard_totals holds every player's batting
+# and bowling totals per scope (a season and match format, with season 0 and
+# format '' standing for all of them) and is adjusted on each delivery write,
+# so a page view never groups deliveries. Every metric has an index in its
+# own order (database/schema.sql): the top N of a scope are the first
+# entries of that index, and players short of the qualifying balls are
+# skipped on the way.
+#
+# Matches without a date or format only count towards the all-seasons /
+# all-formats scopes. rebuild_leaderboards() recomputes the table from the
+# deliveries archive, for backfills.
+
+from collections import namedtuple
+
+from config import Config
+from models import db
+from services import player_directory
+from services.match_state import NOT_BOWLER_EXTRAS, NOT_BOWLER_WICKETS
+from services.partnership_engine import BALL_FACED_EXTRAS, LEGAL_EXTRAS
+
+ALL_SEASONS = 0
+ALL_FORMATS = ''
+
+MEASURES = ('bat_runs', 'bat_balls', 'bat_dismissals', 'bat_fours', 'bat_sixes',
+            'bowl_balls', 'bowl_runs', 'bowl_wickets', 'bowl_dots')
+
+# A retired hurt batter is not out; every other dismissal counts against
+# the batter given out (the non-striker for some run outs)
+NOT_OUT_WICKETS = ('Retired Hurt',)
+
+# expr and order must read exactly as in the metric's index, or SQLite sorts
+# the scope instead of walking the index. Rate metrics rank only players with
+# at least min_balls on their qualifier.
+Metric = namedtuple('Metric', 'side expr order qualifier')
+
+METRICS = {
+    'runs': Metric('bat', 'bat_runs', 'DESC', None),
+    'sixes': Metric('bat', 'bat_sixes', 'DESC', None),
+    'strike_rate': Metric('bat', 'bat_runs * 100.0 / bat_balls', 'DESC', 'bat_balls'),
+    'wickets': Metric('bowl', 'bowl_wickets', 'DESC', None),
+    'economy': Metric('bowl', 'bowl_runs * 6.0 / bowl_balls', 'ASC', 'bowl_balls'),
+}
+
+
+def _in(values):
+    return ', '.join(f"'{v}'" for v in values)
+
+
+# Per player, in the same terms as _contribution() below: one row per
+# delivery for the batter, the dismissed batter and the bowler.
+_PLAYER_TOTALS_SQL = f"""
+    SELECT {{keys}} t.player_id, {', '.join(f'SUM({m}) as {m}' for m in MEASURES)}
+    FROM (
+        SELECT match_id, batsman_id as player_id,
+            COALESCE(runs_off_bat, 0) as bat_runs,
+            CASE WHEN COALESCE(extra_type, 'None') IN ({_in(BALL_FACED_EXTRAS)}) THEN 1 ELSE 0 END as bat_balls,
+            0 as bat_dismissals,
+            CASE WHEN is_boundary = 1 THEN 1 ELSE 0 END as bat_fours,
+            CASE WHEN is_six = 1 THEN 1 ELSE 0 END as bat_sixes,
+            0 as bowl_balls, 0 as bowl_runs, 0 as bowl_wickets, 0 as bowl_dots
+        FROM {{schema}}.deliveries WHERE {{where}}
+        UNION ALL
+        SELECT match_id, COALESCE(dismissed_batsman_id, batsman_id), 0, 0, 1, 0, 0, 0, 0, 0, 0
+        FROM {{schema}}.deliveries
+        WHERE {{where}} AND is_wicket = 1 AND COALESCE(wicket_type, '') NOT IN ({_in(NOT_OUT_WICKETS)})
+        UNION ALL
+        SELECT match_id, bowler_id, 0, 0, 0, 0, 0,
+            CASE WHEN COALESCE(extra_type, 'None') IN ({_in(LEGAL_EXTRAS)}) THEN 1 ELSE 0 END,
+            COALESCE(runs_scored, 0)
+                - CASE WHEN extra_type IN ({_in(NOT_BOWLER_EXTRAS)}) THEN COALESCE(extras, 0) ELSE 0 END,
+            CASE WHEN is_wicket = 1 AND COALESCE(wicket_type, '') NOT IN ({_in(NOT_BOWLER_WICKETS)})
+                 THEN 1 ELSE 0 END,
+            CASE WHEN is_dot = 1 THEN 1 ELSE 0 END
+        FROM {{schema}}.deliveries WHERE {{where}}
+    ) t
+    {{join}}
+    WHERE t.player_id IS NOT NULL
+    GROUP BY {{group}} t.player_id
+"""
+
+# Season and format of the match, as the rollups spell them
+_SEASON = "COALESCE(CAST(strftime('%Y', m.match_date) AS INTEGER), 0)"
+_FORMAT = "COALESCE(m.match_format, '')"
+
+_UPSERT_SQL = f"""
+    INSERT INTO leaderboard_totals (season, match_format, player_id, {', '.join(MEASURES)})
+    VALUES ({', '.join('?' for _ in range(len(MEASURES) + 3))})
+    ON CONFLICT (season, match_format, player_id) DO UPDATE SET
+        {', '.join(f'{m} = {m} + excluded.{m}' for m in MEASURES)}
+"""
+
+_EMPTY = ' AND '.join(f'{m} = 0' for m in MEASURES)
+
+
+def _expand(season, match_format):
+    """Every scope a match of this season and format counts towards"""
+    return {(s, f) for s in {ALL_SEASONS, season or ALL_SEASONS}
+            for f in {ALL_FORMATS, match_format or ALL_FORMATS}}
+
+
+def _scope(row):
+    return (row['season'] or ALL_SEASONS, row['match_format'] or ALL_FORMATS) if row else (ALL_SEASONS, ALL_FORMATS)
+
+
+_SCOPE_SQL = """
+    SELECT CAST(strftime('%Y', match_date) AS INTEGER) as season, match_format
+    FROM matches WHERE id = ?
+"""
+
+
+def match_scope(conn, match_id):
+    """(season, match_format) the match's deliveries are counted under"""
+    return _scope(conn.execute(_SCOPE_SQL, (match_id,)).fetchone())
+
+
+def _match_scopes(conn, match_id):
+    return _expand(*match_scope(conn, match_id))
+
+
+def _fold(conn, scopes, totals, sign=1):
+    """Add sign * totals ({player_id: [measure, ...]}) into every scope"""
+    conn.executemany(_UPSERT_SQL, [
+        (season, match_format, player_id, *(sign * n for n in values))
+        for season, match_format in scopes
+        for player_id, values in totals.items()
+    ])
+
+
+def _contribution(d):
+    """What a single delivery adds to each player's totals"""
+    totals = {}
+
+    def add(player_id, **measures):
+        if player_id:
+            row = totals.setdefault(player_id, dict.fromkeys(MEASURES, 0))
+            for m, n in measures.items():
+                row[m] += n
+
+    extra_type = d.get('extra_type') or 'None'
+    add(d.get('batsman_id'),
+        bat_runs=d.get('runs_off_bat') or 0,
+        bat_balls=1 if extra_type in BALL_FACED_EXTRAS else 0,
+        bat_fours=1 if d.get('is_boundary') else 0,
+        bat_sixes=1 if d.get('is_six') else 0)
+    if d.get('is_wicket') and (d.get('wicket_type') or '') not in NOT_OUT_WICKETS:
+        add(d.get('dismissed_batsman_id') or d.get('batsman_id'), bat_dismissals=1)
+    extras = d.get('extras') or 0
+    add(d.get('bowler_id'),
+        bowl_balls=1 if extra_type in LEGAL_EXTRAS else 0,
+        bowl_runs=(d.get('runs_scored') or 0) - (extras if extra_type in NOT_BOWLER_EXTRAS else 0),
+        bowl_wickets=1 if d.get('is_wicket') and (d.get('wicket_type') or '') not in NOT_BOWLER_WICKETS else 0,
+        bowl_dots=1 if d.get('is_dot') else 0)
+    return totals
+
+
+def update_leaderboards(conn, old=None, new=None):
+    """Move a delivery's contribution from its old row state to its new one,
+    inside the delivery's own write"""
+    delta = {}
+    for d, sign in ((old, -1), (new, 1)):
+        if not d:
+            continue
+        for player_id, measures in _contribution(d).items():
+            row = delta.setdefault(player_id, [0] * len(MEASURES))
+            for n, m in enumerate(MEASURES):
+                row[n] += sign * measures[m]
+    delta = {p: values for p, values in delta.items() if any(values)}
+    if not delta:
+        return
+    match_id = (new or old)['match_id']
+    _fold(conn, _match_scopes(conn, match_id), delta)
+
+
+def _match_totals(conn, match_id, schemas):
+    totals = {}
+    for schema in schemas:
+        for row in conn.execute(
+            _PLAYER_TOTALS_SQL.format(keys='', group='', schema=schema, where='match_id = ?', join=''),
+            (match_id,) * 3
+        ):
+            values = totals.setdefault(row['player_id'], [0] * len(MEASURES))
+            for n, m in enumerate(MEASURES):
+                values[n] += row[m]
+    return totals
+
+
+def remove_match(conn, match_id, schema='main'):
+    """Subtract one match's deliveries in schema, inside the caller's transaction"""
+    _fold(conn, _match_scopes(conn, match_id), _match_totals(conn, match_id, [schema]), -1)
+    conn.execute(f"DELETE FROM leaderboard_totals WHERE {_EMPTY}")
+
+
+def rescope_match(conn, match_id, old_scope, schemas=('main',)):
+    """After a match's date or format changed, move its totals from old_scope to
+    its new one, inside the caller's transaction (the one that changed the match)
+
+    schemas are where its deliveries live on conn (see match_storage).
+    """
+    new_scope = match_scope(conn, match_id)
+    if new_scope == old_scope:
+        return False
+    totals = _match_totals(conn, match_id, schemas)
+    _fold(conn, _expand(*old_scope), totals, -1)
+    _fold(conn, _expand(*new_scope), totals)
+    conn.execute(f"DELETE FROM leaderboard_totals WHERE {_EMPTY}")
+    return True
+
+
+def rebuild_leaderboards():
+    """Recompute every scope from the full deliveries archive; returns the number of rows
+
+    The DELETE and the refill are one write: readers keep the old totals
+    until it commits, and no delivery delta can land in between (the
+    writer runs one write at a time), so no ball is lost or counted twice.
+    """
+    totals_sql = _PLAYER_TOTALS_SQL.format(
+        keys=f"{_SEASON} as season, {_FORMAT} as match_format,", group=f"{_SEASON}, {_FORMAT},",
+        schema='main', where='1', join='JOIN matches m ON m.id = t.match_id')
+
+    def rebuild(conn):
+        conn.execute("DELETE FROM leaderboard_totals")
+        # Shards are aggregated one at a time and added into the same scopes
+        for shard in db.shards():
+            rows = conn.execute(totals_sql).fetchall() if shard is db else shard.fetch_all(totals_sql)
+            for row in rows:
+                _fold(conn, _expand(row['season'], row['match_format']),
+                      {row['player_id']: [row[m] for m in MEASURES]})
+        return conn.execute("SELECT COUNT(*) as cnt FROM leaderboard_totals").fetchone()['cnt']
+    return db.write(rebuild)
+
+
+def _figures(row, side):
+    figures = {m[len(side) + 1:]: row[m] for m in MEASURES if m.startswith(side + '_')}
+    if side == 'bat':
+        figures['strike_rate'] = round(row['bat_runs'] * 100.0 / row['bat_balls'], 2) if row['bat_balls'] else None
+        figures['average'] = round(row['bat_runs'] / row['bat_dismissals'], 2) if row['bat_dismissals'] else None
+    else:
+        figures['economy'] = round(row['bowl_runs'] * 6.0 / row['bowl_balls'], 2) if row['bowl_balls'] else None
+    return figures
+
+
+def leaderboard(metric, season=None, match_format=None, limit=None, min_balls=None):
+    """Top players of a scope by one metric, read off the metric's index"""
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'; use one of {', '.join(METRICS)}")
+    spec = METRICS[metric]
+    season = int(season) if season else ALL_SEASONS
+    match_format = match_format or ALL_FORMATS
+    limit = min(int(limit or Config.LEADERBOARD_SIZE), Config.LEADERBOARD_MAX_SIZE)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+
+    if spec.qualifier:
+        if min_balls is None or min_balls == '':
+            min_balls = (Config.LEADERBOARD_MIN_BALLS_FACED if spec.side == 'bat'
+                         else Config.LEADERBOARD_MIN_BALLS_BOWLED)
+        # A rate needs at least one ball to be defined
+        min_balls = max(int(min_balls), 1)
+        condition, params = f"{spec.qualifier} >= ?", [min_balls]
+    else:
+        min_balls = None
+        condition, params = f"{spec.expr} > 0", []
+
+    rows = db.fetch_all(f"""
+        SELECT player_id, {spec.expr} as value, {', '.join(MEASURES)}
+        FROM leaderboard_totals
+        WHERE season = ? AND match_format = ? AND {condition}
+        ORDER BY {spec.expr} {spec.order}, player_id
+        LIMIT ?
+    """, [season, match_format, *params, limit])
+
+    names = player_directory.names([r['player_id'] for r in rows])
+    return {
+        'metric': metric,
+        'season': season or None,
+        'match_format': match_format or None,
+        'qualification': {spec.qualifier: min_balls} if spec.qualifier else None,
+        'leaders': [{
+            'rank': n,
+            'player_id': r['player_id'],
+            'name': names.get(r['player_id']),
+            'value': round(r['value'], 2) if isinstance(r['value'], float) else r['value'],
+            'figures': _figures(r, spec.side),
+        } for n, r in enumerate(rows, 1)],
+    }
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        print(f"Leaderboards rebuilt ({rebuild_leaderboards()} rows).")
+    else:
+        print("Usage: python -m services.leaderboards rebuild")
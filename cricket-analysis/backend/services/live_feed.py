@@ -0,0 +1,93 @@
+# backend/services/live_feed.py
+#
+# Current matches from the CricketData (cricapi) feed, proxied for the
+# frontend. Every viewer of a live match polls it, so one upstream answer is
+# shared for LIVE_MATCHES_TTL seconds and callers arriving while a fetch is
+# under way wait for that fetch instead of starting their own. The Flask view
+# uses fetch() over a pooled requests session; asgi.py uses fetch_async()
+# with its own pooled httpx client.
+
+import asyncio
+import threading
+import time
+
+from config import Config
+
+_latest = None  # (fetched at, payload)
+_lock = threading.Lock()
+_session = None
+_pending = None  # Upstream call in flight on the event loop
+
+
+def feed_url():
+    return f"{Config.CRICAPI_URL}?apikey={Config.CRICAPI_KEY}&offset=0"
+
+
+def cached():
+    """The shared payload while it is fresh, else None"""
+    latest = _latest
+    if latest is not None and time.monotonic() - latest[0] < Config.LIVE_MATCHES_TTL:
+        return latest[1]
+    return None
+
+
+def _keep(ok, payload):
+    # Failures are passed on but never shared
+    global _latest
+    if ok:
+        _latest = (time.monotonic(), payload)
+    return payload
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        import requests  # only this proxy needs it
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=Config.UPSTREAM_MAX_CONNECTIONS)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _session = session
+    return _session
+
+
+def _fetch():
+    response = _get_session().get(feed_url(), timeout=Config.UPSTREAM_TIMEOUT)
+    return _keep(response.ok, response.json())
+
+
+def fetch():
+    """Current matches: the shared copy while fresh, otherwise one upstream call"""
+    payload = cached()
+    if payload is not None:
+        return payload
+    if Config.LIVE_MATCHES_TTL <= 0:
+        return _fetch()
+    with _lock:
+        # Threads that queued behind the call take its answer
+        payload = cached()
+        return _fetch() if payload is None else payload
+
+
+async def _fetch_async(client):
+    response = await client.get(feed_url(), timeout=Config.UPSTREAM_TIMEOUT)
+    return _keep(response.is_success, response.json())
+
+
+def _done(future):
+    global _pending
+    if _pending is future:
+        _pending = None
+
+
+async def fetch_async(client):
+    """fetch() for the event loop; client is a pooled httpx.AsyncClient"""
+    global _pending
+    payload = cached()
+    if payload is not None:
+        return payload
+    if _pending is None:
+        _pending = asyncio.ensure_future(_fetch_async(client))
+        _pending.add_done_callback(_done)
+    # A viewer disconnecting must not cancel the call the others wait on
+    return await asyncio.shield(_pending)
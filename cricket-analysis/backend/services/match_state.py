@@ -0,0 +1,286 @@
+# backend/services/match_state.py
+#
+# Ball-by-ball match state for replay and video scrubbing. Deliveries are
+# folded in ball order into one immutable BallState per ball (score, overs,
+# the two batters and the bowler with their figures so far, the chase). The
+# fold itself is checkpointed at the start of every over, so the state at
+# any single ball is one checkpoint read plus a replay of at most one over.
+# Like partnerships, both are keyed on the innings version and rebuilt only
+# when it moves.
+
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+from models import db
+from services.partnership_engine import LEGAL_EXTRAS, BALL_FACED_EXTRAS, innings_version
+
+# Balls per innings for limited-overs formats; anything else has no chase clock
+FORMAT_OVERS = {'T20': 20, 'ODI': 50}
+
+# Conceded by the fielding side but not charged to the bowler
+NOT_BOWLER_EXTRAS = ('Bye', 'Leg Bye')
+# Dismissals not credited to the bowler
+NOT_BOWLER_WICKETS = ('Run Out', 'Retired Hurt', 'Obstructing the Field')
+
+_DELIVERY_COLUMNS = """
+    d.id, d.over_number, d.ball_number, d.batsman_id, d.non_striker_id, d.bowler_id,
+    d.runs_scored, d.runs_off_bat, d.extras, d.extra_type, d.is_wicket, d.wicket_type
+"""
+
+BallState = namedtuple('BallState', [
+    'seq', 'delivery_id', 'over_number', 'ball_number',
+    'runs', 'wickets', 'extras', 'legal_balls', 'overs', 'run_rate',
+    'striker_id', 'striker_runs', 'striker_balls',
+    'non_striker_id', 'non_striker_runs', 'non_striker_balls',
+    'bowler_id', 'bowler_overs', 'bowler_runs', 'bowler_wickets',
+    'target', 'required_runs', 'balls_remaining', 'required_rate',
+])
+
+CACHE_SIZE = 128
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _overs(balls):
+    return f"{balls // 6}.{balls % 6}"
+
+
+class Fold:
+    """Running totals of an innings; apply() a delivery to get the BallState after it.
+
+    Keeps every batter's and bowler's figures, not just the current ones, so
+    a batter coming back on strike or a bowler returning for a new spell
+    carries on from where they were. to_checkpoint()/from_checkpoint() round
+    trip the whole thing through JSON.
+    """
+
+    def __init__(self, target=None, max_balls=None):
+        self.target = target
+        self.max_balls = max_balls
+        self.seq = 0
+        self.runs = 0
+        self.wickets = 0
+        self.extras = 0
+        self.legal_balls = 0
+        self.batters = {}  # id -> [runs, balls]
+        self.bowlers = {}  # id -> [balls, runs, wickets]
+
+    def apply(self, d):
+        runs = d['runs_scored'] or 0
+        extras = d['extras'] or 0
+        legal = d['extra_type'] in LEGAL_EXTRAS
+
+        self.seq += 1
+        self.runs += runs
+        self.extras += extras
+        if legal:
+            self.legal_balls += 1
+        if d['is_wicket']:
+            self.wickets += 1
+
+        striker = self.batters.setdefault(d['batsman_id'], [0, 0])
+        striker[0] += d['runs_off_bat'] or 0
+        if d['extra_type'] in BALL_FACED_EXTRAS:
+            striker[1] += 1
+        non_striker = self.batters.setdefault(d['non_striker_id'], [0, 0])
+
+        bowler = self.bowlers.setdefault(d['bowler_id'], [0, 0, 0])
+        if legal:
+            bowler[0] += 1
+        bowler[1] += runs - (extras if d['extra_type'] in NOT_BOWLER_EXTRAS else 0)
+        if d['is_wicket'] and d['wicket_type'] not in NOT_BOWLER_WICKETS:
+            bowler[2] += 1
+
+        required_runs = balls_remaining = required_rate = None
+        if self.max_balls is not None:
+            balls_remaining = max(self.max_balls - self.legal_balls, 0)
+        if self.target is not None:
+            required_runs = max(self.target - self.runs, 0)
+            if balls_remaining:
+                required_rate = round(required_runs * 6.0 / balls_remaining, 2)
+
+        return BallState(
+            self.seq, d['id'], d['over_number'], d['ball_number'],
+            self.runs, self.wickets, self.extras, self.legal_balls, _overs(self.legal_balls),
+            round(self.runs * 6.0 / self.legal_balls, 2) if self.legal_balls else None,
+            d['batsman_id'], striker[0], striker[1],
+            d['non_striker_id'], non_striker[0], non_striker[1],
+            d['bowler_id'], _overs(bowler[0]), bowler[1], bowler[2],
+            self.target, required_runs, balls_remaining, required_rate,
+        )
+
+    def to_checkpoint(self):
+        return json.dumps({
+            'seq': self.seq, 'runs': self.runs, 'wickets': self.wickets,
+            'extras': self.extras, 'legal_balls': self.legal_balls,
+            # JSON object keys are strings, so players go as [id, ...figures]
+            'batters': [[k] + v for k, v in self.batters.items()],
+            'bowlers': [[k] + v for k, v in self.bowlers.items()],
+        })
+
+    @classmethod
+    def from_checkpoint(cls, state, target=None, max_balls=None):
+        data = json.loads(state)
+        fold = cls(target, max_balls)
+        fold.seq = data['seq']
+        fold.runs = data['runs']
+        fold.wickets = data['wickets']
+        fold.extras = data['extras']
+        fold.legal_balls = data['legal_balls']
+        fold.batters = {row[0]: row[1:] for row in data['batters']}
+        fold.bowlers = {row[0]: row[1:] for row in data['bowlers']}
+        return fold
+
+
+def innings_context(innings_id):
+    """(target, max_balls) of an innings: the chase target and the format's ball limit"""
+    row = db.fetch_one("""
+        SELECT i.innings_number, m.match_format,
+            (SELECT i1.total_runs FROM innings i1
+             WHERE i1.match_id = i.match_id AND i1.innings_number = 1) as first_innings_runs
+        FROM innings i
+        JOIN matches m ON i.match_id = m.id
+        WHERE i.id = ?
+    """, (innings_id,))
+    if not row:
+        return None
+    overs = FORMAT_OVERS.get(row['match_format'])
+    target = None
+    # A chase only means something with a ball limit; multi-day matches have neither
+    if overs and row['innings_number'] == 2 and row['first_innings_runs'] is not None:
+        target = row['first_innings_runs'] + 1
+    return target, overs * 6 if overs else None
+
+
+def compute_states(deliveries, target=None, max_balls=None):
+    """Fold one innings' deliveries (in ball order) into BallStates and per-over checkpoints.
+
+    Checkpoints are {over_number: (seq, fold JSON)} taken before the first
+    ball of each over.
+    """
+    fold = Fold(target, max_balls)
+    states, checkpoints = [], {}
+    for d in deliveries:
+        if d['over_number'] not in checkpoints:
+            checkpoints[d['over_number']] = (fold.seq, fold.to_checkpoint())
+        states.append(fold.apply(d))
+    return states, checkpoints
+
+
+def _innings_deliveries(innings_id, over_number=None):
+    query = f"SELECT {_DELIVERY_COLUMNS} FROM deliveries d WHERE d.innings_id = ?"
+    params = [innings_id]
+    if over_number is not None:
+        query += " AND d.over_number = ?"
+        params.append(over_number)
+    query += " ORDER BY d.over_number, d.ball_number, d.id"
+    return db.for_innings(innings_id).fetch_all(query, params)
+
+
+def get_states(innings_id):
+    """Every BallState of an innings in ball order, recomputed only when the innings version moves.
+
+    Returns (version, target, max_balls, states), or None for an unknown innings.
+    """
+    version = innings_version(innings_id)
+
+    with _cache_lock:
+        cached = _cache.get(innings_id)
+        if cached and cached[0] == version:
+            _cache.move_to_end(innings_id)
+            return cached
+
+    context = innings_context(innings_id)
+    if context is None:
+        return None
+    target, max_balls = context
+    states, checkpoints = compute_states(_innings_deliveries(innings_id), target, max_balls)
+    if not _has_checkpoints(innings_id, version):
+        _store(innings_id, version, checkpoints)
+
+    entry = (version, target, max_balls, states)
+    with _cache_lock:
+        _cache[innings_id] = entry
+        _cache.move_to_end(innings_id)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return entry
+
+
+def state_at(innings_id, delivery_id=None, over_number=None, ball_number=None):
+    """The BallState after one delivery, or after ball ball_number of over over_number.
+
+    Served from the cached series when this process has it, otherwise from the
+    over's checkpoint plus a replay of that over alone. None if there is no
+    such ball.
+    """
+    if delivery_id is not None:
+        row = db.for_innings(innings_id).fetch_one(
+            "SELECT over_number FROM deliveries WHERE id = ? AND innings_id = ?", (delivery_id, innings_id)
+        )
+        if not row:
+            return None
+        over_number = row['over_number']
+
+    version = innings_version(innings_id)
+    with _cache_lock:
+        cached = _cache.get(innings_id)
+    if cached and cached[0] == version:
+        return _pick(cached[3], over_number, delivery_id, ball_number)
+
+    checkpoint = db.fetch_one("""
+        SELECT state FROM innings_state_checkpoints
+        WHERE innings_id = ? AND over_number = ? AND innings_version = ?
+    """, (innings_id, over_number, version))
+    if checkpoint is None:
+        # Not built for this version yet (or no such over)
+        entry = get_states(innings_id)
+        return entry and _pick(entry[3], over_number, delivery_id, ball_number)
+
+    context = innings_context(innings_id)
+    if context is None:
+        return None
+    fold = Fold.from_checkpoint(checkpoint['state'], *context)
+    states = [fold.apply(d) for d in _innings_deliveries(innings_id, over_number)]
+    return _pick(states, over_number, delivery_id, ball_number)
+
+
+def _pick(states, over_number, delivery_id=None, ball_number=None):
+    """The state of delivery_id, else the last one of the over up to ball_number"""
+    found = None
+    for s in states:
+        if s.over_number != over_number:
+            continue
+        if delivery_id is not None:
+            if s.delivery_id == delivery_id:
+                return s
+        elif ball_number is None or s.ball_number <= ball_number:
+            found = s
+    return found
+
+
+def forget(innings_ids):
+    """Drop cached states of innings that no longer exist"""
+    with _cache_lock:
+        for innings_id in innings_ids:
+            _cache.pop(innings_id, None)
+
+
+def _has_checkpoints(innings_id, version):
+    # Another worker may already have stored this version
+    return db.fetch_one("""
+        SELECT 1 FROM innings_state_checkpoints WHERE innings_id = ? AND innings_version = ? LIMIT 1
+    """, (innings_id, version)) is not None
+
+
+def _store(innings_id, version, checkpoints):
+    """Replace the persisted checkpoints of one innings"""
+    def replace(conn):
+        conn.execute("DELETE FROM innings_state_checkpoints WHERE innings_id = ?", (innings_id,))
+        conn.executemany("""
+            INSERT INTO innings_state_checkpoints (innings_id, over_number, innings_version, seq, state)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(innings_id, over, version, seq, state) for over, (seq, state) in checkpoints.items()])
+    db.write(replace)
@@ -0,0 +1,152 @@
+# backend/services/match_storage.py
+#
+# Removing matches from the live database. delete_match() takes a match and
+# every row hanging off it out in one transaction on the file that holds its
+# deliveries (a shard connection has the core file attached, so the core
+# tables go in the same commit). archive_matches() first writes the rows of
+# old matches to a gzip'd JSON-lines file and then deletes them the same way.
+# The space they leave behind is returned by Database.compact().
+
+import datetime
+import glob
+import gzip
+import json
+import os
+
+from models import db
+from config import Config
+from services import leaderboards, match_state, matchup_matrix, partnership_engine, rollup_cube
+
+# Rows removed with a match, children first: (table, WHERE on :match_id)
+CASCADE = [
+    ('over_summary', "match_id = :match_id"),
+    ('partnerships', "match_id = :match_id"),
+    ('innings_state_checkpoints', "innings_id IN (SELECT id FROM innings WHERE match_id = :match_id)"),
+    ('innings_version', "innings_id IN (SELECT id FROM innings WHERE match_id = :match_id)"),
+    ('video_timestamp_suggestions', "match_id = :match_id"),
+    ('video_clips', "match_id = :match_id"),
+    ('playlists', "match_id = :match_id"),
+    ('innings', "match_id = :match_id"),
+    ('matches', "id = :match_id"),
+]
+
+# Written to an archive record alongside the match row (deliveries also
+# come from the match's season shard)
+ARCHIVED = ['innings', 'deliveries', 'video_clips', 'playlists']
+
+
+def _delivery_schemas(target):
+    """Schemas holding the match's deliveries on target's connection"""
+    # Rows scored before sharding was switched on can still sit in core
+    return ['main', 'core'] if target is not db else ['main']
+
+
+def _cascade(conn, match_id, schemas):
+    match = conn.execute("SELECT id, video_path FROM matches WHERE id = ?", (match_id,)).fetchone()
+    if match is None:
+        return None
+    counts = {'deliveries': 0}
+    for schema in schemas:
+        matchup_matrix.remove_match(conn, match_id, schema)
+        leaderboards.remove_match(conn, match_id, schema)
+        # The search index follows through the deliveries triggers
+        counts['deliveries'] += conn.execute(
+            f"DELETE FROM {schema}.deliveries WHERE match_id = ?", (match_id,)
+        ).rowcount
+    rollup_cube.remove_match(conn, match_id)
+    innings_ids = [r['id'] for r in conn.execute("SELECT id FROM innings WHERE match_id = ?", (match_id,))]
+    for table, where in CASCADE:
+        counts[table] = conn.execute(
+            f"DELETE FROM {table} WHERE {where}", {'match_id': match_id}
+        ).rowcount
+    return {'counts': counts, 'innings_ids': innings_ids, 'video_path': match['video_path']}
+
+
+def media_files(match_id, video_path=None):
+    """Uploaded match video and extracted clips on disk for a match"""
+    files = glob.glob(os.path.join(Config.VIDEO_UPLOAD_FOLDER, 'clips', f'clip_{match_id}_*'))
+    if video_path:
+        files.append(os.path.join(Config.VIDEO_UPLOAD_FOLDER, video_path))
+    return [f for f in files if os.path.isfile(f)]
+
+
+def delete_match(match_id, remove_media=True):
+    """Delete a match with its innings, deliveries, clips and derived rows in one commit.
+
+    Returns the number of rows removed per table, or None if there is no such
+    match. Video and clip files are removed once the delete has committed.
+    """
+    target = db.for_match(match_id)
+    schemas = _delivery_schemas(target)
+
+    def cleanup(removed):
+        if not removed:
+            return
+        db.forget_match(match_id, removed['innings_ids'])
+        partnership_engine.forget(removed['innings_ids'])
+        match_state.forget(removed['innings_ids'])
+        if remove_media:
+            for path in media_files(match_id, removed['video_path']):
+                os.remove(path)
+
+    # No innings hooks: the totals they refresh belong to innings that are gone
+    removed = target.write(lambda conn: _cascade(conn, match_id, schemas), after=cleanup)
+    return removed and removed['counts']
+
+
+def _match_record(match_id):
+    record = {'match': db.fetch_one("SELECT * FROM matches WHERE id = ?", (match_id,))}
+    for table in ARCHIVED:
+        record[table] = db.fetch_all(f"SELECT * FROM {table} WHERE match_id = ? ORDER BY id", (match_id,))
+    target = db.for_match(match_id)
+    if target is not db:
+        record['deliveries'] += target.fetch_all(
+            "SELECT * FROM main.deliveries WHERE match_id = ? ORDER BY id", (match_id,)
+        )
+    return record
+
+
+def archive_path(before):
+    stamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    return os.path.join(Config.MATCH_ARCHIVE_FOLDER, f'matches_before_{before}_{stamp}.jsonl.gz')
+
+
+def archive_matches(before, path=None, limit=None):
+    """Move matches played before a date (YYYY-MM-DD) into a compressed archive file.
+
+    The file holds one JSON record per match (the match row plus its innings,
+    deliveries, clips and playlists) and is complete on disk before anything
+    is deleted. Each match is then deleted in its own transaction, so live
+    scoring only ever waits for one match. Media files stay where they are;
+    the archived rows still name them.
+    """
+    query = "SELECT id FROM matches WHERE match_date < ? ORDER BY match_date, id"
+    params = [before]
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    match_ids = [r['id'] for r in db.fetch_all(query, params)]
+    if not match_ids:
+        return {'matches': 0, 'deliveries': 0, 'path': None}
+
+    path = path or archive_path(before)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.partial'
+    with gzip.open(partial, 'wt', encoding='utf-8') as f:
+        for match_id in match_ids:
+            f.write(json.dumps(_match_record(match_id), default=str) + '\n')
+    os.replace(partial, path)
+
+    deliveries = 0
+    for match_id in match_ids:
+        counts = delete_match(match_id, remove_media=False)
+        if counts:
+            deliveries += counts['deliveries']
+    return {'matches': len(match_ids), 'deliveries': deliveries, 'path': path}
+
+
+def read_archive(path):
+    """Iterate the match records of an archive file"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
@@ -0,0 +1,180 @@
+# backend/services/matchup_matrix.py
+
+from models import db
+from services import player_directory
+
+MEASURES = ('balls', 'runs', 'dismissals', 'dots', 'fours', 'sixes')
+
+# Same conventions as the innings scorecard: wides are not balls faced and
+# run outs are not credited to the bowler.
+_MEASURE_SQL = """
+    COUNT(CASE WHEN extra_type IN ('None', 'No Ball') THEN 1 END) as balls,
+    COALESCE(SUM(runs_off_bat), 0) as runs,
+    COUNT(CASE WHEN is_wicket = 1
+               AND COALESCE(dismissed_batsman_id, batsman_id) = batsman_id
+               AND COALESCE(wicket_type, '') != 'Run Out' THEN 1 END) as dismissals,
+    COUNT(CASE WHEN is_dot = 1 THEN 1 END) as dots,
+    COUNT(CASE WHEN is_boundary = 1 THEN 1 END) as fours,
+    COUNT(CASE WHEN is_six = 1 THEN 1 END) as sixes
+"""
+
+_INSERT_SQL = "INSERT INTO {table} (batsman_id, {key}, balls, runs, dismissals, dots, fours, sixes)"
+
+# Measures are additive, so both incremental deltas and per-shard rebuilds
+# are folded into existing cells.
+_ON_CONFLICT_SQL = """
+    ON CONFLICT (batsman_id, {key}) DO UPDATE SET
+        balls = balls + excluded.balls,
+        runs = runs + excluded.runs,
+        dismissals = dismissals + excluded.dismissals,
+        dots = dots + excluded.dots,
+        fours = fours + excluded.fours,
+        sixes = sixes + excluded.sixes
+"""
+
+_UPSERT_SQL = _INSERT_SQL + " VALUES (?, ?, ?, ?, ?, ?, ?, ?)" + _ON_CONFLICT_SQL
+
+# Every cell of one table, aggregated over a file's deliveries
+_CELLS_SQL = """
+    SELECT batsman_id, {key}, """ + _MEASURE_SQL + """
+    FROM deliveries
+    WHERE batsman_id IS NOT NULL AND {key} IS NOT NULL
+    GROUP BY batsman_id, {key}
+"""
+
+_TABLES = (('matchup_batter_bowler', 'bowler_id'), ('matchup_batter_bowling_type', 'bowling_type'))
+
+
+def _contribution(d):
+    """What a single delivery adds to its batter's matchup cells"""
+    dismissed = d.get('dismissed_batsman_id') or d['batsman_id']
+    return {
+        'balls': 1 if d.get('extra_type', 'None') in ('None', 'No Ball') else 0,
+        'runs': d.get('runs_off_bat') or 0,
+        'dismissals': 1 if d.get('is_wicket') and dismissed == d['batsman_id']
+                      and d.get('wicket_type') != 'Run Out' else 0,
+        'dots': 1 if d.get('is_dot') else 0,
+        'fours': 1 if d.get('is_boundary') else 0,
+        'sixes': 1 if d.get('is_six') else 0,
+    }
+
+
+def _apply(conn, d, sign):
+    if not d or not d.get('batsman_id'):
+        return
+    values = [sign * v for v in _contribution(d).values()]
+    for table, key in _TABLES:
+        if d.get(key):
+            conn.execute(_UPSERT_SQL.format(table=table, key=key), (d['batsman_id'], d[key], *values))
+
+
+def update_matchups(conn, old=None, new=None):
+    """Move a delivery's contribution from its old row state to its new one, inside its write"""
+    _apply(conn, old, -1)
+    _apply(conn, new, 1)
+
+
+def remove_match(conn, match_id, schema='main'):
+    """Subtract one match's deliveries from both tables, inside the caller's transaction"""
+    for table, key in _TABLES:
+        conn.execute(f"""
+            {_INSERT_SQL.format(table=table, key=key)}
+            SELECT batsman_id, {key}, -balls, -runs, -dismissals, -dots, -fours, -sixes
+            FROM (
+                SELECT batsman_id, {key}, {_MEASURE_SQL}
+                FROM {schema}.deliveries
+                WHERE match_id = ? AND batsman_id IS NOT NULL AND {key} IS NOT NULL
+                GROUP BY batsman_id, {key}
+            ) WHERE 1
+            {_ON_CONFLICT_SQL.format(key=key)}
+        """, (match_id,))
+
+
+def rebuild_matchups():
+    """Recompute both matchup tables from the full deliveries archive
+
+    The DELETE and the refill are one write: readers keep the old cells
+    until it commits, and no delivery delta can land in between (the
+    writer runs one write at a time), so none is lost or counted twice.
+    """
+    def rebuild(conn):
+        for table, key in _TABLES:
+            conn.execute(f"DELETE FROM {table}")
+            cells = _CELLS_SQL.format(key=key)
+            # Shards are aggregated one at a time and added into the same cells
+            for shard in db.shards():
+                if shard is db:
+                    conn.execute(f"{_INSERT_SQL.format(table=table, key=key)} {cells}"
+                                 f"{_ON_CONFLICT_SQL.format(key=key)}")
+                else:
+                    conn.executemany(_UPSERT_SQL.format(table=table, key=key),
+                                     [tuple(row.values()) for row in shard.fetch_all(cells)])
+    db.write(rebuild)
+
+
+def _with_rates(cell):
+    cell['strike_rate'] = round(cell['runs'] * 100.0 / cell['balls'], 2) if cell['balls'] else None
+    cell['average'] = round(cell['runs'] / cell['dismissals'], 2) if cell['dismissals'] else None
+    cell['dot_percentage'] = round(cell['dots'] * 100.0 / cell['balls'], 2) if cell['balls'] else None
+    return cell
+
+
+def squad(team_id):
+    return [row['id'] for row in db.fetch_all(
+        "SELECT id FROM players WHERE team_id = ? ORDER BY id", (team_id,)
+    )]
+
+
+def player_names(player_ids):
+    return player_directory.names(player_ids)
+
+
+def _grid(table, key, batsman_ids, columns):
+    """Rows of batsmen x columns, filled from one indexed query"""
+    cells = {}
+    if batsman_ids and columns:
+        bat_placeholders = ', '.join('?' for _ in batsman_ids)
+        col_placeholders = ', '.join('?' for _ in columns)
+        for row in db.fetch_all(f"""
+            SELECT batsman_id, {key}, {', '.join(MEASURES)}
+            FROM {table}
+            WHERE batsman_id IN ({bat_placeholders}) AND {key} IN ({col_placeholders})
+        """, list(batsman_ids) + list(columns)):
+            cells[(row['batsman_id'], row[key])] = _with_rates(
+                {m: row[m] for m in MEASURES}
+            )
+    return [[cells.get((b, c)) for c in columns] for b in batsman_ids]
+
+
+def batter_bowler_grid(batsman_ids, bowler_ids):
+    """Squad-vs-squad matrix; cells with no balls bowled are None"""
+    names = player_names(set(batsman_ids) | set(bowler_ids))
+    return {
+        'batsmen': [{'id': b, 'name': names.get(b)} for b in batsman_ids],
+        'bowlers': [{'id': b, 'name': names.get(b)} for b in bowler_ids],
+        'cells': _grid('matchup_batter_bowler', 'bowler_id', batsman_ids, bowler_ids),
+    }
+
+
+def batter_bowling_type_grid(batsman_ids, bowling_types=None):
+    """Batsmen against each bowling type (all recorded types by default)"""
+    if not bowling_types:
+        bowling_types = [row['bowling_type'] for row in db.fetch_all(
+            "SELECT DISTINCT bowling_type FROM matchup_batter_bowling_type ORDER BY bowling_type"
+        )]
+    names = player_names(set(batsman_ids))
+    return {
+        'batsmen': [{'id': b, 'name': names.get(b)} for b in batsman_ids],
+        'bowling_types': list(bowling_types),
+        'cells': _grid('matchup_batter_bowling_type', 'bowling_type', batsman_ids, bowling_types),
+    }
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        rebuild_matchups()
+        print("Matchup tables rebuilt.")
+    else:
+        print("Usage: python -m services.matchup_matrix rebuild")
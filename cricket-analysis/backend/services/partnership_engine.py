@@ -0,0 +1,257 @@
+# backend/services/partnership_engine.py
+
+import threading
+from collections import OrderedDict
+
+from models import db
+
+LEGAL_EXTRAS = ('None', 'Bye', 'Leg Bye')
+BALL_FACED_EXTRAS = ('None', 'No Ball')
+
+# Only the columns the walk needs, in ball order
+_DELIVERY_COLUMNS = """
+    d.id, d.innings_id, d.match_id, d.over_number, d.ball_number,
+    d.batsman_id, d.non_striker_id,
+    d.runs_scored, d.runs_off_bat, d.extras, d.extra_type,
+    d.is_wicket, d.wicket_type, d.dismissed_batsman_id
+"""
+
+_PARTNERSHIP_FIELDS = (
+    'innings_id', 'match_id', 'innings_version', 'wicket_number',
+    'batter1_id', 'batter2_id', 'batter1_runs', 'batter1_balls',
+    'batter2_runs', 'batter2_balls', 'runs', 'balls', 'extras', 'run_rate',
+    'start_delivery_id', 'end_delivery_id', 'end_wicket_type',
+    'dismissed_batsman_id', 'unbroken'
+)
+
+CACHE_SIZE = 256
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compute_partnerships(deliveries):
+    """Walk one innings' deliveries in ball order and emit every partnership"""
+    partnerships = []
+    current = None
+    wickets = 0
+
+    def close(p, wicket=None, retired=False):
+        """wicket is the dismissal ball that ended the stand; a retirement ends it without one"""
+        p['run_rate'] = round(p['runs'] * 6.0 / p['balls'], 2) if p['balls'] else None
+        p['unbroken'] = 0 if wicket or retired else 1
+        if wicket:
+            p['end_wicket_type'] = wicket['wicket_type']
+            p['dismissed_batsman_id'] = wicket['dismissed_batsman_id'] or wicket['batsman_id']
+        partnerships.append(p)
+
+    for d in deliveries:
+        striker, non_striker = d['batsman_id'], d['non_striker_id']
+
+        if current is not None:
+            ball_pair = {striker, non_striker} - {None}
+            pair = {current['batter1_id'], current['batter2_id']} - {None}
+            if not ball_pair <= pair:
+                if current['batter2_id'] is None and len(ball_pair | pair) <= 2:
+                    # Partner was not recorded on the opening balls
+                    current['batter2_id'] = (ball_pair - pair).pop()
+                else:
+                    # Batters changed without a wicket (retirement or missing data);
+                    # d belongs to the next stand, even when it is itself a wicket
+                    close(current, retired=True)
+                    current = None
+
+        if current is None:
+            current = {
+                'innings_id': d['innings_id'],
+                'match_id': d['match_id'],
+                'wicket_number': wickets + 1,
+                'batter1_id': striker,
+                'batter2_id': non_striker,
+                'batter1_runs': 0, 'batter1_balls': 0,
+                'batter2_runs': 0, 'batter2_balls': 0,
+                'runs': 0, 'balls': 0, 'extras': 0,
+                'start_delivery_id': d['id'],
+                'end_delivery_id': d['id'],
+                'end_wicket_type': None,
+                'dismissed_batsman_id': None,
+            }
+
+        side = 'batter1' if striker == current['batter1_id'] else 'batter2'
+        current[f'{side}_runs'] += d['runs_off_bat'] or 0
+        if d['extra_type'] in BALL_FACED_EXTRAS:
+            current[f'{side}_balls'] += 1
+        current['runs'] += d['runs_scored'] or 0
+        current['extras'] += d['extras'] or 0
+        if d['extra_type'] in LEGAL_EXTRAS:
+            current['balls'] += 1
+        current['end_delivery_id'] = d['id']
+
+        if d['is_wicket']:
+            wickets += 1
+            close(current, d)
+            current = None
+
+    if current is not None:
+        close(current)
+
+    return partnerships
+
+
+def innings_version(innings_id):
+    row = db.fetch_one("SELECT version FROM innings_version WHERE innings_id = ?", (innings_id,))
+    return row['version'] if row else 0
+
+
+def get_partnerships(innings_id):
+    """Partnerships for an innings, recomputed only when the innings version moves"""
+    version = innings_version(innings_id)
+
+    with _cache_lock:
+        cached = _cache.get(innings_id)
+        if cached and cached[0] == version:
+            _cache.move_to_end(innings_id)
+            return cached[1]
+
+    # Another worker may already have stored this version
+    partnerships = db.fetch_all(f"""
+        SELECT {', '.join(_PARTNERSHIP_FIELDS)} FROM partnerships
+        WHERE innings_id = ? AND innings_version = ?
+        ORDER BY id
+    """, (innings_id, version))
+
+    if not partnerships:
+        deliveries = db.for_innings(innings_id).fetch_all(f"""
+            SELECT {_DELIVERY_COLUMNS}
+            FROM deliveries d
+            WHERE d.innings_id = ?
+            ORDER BY d.over_number, d.ball_number, d.id
+        """, (innings_id,))
+        partnerships = compute_partnerships(deliveries)
+        for p in partnerships:
+            p['innings_version'] = version
+        _store(innings_id, partnerships)
+
+    with _cache_lock:
+        _cache[innings_id] = (version, partnerships)
+        _cache.move_to_end(innings_id)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return partnerships
+
+
+def forget(innings_ids):
+    """Drop cached partnerships of innings that no longer exist"""
+    with _cache_lock:
+        for innings_id in innings_ids:
+            _cache.pop(innings_id, None)
+
+
+def _store(innings_id, partnerships):
+    """Replace the persisted partnerships of one innings"""
+    placeholders = ', '.join('?' for _ in _PARTNERSHIP_FIELDS)
+
+    def replace(conn):
+        conn.execute("DELETE FROM partnerships WHERE innings_id = ?", (innings_id,))
+        conn.executemany(
+            f"INSERT INTO partnerships ({', '.join(_PARTNERSHIP_FIELDS)}) VALUES ({placeholders})",
+            [tuple(p[f] for f in _PARTNERSHIP_FIELDS) for p in partnerships]
+        )
+    db.write(replace)
+
+
+def rebuild_partnerships():
+    """Recompute partnerships for every innings in one ordered pass over deliveries"""
+    versions = {
+        row['innings_id']: row['version']
+        for row in db.fetch_all("SELECT innings_id, version FROM innings_version")
+    }
+    rows = []
+    innings_count = 0
+
+    def flush(innings_id, deliveries):
+        for p in compute_partnerships(deliveries):
+            p['innings_version'] = versions.get(innings_id, 0)
+            rows.append(tuple(p[f] for f in _PARTNERSHIP_FIELDS))
+
+    # An innings never spans shards, so each shard is walked on its own
+    for shard in db.shards():
+        current_innings = None
+        deliveries = []
+        for d in shard.iterate(f"""
+            SELECT {_DELIVERY_COLUMNS}
+            FROM deliveries d
+            ORDER BY d.innings_id, d.over_number, d.ball_number, d.id
+        """):
+            if d['innings_id'] != current_innings:
+                if deliveries:
+                    flush(current_innings, deliveries)
+                    innings_count += 1
+                current_innings = d['innings_id']
+                deliveries = []
+            deliveries.append(d)
+        if deliveries:
+            flush(current_innings, deliveries)
+            innings_count += 1
+
+    placeholders = ', '.join('?' for _ in _PARTNERSHIP_FIELDS)
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM partnerships")
+        conn.executemany(
+            f"INSERT INTO partnerships ({', '.join(_PARTNERSHIP_FIELDS)}) VALUES ({placeholders})",
+            rows
+        )
+
+    with _cache_lock:
+        _cache.clear()
+
+    return {'innings': innings_count, 'partnerships': len(rows)}
+
+
+def best_partnerships(limit=10, wicket_number=None, match_format=None):
+    """Leaderboard of the highest partnerships across all innings"""
+    # Bring innings scored since their partnerships were stored up to date
+    stale = db.fetch_all("""
+        SELECT v.innings_id FROM innings_version v
+        WHERE NOT EXISTS (
+            SELECT 1 FROM partnerships p
+            WHERE p.innings_id = v.innings_id AND p.innings_version = v.version
+        )
+    """)
+    for row in stale:
+        get_partnerships(row['innings_id'])
+
+    conditions = ["1=1"]
+    params = []
+    if wicket_number:
+        conditions.append("p.wicket_number = ?")
+        params.append(wicket_number)
+    if match_format:
+        conditions.append("m.match_format = ?")
+        params.append(match_format)
+    params.append(limit)
+
+    return db.fetch_all(f"""
+        SELECT p.*,
+            b1.first_name || ' ' || b1.last_name as batter1_name,
+            b2.first_name || ' ' || b2.last_name as batter2_name,
+            m.match_title, m.match_date, m.match_format
+        FROM partnerships p
+        LEFT JOIN players b1 ON p.batter1_id = b1.id
+        LEFT JOIN players b2 ON p.batter2_id = b2.id
+        LEFT JOIN matches m ON p.match_id = m.id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY p.runs DESC, p.balls ASC
+        LIMIT ?
+    """, params)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        result = rebuild_partnerships()
+        print(f"Rebuilt {result['partnerships']} partnerships across {result['innings']} innings.")
+    else:
+        print("Usage: python -m services.partnership_engine rebuild")
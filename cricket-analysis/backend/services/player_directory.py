@@ -0,0 +1,105 @@
+# backend/services/player_directory.py
+#
+# In-process player id -> display info, so delivery payloads get names from a
+# dict instead of joining players once per name column per row. create/update
+# of a player invalidates its entry here; an edit made by another worker
+# process moves names_version, which empties the whole dict on the next
+# lookup. Entries also expire after PLAYER_CACHE_TTL.
+
+import threading
+import time
+
+from models import db
+from config import Config
+
+# Delivery id column -> the name field it used to be joined into
+NAME_COLUMNS = {
+    'batsman_id': 'batsman_name',
+    'non_striker_id': 'non_striker_name',
+    'bowler_id': 'bowler_name',
+    'fielder_id': 'fielder_name',
+    'dismissed_batsman_id': 'dismissed_name',
+}
+
+_INFO_SQL = """
+    SELECT id, first_name || ' ' || last_name as name,
+        team_id, batting_style, bowling_style, player_role
+    FROM players WHERE id IN ({placeholders})
+"""
+
+_LOAD_CHUNK = 500
+
+_cache = {}
+_lock = threading.Lock()
+_version = None
+
+
+def names_version():
+    """Bumped by triggers on every player or team update and delete"""
+    row = db.fetch_one("SELECT version FROM names_version WHERE id = 1")
+    return row['version'] if row else 0
+
+
+def lookup(player_ids):
+    """{id: info} for the given ids; unknown ids are left out"""
+    global _version
+    now = time.monotonic()
+    version = names_version()
+    found, missing = {}, []
+    with _lock:
+        if version != _version:
+            _cache.clear()
+            _version = version
+        for player_id in set(player_ids):
+            if player_id is None:
+                continue
+            entry = _cache.get(player_id)
+            if entry and now - entry[1] < Config.PLAYER_CACHE_TTL:
+                found[player_id] = entry[0]
+            else:
+                missing.append(player_id)
+
+    for start in range(0, len(missing), _LOAD_CHUNK):
+        chunk = missing[start:start + _LOAD_CHUNK]
+        rows = db.fetch_all(_INFO_SQL.format(placeholders=', '.join('?' for _ in chunk)), chunk)
+        with _lock:
+            for info in rows:
+                _cache[info['id']] = (info, now)
+                found[info['id']] = info
+    return found
+
+
+def names(player_ids):
+    return {player_id: info['name'] for player_id, info in lookup(player_ids).items()}
+
+
+def invalidate(player_id=None):
+    """Forget one player (or everyone) after a create or update"""
+    with _lock:
+        if player_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(player_id, None)
+
+
+def _ids(rows, columns):
+    return {row[c] for row in rows for c in columns if row.get(c) is not None}
+
+
+def attach_names(rows, columns, batting_style=False):
+    """Add the *_name field of each id column to rows in place (and the batter's batting_style)"""
+    wanted = set(columns) | ({'batsman_id'} if batting_style else set())
+    players = lookup(_ids(rows, wanted))
+    for row in rows:
+        for column in columns:
+            info = players.get(row.get(column))
+            row[NAME_COLUMNS[column]] = info['name'] if info else None
+        if batting_style:
+            info = players.get(row.get('batsman_id'))
+            row['batting_style'] = info['batting_style'] if info else None
+    return rows
+
+
+def side_table(rows, columns):
+    """One entry per distinct player referenced by rows, keyed by id"""
+    return lookup(_ids(rows, columns))
@@ -0,0 +1,137 @@
+# backend/services/player_search.py
+#
+# Typeahead for the scoring UI. Query words of 3+ characters go through the
+# players_fts trigram index (any substring of a first or last name); shorter
+# words are name prefixes answered from the NOCASE name indexes. Players from
+# the current match's two sides rank first, then names that start with the
+# first word.
+
+from models import db
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def _phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _prefix_pattern(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def squad_team_ids(match_id):
+    """Home and away team of a match (empty if unknown)"""
+    if not match_id:
+        return []
+    match = db.fetch_one("SELECT team_home_id, team_away_id FROM matches WHERE id = ?", (match_id,))
+    if match is None:
+        return []
+    return [t for t in (match['team_home_id'], match['team_away_id']) if t is not None]
+
+
+_COLUMNS = """p.id, p.first_name, p.last_name, p.team_id, p.player_role, p.jersey_number,
+               t.short_name as team_short"""
+
+_PREFIX_SQL = "(p.first_name LIKE ? ESCAPE '\\' OR p.last_name LIKE ? ESCAPE '\\')"
+
+
+def search_players(q, match_id=None, limit=DEFAULT_LIMIT):
+    """Top `limit` players whose names contain every word of q"""
+    words = (q or '').split()
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    squad = squad_team_ids(match_id)
+    in_squad = f"p.team_id IN ({', '.join('?' * len(squad))})" if squad else "0"
+
+    if not words:
+        # Nothing typed yet: offer the squads
+        if not squad:
+            return []
+        return db.fetch_all(f"""
+            SELECT {_COLUMNS}, 1 as in_squad, 0 as is_prefix
+            FROM players p
+            LEFT JOIN teams t ON p.team_id = t.id
+            WHERE {in_squad}
+            ORDER BY p.first_name, p.last_name
+            LIMIT ?
+        """, squad + [limit])
+
+    trigram_words = [w for w in words if len(w) >= 3]
+    if not trigram_words:
+        return _prefix_search(words, squad, in_squad, limit)
+
+    conditions = ["players_fts MATCH ?"]
+    params = [' '.join(_phrase(w) for w in trigram_words)]
+    for word in words:
+        if len(word) < 3:
+            conditions.append(_PREFIX_SQL)
+            params += [_prefix_pattern(word)] * 2
+
+    first = _prefix_pattern(words[0])
+    return db.fetch_all(f"""
+        SELECT {_COLUMNS},
+               {in_squad} as in_squad,
+               {_PREFIX_SQL} as is_prefix
+        FROM players_fts JOIN players p ON p.id = players_fts.rowid
+        LEFT JOIN teams t ON p.team_id = t.id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY in_squad DESC, is_prefix DESC, p.first_name, p.last_name
+        LIMIT ?
+    """, squad + [first, first] + params + [limit])
+
+
+def _prefix_search(words, squad, in_squad, limit):
+    """Only short words (the first keystrokes), which can match a large share
+    of the table: rather than rank every match, take the squad matches and then
+    walk the first- and last-name indexes in order, stopping at `limit`."""
+    first = _prefix_pattern(words[0])
+    rest, params = '', []
+    for word in words[1:]:
+        rest += f" AND {_PREFIX_SQL}"
+        params += [_prefix_pattern(word)] * 2
+
+    found = []
+    if squad:
+        found = db.fetch_all(f"""
+            SELECT {_COLUMNS}, 1 as in_squad, 1 as is_prefix
+            FROM players p
+            LEFT JOIN teams t ON p.team_id = t.id
+            WHERE {in_squad} AND {_PREFIX_SQL}{rest}
+            ORDER BY p.first_name, p.last_name
+            LIMIT ?
+        """, squad + [first, first] + params + [limit])
+
+    seen = {p['id'] for p in found}
+    for column in ('first_name', 'last_name'):
+        if len(found) >= limit:
+            break
+        for player in db.fetch_all(f"""
+            SELECT {_COLUMNS}, 0 as in_squad, 1 as is_prefix
+            FROM players p
+            LEFT JOIN teams t ON p.team_id = t.id
+            WHERE p.{column} LIKE ? ESCAPE '\\'{rest}
+            ORDER BY p.{column} COLLATE NOCASE
+            LIMIT ?
+        """, [first] + params + [limit + len(seen)]):
+            if player['id'] not in seen:
+                seen.add(player['id'])
+                found.append(player)
+    return found[:limit]
+
+
+def rebuild_player_index():
+    """Repopulate players_fts from the players table"""
+    def rebuild(conn):
+        conn.execute("INSERT INTO players_fts (players_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO players_fts (players_fts) VALUES ('optimize')")
+    db.write(rebuild)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        rebuild_player_index()
+        print("Player search index rebuilt.")
+    else:
+        print("Usage: python -m services.player_search rebuild")
@@ -0,0 +1,202 @@
+# backend/services/rollup_cube.py
+#
+# Venue / season / format / batting team / phase / innings number rollups of
+# finished matches. Each match is reduced once to a handful of rows in
+# rollup_match_cells (one per innings and phase, plus an 'All' phase row per
+# innings) and those are added into rollup_cube, whose cells are summed by
+# slice_cube(). Dashboards never touch deliveries.
+#
+# A match is added when it is saved with a finished status and taken out
+# again when it is deleted or reopened. refresh() also re-reduces finished
+# matches whose deliveries were corrected since (their innings versions
+# moved).
+
+from models import db
+from responses import FINISHED_STATUSES
+
+DIMENSIONS = ('venue', 'season', 'match_format', 'batting_team_id', 'phase', 'innings_number')
+MEASURES = ('innings', 'runs', 'balls', 'wickets', 'boundaries', 'dots', 'extras')
+
+ALL_PHASES = 'All'
+
+_COLUMNS = ', '.join(DIMENSIONS + MEASURES)
+
+_STATUSES = ', '.join(f"'{s}'" for s in FINISHED_STATUSES)
+
+# One match's deliveries per innings and phase. Dimensions are NOT NULL in
+# the cube key, so missing values become '' / 0.
+_MATCH_CELLS_SQL = f"""
+    INSERT INTO rollup_match_cells (match_id, {_COLUMNS})
+    SELECT
+        m.id,
+        COALESCE(m.venue, ''),
+        COALESCE(CAST(strftime('%Y', m.match_date) AS INTEGER), 0),
+        COALESCE(m.match_format, ''),
+        COALESCE(i.batting_team_id, 0),
+        COALESCE(d.phase, 'Middle'),
+        i.innings_number,
+        COUNT(DISTINCT d.innings_id),
+        COALESCE(SUM(d.runs_scored), 0),
+        COUNT(CASE WHEN d.extra_type IN ('None', 'Bye', 'Leg Bye') THEN 1 END),
+        COUNT(CASE WHEN d.is_wicket = 1 THEN 1 END),
+        COUNT(CASE WHEN d.is_boundary = 1 OR d.is_six = 1 THEN 1 END),
+        COUNT(CASE WHEN d.is_dot = 1 THEN 1 END),
+        COALESCE(SUM(d.extras), 0)
+    FROM {{schema}}.deliveries d
+    JOIN innings i ON i.id = d.innings_id
+    JOIN matches m ON m.id = d.match_id
+    WHERE d.match_id = ? AND m.status IN ({_STATUSES})
+    GROUP BY i.innings_number, COALESCE(d.phase, 'Middle')
+    ON CONFLICT (match_id, innings_number, phase) DO UPDATE SET
+        {', '.join(f'{m} = {m} + excluded.{m}' for m in MEASURES if m != 'innings')}
+"""
+
+# An innings counts once per phase but also only once overall, so the
+# whole-innings rows are stored rather than summed from phases at query time
+_ALL_PHASES_SQL = f"""
+    INSERT INTO rollup_match_cells (match_id, {_COLUMNS})
+    SELECT match_id, venue, season, match_format, batting_team_id, '{ALL_PHASES}', innings_number,
+        1, {', '.join(f'SUM({m})' for m in MEASURES if m != 'innings')}
+    FROM rollup_match_cells
+    WHERE match_id = ?
+    GROUP BY innings_number
+"""
+
+_ON_CONFLICT_SQL = f"""
+    ON CONFLICT ({', '.join(DIMENSIONS)}) DO UPDATE SET
+        {', '.join(f'{m} = {m} + excluded.{m}' for m in MEASURES)}
+"""
+
+
+def _fold(conn, match_id, sign):
+    conn.execute(f"""
+        INSERT INTO rollup_cube ({_COLUMNS})
+        SELECT {', '.join(DIMENSIONS)}, {', '.join(f'{sign} * {m}' for m in MEASURES)}
+        FROM rollup_match_cells WHERE match_id = ?
+        {_ON_CONFLICT_SQL}
+    """, (match_id,))
+
+
+def remove_match(conn, match_id):
+    """Take one match out of the cube, inside the caller's transaction"""
+    _fold(conn, match_id, -1)
+    conn.execute("DELETE FROM rollup_match_cells WHERE match_id = ?", (match_id,))
+    conn.execute("DELETE FROM rollup_matches WHERE match_id = ?", (match_id,))
+    conn.execute("DELETE FROM rollup_cube WHERE innings = 0")
+
+
+def add_match(conn, match_id, schemas=('main',)):
+    """(Re)reduce one match into the cube if it is finished, inside the caller's transaction.
+
+    schemas are where its deliveries live on conn (see match_storage).
+    """
+    remove_match(conn, match_id)
+    for schema in schemas:
+        conn.execute(_MATCH_CELLS_SQL.format(schema=schema), (match_id,))
+    if conn.execute("SELECT 1 FROM rollup_match_cells WHERE match_id = ?", (match_id,)).fetchone() is None:
+        return False
+    conn.execute(_ALL_PHASES_SQL, (match_id,))
+    _fold(conn, match_id, 1)
+    conn.execute("""
+        INSERT INTO rollup_matches (match_id, versions)
+        SELECT ?, COALESCE(SUM(v.version), 0) FROM innings i
+        JOIN innings_version v ON v.innings_id = i.id
+        WHERE i.match_id = ?
+    """, (match_id, match_id))
+    return True
+
+
+def refresh_match(match_id):
+    """Bring one match's cells up to date after its status or deliveries changed"""
+    target = db.for_match(match_id)
+    # Rows scored before sharding was switched on can still sit in core
+    schemas = ('main', 'core') if target is not db else ('main',)
+    return target.write(lambda conn: add_match(conn, match_id, schemas))
+
+
+def stale_matches():
+    """Finished matches missing from the cube or corrected since, and cube matches no longer finished"""
+    rows = db.fetch_all(f"""
+        SELECT m.id as match_id FROM matches m
+        LEFT JOIN rollup_matches r ON r.match_id = m.id
+        WHERE m.status IN ({_STATUSES})
+          AND (r.match_id IS NULL OR r.versions != (
+              SELECT COALESCE(SUM(v.version), 0) FROM innings i
+              JOIN innings_version v ON v.innings_id = i.id
+              WHERE i.match_id = m.id))
+        UNION
+        SELECT r.match_id FROM rollup_matches r
+        LEFT JOIN matches m ON m.id = r.match_id
+        WHERE m.id IS NULL OR m.status NOT IN ({_STATUSES})
+    """)
+    return [r['match_id'] for r in rows]
+
+
+def refresh(limit=None):
+    """Re-reduce every stale match, one transaction each; returns how many were touched"""
+    match_ids = stale_matches()[:limit]
+    for match_id in match_ids:
+        refresh_match(match_id)
+    return len(match_ids)
+
+
+def rebuild_cube():
+    """Drop the cube and reduce every finished match again"""
+    def clear(conn):
+        for table in ('rollup_cube', 'rollup_match_cells', 'rollup_matches'):
+            conn.execute(f"DELETE FROM {table}")
+    db.write(clear)
+    return {'matches': refresh()}
+
+
+def _with_rates(cell):
+    cell['average_score'] = round(cell['runs'] / cell['innings'], 2) if cell['innings'] else None
+    cell['run_rate'] = round(cell['runs'] * 6.0 / cell['balls'], 2) if cell['balls'] else None
+    cell['wickets_per_innings'] = round(cell['wickets'] / cell['innings'], 2) if cell['innings'] else None
+    cell['dot_percentage'] = round(cell['dots'] * 100.0 / cell['balls'], 2) if cell['balls'] else None
+    cell['balls_per_boundary'] = round(cell['balls'] / cell['boundaries'], 2) if cell['boundaries'] else None
+    return cell
+
+
+def slice_cube(group_by=(), filters=None):
+    """Sum cube cells matching filters, one result row per combination of group_by.
+
+    filters map a dimension to one value or a list of values. Without a
+    phase in group_by or filters the whole-innings cells are read, so
+    innings are never counted once per phase.
+    """
+    filters = dict(filters or {})
+    unknown = [d for d in list(group_by) + list(filters) if d not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimension(s): {', '.join(unknown)}")
+
+    if 'phase' not in group_by:
+        phase = filters.get('phase', ALL_PHASES)
+        if isinstance(phase, list):
+            if len(phase) != 1:
+                raise ValueError("Several phases need phase in group_by")
+            phase = phase[0]
+        filters['phase'] = phase
+
+    where, params = [], []
+    for dim, value in filters.items():
+        if isinstance(value, list):
+            where.append(f"{dim} IN ({', '.join('?' for _ in value)})")
+            params.extend(value)
+        else:
+            where.append(f"{dim} = ?")
+            params.append(value)
+    if 'phase' not in filters:
+        where.append("phase != ?")
+        params.append(ALL_PHASES)
+
+    query = f"""
+        SELECT {''.join(f'{d}, ' for d in group_by)}{', '.join(f'SUM({m}) as {m}' for m in MEASURES)}
+        FROM rollup_cube
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        {'GROUP BY ' + ', '.join(group_by) if group_by else ''}
+        {'ORDER BY ' + ', '.join(group_by) if group_by else ''}
+    """
+    rows = db.fetch_all(query, params)
+    # An ungrouped SUM over no cells is one row of NULLs
+    return [_with_rates(r) for r in rows if r['innings']]
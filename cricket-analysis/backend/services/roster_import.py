@@ -0,0 +1,274 @@
+# backend/services/roster_import.py
+#
+# Bulk team / player upserts for onboarding a league. Incoming rows are
+# matched to existing ones on a natural key instead of ids: teams on name,
+# players on (first name, last name, team) narrowed by jersey number, all
+# case-insensitively. Everything in one request is applied in a single write
+# with executemany, and the result maps every input row to its id.
+#
+# Only the fields a row carries are changed on an existing record, so a CSV
+# with just names and jersey numbers leaves batting styles alone.
+
+from models import db
+from services import player_directory
+
+TEAM_FIELDS = ('name', 'short_name')
+PLAYER_FIELDS = ('first_name', 'last_name', 'team_id', 'batting_style', 'bowling_style',
+                 'player_role', 'jersey_number')
+
+CREATED, UPDATED, UNCHANGED = 'created', 'updated', 'unchanged'
+
+
+class RosterError(ValueError):
+    """Rows that cannot be applied; nothing from the request was written"""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid row(s)')
+        self.errors = errors
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _number(value):
+    value = _text(value)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value  # Jersey "00" style values stay text
+
+
+def _team_id(value):
+    value = _text(value)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError('team_id must be an integer') from None
+
+
+def _key(value):
+    return (value or '').casefold()
+
+
+def _clean_team(row):
+    team = {f: _text(row[f]) for f in TEAM_FIELDS if f in row}
+    if not team.get('name'):
+        raise ValueError('name is required')
+    return team
+
+
+def _clean_player(row):
+    player = {}
+    for f in PLAYER_FIELDS:
+        if f in row:
+            player[f] = (_team_id(row[f]) if f == 'team_id'
+                         else _number(row[f]) if f == 'jersey_number' else _text(row[f]))
+    if not player.get('first_name') or not player.get('last_name'):
+        raise ValueError('first_name and last_name are required')
+    # A team can be named instead of given by id (resolved in the write)
+    if row.get('team') is not None and 'team_id' not in player:
+        player['team'] = _text(row['team'])
+    return player
+
+
+def _validate(rows, clean):
+    cleaned, errors = [], []
+    for n, row in enumerate(rows):
+        try:
+            cleaned.append(clean(row))
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append({'row': n, 'error': str(e)})
+    if errors:
+        raise RosterError(errors)
+    return cleaned
+
+
+def _apply(conn, table, fields, existing, pending, key_fields=()):
+    """Insert new rows and update changed ones with executemany.
+
+    existing: {match key: current row}; pending: [(match key, cleaned row)].
+    key_fields matched case-insensitively keep their stored spelling.
+    Returns one {'id', 'status'} per pending row, in order.
+    """
+    results = [None] * len(pending)
+    inserts, updates = [], []
+    new_keys = {}
+    for n, (key, row) in enumerate(pending):
+        current = existing.get(key)
+        if current is None:
+            # The same new record twice in one request is created once, with
+            # the later rows' fields applied as they would be to an existing one
+            if key in new_keys:
+                results[n], first = new_keys[key]
+                first.update({f: v for f, v in row.items() if f not in key_fields})
+                continue
+            row = dict(row)
+            results[n] = {'id': None, 'status': CREATED}
+            new_keys[key] = (results[n], row)
+            inserts.append((n, row))
+            continue
+        merged = dict(current, **{f: v for f, v in row.items() if f not in key_fields})
+        changed = any(merged[f] != current[f] for f in fields)
+        results[n] = {'id': current['id'], 'status': UPDATED if changed else UNCHANGED}
+        if changed:
+            current.update(merged)
+            updates.append(tuple(merged[f] for f in fields) + (current['id'],))
+
+    if inserts:
+        before = conn.execute(f"SELECT COALESCE(MAX(id), 0) as id FROM {table}").fetchone()['id']
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({', '.join('?' for _ in fields)})",
+            [tuple(row.get(f) for f in fields) for _, row in inserts]
+        )
+        # One writer, so the new ids are the ones above the old maximum, in insert order
+        new_ids = [r['id'] for r in conn.execute(f"SELECT id FROM {table} WHERE id > ? ORDER BY id", (before,))]
+        for (n, _), new_id in zip(inserts, new_ids):
+            results[n]['id'] = new_id
+    if updates:
+        conn.executemany(
+            f"UPDATE {table} SET {', '.join(f'{f} = ?' for f in fields)} WHERE id = ?",
+            updates
+        )
+    return [dict(r) for r in results]
+
+
+def _upsert_teams(conn, teams):
+    existing = {
+        _key(r['name']): r
+        for r in conn.execute(f"SELECT id, {', '.join(TEAM_FIELDS)} FROM teams")
+    }
+    return _apply(conn, 'teams', TEAM_FIELDS, existing, [(_key(t['name']), t) for t in teams],
+                  key_fields=('name',))
+
+
+def _player_key(p):
+    return (_key(p['first_name']), _key(p['last_name']), p.get('team_id'))
+
+
+def _same_player(records, jersey):
+    """Records a row with this jersey number is taken to be: the one with that
+    number, else one without any (any of them for a row without one)"""
+    if jersey is None:
+        return records
+    return ([r for r in records if _number(r['jersey_number']) == jersey]
+            or [r for r in records if r['jersey_number'] is None])
+
+
+def _upsert_players(conn, players):
+    if not players:
+        return []
+    # Named teams must already exist (or come in the same squad request)
+    names = {_key(p['team']) for p in players if p.get('team')}
+    if names:
+        team_ids = {_key(r['name']): r['id'] for r in conn.execute("SELECT id, name FROM teams")}
+        unknown = sorted(n for n in names if n not in team_ids)
+        if unknown:
+            raise RosterError([{'team': n, 'error': 'unknown team'} for n in unknown])
+        for p in players:
+            if p.get('team'):
+                p['team_id'] = team_ids[_key(p.pop('team'))]
+    for p in players:
+        p.pop('team', None)
+
+    # Teams given by id must exist too
+    ids = {p['team_id'] for p in players if p.get('team_id') is not None}
+    if ids:
+        known = {r['id'] for r in conn.execute(
+            f"SELECT id FROM teams WHERE id IN ({', '.join('?' for _ in ids)})", list(ids))}
+        errors = [{'row': n, 'error': f"unknown team_id {p['team_id']}"}
+                  for n, p in enumerate(players) if p.get('team_id') not in known | {None}]
+        if errors:
+            raise RosterError(errors)
+
+    team_ids = {p.get('team_id') for p in players}
+    conditions = []
+    if None in team_ids:
+        conditions.append("team_id IS NULL")
+    ids = [t for t in team_ids if t is not None]
+    if ids:
+        conditions.append(f"team_id IN ({', '.join('?' for _ in ids)})")
+    candidates = {}
+    for r in conn.execute(
+        f"SELECT id, {', '.join(PLAYER_FIELDS)} FROM players WHERE {' OR '.join(conditions)} ORDER BY id", ids
+    ):
+        candidates.setdefault(_player_key(r), []).append(r)
+
+    # Same name on the same team: the jersey number tells them apart, and a
+    # record without one is taken to be the same player. Players created by
+    # this request are matched the same way.
+    pending, errors = [], []
+    created = {}
+    for n, p in enumerate(players):
+        jersey = p.get('jersey_number')
+        matches = _same_player(candidates.get(_player_key(p), []), jersey)
+        if not matches:
+            new = created.setdefault(_player_key(p), [])
+            matches = _same_player(new, jersey)
+            if not matches:
+                matches = [{'id': ('new',) + _player_key(p) + (len(new),), 'jersey_number': jersey}]
+                new.append(matches[0])
+            elif len(matches) == 1 and jersey is not None:
+                matches[0]['jersey_number'] = jersey
+        if len(matches) > 1:
+            errors.append({'row': n, 'error': 'matches several players; give a jersey_number'})
+            continue
+        pending.append((matches[0]['id'], p))
+    if errors:
+        raise RosterError(errors)
+
+    existing = {m['id']: m for ms in candidates.values() for m in ms}
+    return _apply(conn, 'players', PLAYER_FIELDS, existing, pending,
+                  key_fields=('first_name', 'last_name'))
+
+
+def _warm(results):
+    """After commit: reload the touched players into the directory"""
+    ids = [r['id'] for r in results]
+    for player_id in ids:
+        player_directory.invalidate(player_id)
+    player_directory.lookup(ids)
+
+
+def _summary(key, results):
+    return {
+        key: results,
+        **{status: sum(1 for r in results if r['status'] == status)
+           for status in (CREATED, UPDATED, UNCHANGED)},
+    }
+
+
+def upsert_teams(rows):
+    """Create or update teams matched on name"""
+    teams = _validate(rows, _clean_team)
+    return _summary('teams', db.write(lambda conn: _upsert_teams(conn, teams)))
+
+
+def upsert_players(rows):
+    """Create or update players matched on name, team (team_id or team name) and jersey number"""
+    players = _validate(rows, _clean_player)
+    results = db.write(lambda conn: _upsert_players(conn, players), after=_warm)
+    return _summary('players', results)
+
+
+def upsert_squad(team, rows):
+    """One team and its players, matched as above, in one transaction"""
+    team = _validate([team], _clean_team)
+    players = _validate(rows, _clean_player)
+
+    def run(conn):
+        team_result = _upsert_teams(conn, team)[0]
+        for p in players:
+            p.pop('team', None)
+            p['team_id'] = team_result['id']
+        return {'team': team_result, 'players': _upsert_players(conn, players)}
+
+    results = db.write(run, after=lambda r: _warm(r['players']))
+    return {'team': results['team'], **_summary('players', results['players'])}
@@ -0,0 +1,353 @@
+# backend/services/video_processor.py
+#
+# Suggests video_timestamp_start/end for a match's deliveries. The video is
+# split into segments that a process pool scans for shot boundaries (colour
+# histogram distance between sampled frames). Cuts close together are merged,
+# the shots between them that are as long as a delivery and open on the most
+# common camera (the one behind the bowler) become candidate windows, and the
+# match's deliveries are aligned with those windows in order. Analysts review
+# the stored suggestions and confirm them onto the deliveries.
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from models import db
+from config import Config
+
+Window = namedtuple('Window', 'start end strength signature')
+
+# Cost (in deliveries' worth of spacing) of leaving a delivery without a window
+SKIP_DELIVERY_COST = 3.0
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+# --- Cut detection (runs in worker processes) ---------------------------
+
+def probe(path):
+    """(duration in seconds, frames per second) of a video file"""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+        return frames / fps, fps
+    finally:
+        cap.release()
+
+
+def segments(duration, length=None):
+    """Split [0, duration) into (start, end) pieces for the pool"""
+    length = length or Config.SCENE_SEGMENT_SECONDS
+    bounds = []
+    start = 0.0
+    while start < duration:
+        bounds.append((start, min(start + length, duration)))
+        start += length
+    return bounds
+
+
+def detect_cuts(path, start, end, sample_fps=None, threshold=None):
+    """Shot boundaries in [start, end) as (seconds, histogram distance, histogram after) triples"""
+    import cv2
+
+    sample_fps = sample_fps or Config.SCENE_SAMPLE_FPS
+    threshold = Config.SCENE_CUT_THRESHOLD if threshold is None else threshold
+    cap = cv2.VideoCapture(path)
+    cuts = []
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        step = max(1, round(fps / sample_fps))
+        # Start one sample early so a cut on the segment boundary is seen
+        cap.set(cv2.CAP_PROP_POS_MSEC, max(0.0, start - step / fps) * 1000)
+        previous = None
+        frame_index = 0
+        while cap.grab():
+            # Only reliable once a frame has been grabbed after the seek
+            t = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            if t >= end:
+                break
+            if frame_index % step == 0:
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                small = cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA)
+                hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+                hist = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+                cv2.normalize(hist, hist)
+                if previous is not None:
+                    distance = cv2.compareHist(previous, hist, cv2.HISTCMP_BHATTACHARYYA)
+                    if distance >= threshold and t >= start:
+                        cuts.append((round(t, 3), round(distance, 3), hist.flatten().tolist()))
+                previous = hist
+            frame_index += 1
+    finally:
+        cap.release()
+    return cuts
+
+
+def find_cuts(path, workers=None):
+    """Every shot boundary in the video, segments scanned in parallel"""
+    duration, _ = probe(path)
+    workers = workers or Config.VIDEO_WORKERS
+    # Spawned, not forked: the app process runs writer and snapshot threads
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(detect_cuts, path, start, end) for start, end in segments(duration)]
+        cuts = [cut for future in futures for cut in future.result()]
+    return sorted(cuts), duration
+
+
+# --- Windows and alignment ----------------------------------------------
+
+def delivery_windows(cuts, duration, merge_gap=None, min_length=None, max_length=None):
+    """Shots between clustered cuts that are as long as a delivery.
+
+    Cuts closer than merge_gap (a dissolve, a flash, a quick camera switch)
+    count as one, as strong as its strongest cut and opening on the shot
+    after its last.
+    """
+    merge_gap = Config.CUT_MERGE_GAP if merge_gap is None else merge_gap
+    min_length = min_length or Config.DELIVERY_MIN_SECONDS
+    max_length = max_length or Config.DELIVERY_MAX_SECONDS
+
+    clusters = []
+    for t, distance, signature in cuts:
+        if clusters and t - clusters[-1]['last'] <= merge_gap:
+            cluster = clusters[-1]
+            cluster['last'], cluster['signature'] = t, signature
+            cluster['strength'] = max(cluster['strength'], distance)
+        else:
+            clusters.append({'at': t, 'last': t, 'strength': distance, 'signature': signature})
+
+    windows = []
+    for cluster, following in zip(clusters, clusters[1:] + [None]):
+        end, strength = (following['at'], following['strength']) if following else (duration, 0.0)
+        # The cut away after the ball is what closes a delivery shot
+        if min_length <= end - cluster['last'] <= max_length:
+            windows.append(Window(cluster['last'], end, strength, cluster['signature']))
+    return windows
+
+
+def main_camera(windows, threshold=None):
+    """The windows that open on the most common shot, by histogram similarity.
+
+    Every ball is shown from the same end-on camera, so those shots form the
+    largest group of look-alikes; replays, crowd and fielding shots do not.
+    """
+    import numpy as np
+
+    if len(windows) < 3:
+        return windows
+    threshold = Config.SCENE_CUT_THRESHOLD if threshold is None else threshold
+    hists = np.array([w.signature for w in windows], dtype=float)
+    hists /= np.maximum(hists.sum(axis=1, keepdims=True), 1e-9)
+    roots = np.sqrt(hists)
+    # Pairwise Bhattacharyya distance, as cv2.compareHist computes it
+    distance = np.sqrt(np.clip(1.0 - roots @ roots.T, 0.0, 1.0))
+    similar = distance < threshold
+    medoid = int(np.argmax(similar.sum(axis=1)))
+    return [w for w, keep in zip(windows, similar[medoid]) if keep]
+
+
+def _expected_times(deliveries, first, last):
+    """Where each delivery should fall, interpolated between already tagged ones"""
+    count = len(deliveries)
+    anchors = [(k, d['video_timestamp_start']) for k, d in enumerate(deliveries)
+               if d.get('video_timestamp_start') is not None]
+    if len(anchors) >= 2:
+        spacing = (anchors[-1][1] - anchors[0][1]) / max(anchors[-1][0] - anchors[0][0], 1)
+    else:
+        spacing = (last - first) / max(count - 1, 1)
+    if not anchors:
+        anchors = [(0, first)]
+
+    expected = []
+    for k in range(count):
+        before = [a for a in anchors if a[0] <= k]
+        after = [a for a in anchors if a[0] > k]
+        if before and after:
+            (k0, t0), (k1, t1) = before[-1], after[0]
+            expected.append(t0 + (t1 - t0) * (k - k0) / (k1 - k0))
+        elif before:
+            k0, t0 = before[-1]
+            expected.append(t0 + spacing * (k - k0))
+        else:
+            k1, t1 = after[0]
+            expected.append(t1 - spacing * (k1 - k))
+    return expected, max(spacing, 1.0)
+
+
+def align(deliveries, windows):
+    """Assign windows to deliveries in order; returns {delivery index: (window, cost)}.
+
+    Dynamic programming over (delivery, window): a window may be passed over
+    for free (replays, crowd shots), a delivery left unassigned at
+    SKIP_DELIVERY_COST, and a match costs the distance from the delivery's
+    expected time in units of the typical spacing between balls.
+    """
+    if not deliveries or not windows:
+        return {}
+    expected, spacing = _expected_times(deliveries, windows[0].start, windows[-1].start)
+    n, m = len(deliveries), len(windows)
+    inf = float('inf')
+    cost = [[inf] * (m + 1) for _ in range(n + 1)]
+    move = [[None] * (m + 1) for _ in range(n + 1)]
+    for j in range(m + 1):
+        cost[0][j] = 0.0
+    for k in range(1, n + 1):
+        cost[k][0] = k * SKIP_DELIVERY_COST
+        move[k][0] = 'skip_delivery'
+        for j in range(1, m + 1):
+            options = (
+                (cost[k][j - 1], 'skip_window'),
+                (cost[k - 1][j] + SKIP_DELIVERY_COST, 'skip_delivery'),
+                (cost[k - 1][j - 1] + abs(windows[j - 1].start - expected[k - 1]) / spacing, 'match'),
+            )
+            cost[k][j], move[k][j] = min(options, key=lambda o: o[0])
+
+    assigned = {}
+    k, j = n, m
+    while k > 0:
+        step = move[k][j]
+        if step == 'match':
+            assigned[k - 1] = (windows[j - 1], cost[k][j] - cost[k - 1][j - 1])
+            k, j = k - 1, j - 1
+        elif step == 'skip_window':
+            j -= 1
+        else:
+            k -= 1
+    return assigned
+
+
+# --- Suggestions --------------------------------------------------------
+
+def match_deliveries(match_id):
+    """A match's deliveries in playing order, both innings"""
+    return db.for_match(match_id).fetch_all("""
+        SELECT d.id, d.innings_id, d.over_number, d.ball_number,
+            d.video_timestamp_start, d.video_timestamp_end
+        FROM deliveries d
+        JOIN innings i ON d.innings_id = i.id
+        WHERE d.match_id = ?
+        ORDER BY i.innings_number, d.over_number, d.ball_number, d.id
+    """, (match_id,))
+
+
+def video_file(match_id):
+    match = db.fetch_one("SELECT video_path FROM matches WHERE id = ?", (match_id,))
+    if not match or not match['video_path']:
+        return None
+    path = os.path.join(Config.VIDEO_UPLOAD_FOLDER, match['video_path'])
+    return path if os.path.isfile(path) else None
+
+
+def suggest_timestamps(match_id, workers=None):
+    """Detect delivery windows in the match video and store one suggestion per untagged delivery"""
+    path = video_file(match_id)
+    if path is None:
+        raise FileNotFoundError(f"No video for match {match_id}")
+    started = time.time()
+    cuts, duration = find_cuts(path, workers)
+    windows = main_camera(delivery_windows(cuts, duration))
+    deliveries = match_deliveries(match_id)
+    assigned = align(deliveries, windows)
+
+    rows = []
+    for k, (window, distance) in assigned.items():
+        d = deliveries[k]
+        if d['video_timestamp_start'] is not None:
+            continue  # Already tagged by an analyst
+        confidence = round(window.strength * max(0.0, 1.0 - distance), 3)
+        rows.append((d['id'], match_id, d['innings_id'], window.start, window.end, confidence))
+
+    def replace(conn):
+        conn.execute("DELETE FROM video_timestamp_suggestions WHERE match_id = ?", (match_id,))
+        conn.executemany("""
+            INSERT INTO video_timestamp_suggestions
+                (delivery_id, match_id, innings_id, start_time, end_time, confidence)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows)
+    db.write(replace)
+
+    return {
+        'match_id': match_id,
+        'video_seconds': round(duration, 1),
+        'cuts': len(cuts),
+        'windows': len(windows),
+        'deliveries': len(deliveries),
+        'suggested': len(rows),
+        'seconds': round(time.time() - started, 1),
+    }
+
+
+def start_job(match_id):
+    """Run suggest_timestamps on a background thread; one job per match at a time"""
+    with _jobs_lock:
+        job = _jobs.get(match_id)
+        if job and job['status'] == 'running':
+            return job
+        job = {'match_id': match_id, 'status': 'running', 'started_at': time.time()}
+        _jobs[match_id] = job
+
+    def run():
+        try:
+            job['result'] = suggest_timestamps(match_id)
+            job['status'] = 'done'
+        except Exception as e:
+            job['error'] = str(e)
+            job['status'] = 'failed'
+        job['finished_at'] = time.time()
+
+    threading.Thread(target=run, name=f'video-suggest-{match_id}', daemon=True).start()
+    return job
+
+
+def job_status(match_id):
+    with _jobs_lock:
+        job = _jobs.get(match_id)
+        return dict(job) if job else None
+
+
+def suggestions(match_id):
+    return db.for_match(match_id).fetch_all("""
+        SELECT s.delivery_id, s.innings_id, s.start_time, s.end_time, s.confidence,
+            d.over_number, d.ball_number
+        FROM video_timestamp_suggestions s
+        JOIN deliveries d ON d.id = s.delivery_id
+        WHERE s.match_id = ?
+        ORDER BY s.start_time
+    """, (match_id,))
+
+
+def confirm(match_id, delivery_ids=None):
+    """Copy suggestions onto their deliveries (all of the match's, or just delivery_ids)"""
+    condition = "match_id = ?"
+    params = [match_id]
+    if delivery_ids is not None:
+        condition += f" AND delivery_id IN ({', '.join('?' for _ in delivery_ids)})"
+        params += list(delivery_ids)
+
+    def apply(conn):
+        # On a shard connection the suggestions table resolves to the core file
+        updated = conn.execute(f"""
+            UPDATE deliveries SET
+                video_timestamp_start = s.start_time,
+                video_timestamp_end = s.end_time,
+                updated_at = CURRENT_TIMESTAMP
+            FROM (SELECT * FROM video_timestamp_suggestions WHERE {condition}) s
+            WHERE deliveries.id = s.delivery_id
+        """, params).rowcount
+        conn.execute(f"DELETE FROM video_timestamp_suggestions WHERE {condition}", params)
+        return updated
+
+    # Their innings versions move, so cached bodies pick up the new timestamps
+    innings_ids = [row['innings_id'] for row in db.fetch_all(
+        f"SELECT DISTINCT innings_id FROM video_timestamp_suggestions WHERE {condition}", params)]
+    return db.for_match(match_id).write(apply, innings=innings_ids)
@@ -0,0 +1,342 @@
+# backend/services/win_probability.py
+#
+# Projected score and win probability from our own delivery history.
+#
+# The archive is reduced offline into dense lookup tables indexed by
+# (format, innings, over, wickets in hand, score/target bucket). Serving a
+# prediction is then a handful of array lookups.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import Config
+from models import db
+
+FORMATS = ('T20', 'ODI', 'Other')
+FORMAT_OVERS = {'T20': 20, 'ODI': 50, 'Other': 50}
+MAX_OVERS = 50
+MAX_WICKETS = 10
+
+# First innings is bucketed by score, the chase by runs still required
+SCORE_BUCKET = 10
+REQUIRED_BUCKET = 5
+N_BUCKETS = 64
+
+# Cells with fewer samples fall back to their smoothed neighbourhood
+MIN_SAMPLES = 30
+
+BATCH_INNINGS = 2000
+
+RUNS_SHAPE = (len(FORMATS), 2, MAX_OVERS + 1, MAX_WICKETS + 1)
+WIN_SHAPE = RUNS_SHAPE + (N_BUCKETS,)
+
+# Latest prediction per innings, for the innings most recently scored
+CACHE_SIZE = 256
+
+_model = None
+_model_lock = threading.Lock()
+_latest = OrderedDict()
+_latest_lock = threading.Lock()
+
+
+# --- Offline build -------------------------------------------------------
+
+def _load_batch(lo, hi):
+    """Deliveries of completed matches for innings ids in [lo, hi] as an int array"""
+    rows = []
+    # Innings never span shards, so concatenating keeps each one contiguous
+    for shard in db.shards():
+        rows.extend(_load_shard_batch(shard, lo, hi))
+    return np.array(rows, dtype=np.int64).reshape(-1, 8)
+
+
+def _load_shard_batch(shard, lo, hi):
+    conn = shard.get_connection()
+    conn.row_factory = None
+    try:
+        return conn.execute("""
+            SELECT
+                d.innings_id,
+                i.innings_number,
+                CASE m.match_format WHEN 'T20' THEN 0 WHEN 'ODI' THEN 1 ELSE 2 END,
+                CASE WHEN m.winner_id = i.batting_team_id THEN 1 ELSE 0 END,
+                COALESCE(i1.total_runs, 0) + 1,
+                COALESCE(d.runs_scored, 0),
+                COALESCE(d.is_wicket, 0),
+                CASE WHEN d.extra_type IN ('None', 'Bye', 'Leg Bye') THEN 1 ELSE 0 END
+            FROM deliveries d
+            JOIN innings i ON d.innings_id = i.id
+            JOIN matches m ON i.match_id = m.id
+            LEFT JOIN innings i1 ON i1.match_id = i.match_id AND i1.innings_number = 1
+            WHERE d.innings_id BETWEEN ? AND ?
+            AND m.winner_id IS NOT NULL
+            AND i.innings_number IN (1, 2)
+            ORDER BY d.innings_id, d.over_number, d.ball_number, d.id
+        """, (lo, hi)).fetchall()
+    finally:
+        conn.close()
+
+
+def _within_innings_cumsum(values, starts, lengths):
+    total = np.cumsum(values)
+    offsets = np.repeat(total[starts] - values[starts], lengths)
+    return total - offsets
+
+
+def accumulate(batch):
+    """Partial sums and counts for one innings-aligned batch of deliveries"""
+    runs_sum = np.zeros(np.prod(RUNS_SHAPE))
+    runs_count = np.zeros(np.prod(RUNS_SHAPE))
+    win_sum = np.zeros(np.prod(WIN_SHAPE))
+    win_count = np.zeros(np.prod(WIN_SHAPE))
+    if len(batch) == 0:
+        return runs_sum, runs_count, win_sum, win_count
+
+    innings_ids = batch[:, 0]
+    starts = np.flatnonzero(np.r_[True, innings_ids[1:] != innings_ids[:-1]])
+    lengths = np.diff(np.r_[starts, len(batch)])
+
+    innings_idx = (batch[:, 1] >= 2).astype(np.int64)
+    fmt = batch[:, 2]
+    won = batch[:, 3]
+    target = batch[:, 4]
+
+    # Match state after each ball
+    score = _within_innings_cumsum(batch[:, 5], starts, lengths)
+    wickets = _within_innings_cumsum(batch[:, 6], starts, lengths)
+    balls = _within_innings_cumsum(batch[:, 7], starts, lengths)
+
+    final = np.repeat(score[starts + lengths - 1], lengths)
+    over = np.minimum(balls // 6, MAX_OVERS)
+    in_hand = np.clip(MAX_WICKETS - wickets, 0, MAX_WICKETS)
+
+    bucket = np.where(
+        innings_idx == 0,
+        score // SCORE_BUCKET,
+        np.maximum(target - score, 0) // REQUIRED_BUCKET
+    )
+    bucket = np.minimum(bucket, N_BUCKETS - 1)
+
+    runs_idx = np.ravel_multi_index((fmt, innings_idx, over, in_hand), RUNS_SHAPE)
+    win_idx = np.ravel_multi_index((fmt, innings_idx, over, in_hand, bucket), WIN_SHAPE)
+
+    runs_sum += np.bincount(runs_idx, weights=final - score, minlength=runs_sum.size)
+    runs_count += np.bincount(runs_idx, minlength=runs_count.size)
+    win_sum += np.bincount(win_idx, weights=won, minlength=win_sum.size)
+    win_count += np.bincount(win_idx, minlength=win_count.size)
+    return runs_sum, runs_count, win_sum, win_count
+
+
+def _accumulate_range(bounds):
+    return accumulate(_load_batch(*bounds))
+
+
+def _smooth(table):
+    """3x3 box sum over the over and bucket axes"""
+    padded = np.pad(table, [(0, 0), (0, 0), (1, 1), (0, 0), (1, 1)])
+    out = np.zeros_like(table)
+    n_overs, n_buckets = table.shape[2], table.shape[4]
+    for i in range(3):
+        for j in range(3):
+            out += padded[:, :, i:i + n_overs, :, j:j + n_buckets]
+    return out
+
+
+def build_model(workers=None, path=None):
+    """Rebuild the lookup tables from every completed match and save them"""
+    started = time.time()
+    innings_ids = np.array([
+        row['id'] for row in db.fetch_all("""
+            SELECT i.id FROM innings i
+            JOIN matches m ON i.match_id = m.id
+            WHERE m.winner_id IS NOT NULL AND i.innings_number IN (1, 2)
+            ORDER BY i.id
+        """)
+    ], dtype=np.int64)
+
+    batches = [
+        (int(chunk[0]), int(chunk[-1]))
+        for chunk in np.array_split(innings_ids, max(1, -(-len(innings_ids) // BATCH_INNINGS)))
+        if len(chunk)
+    ]
+
+    runs_sum = np.zeros(np.prod(RUNS_SHAPE))
+    runs_count = np.zeros(np.prod(RUNS_SHAPE))
+    win_sum = np.zeros(np.prod(WIN_SHAPE))
+    win_count = np.zeros(np.prod(WIN_SHAPE))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(_accumulate_range, batches):
+            runs_sum += partial[0]
+            runs_count += partial[1]
+            win_sum += partial[2]
+            win_count += partial[3]
+
+    runs_sum, runs_count = runs_sum.reshape(RUNS_SHAPE), runs_count.reshape(RUNS_SHAPE)
+    win_sum, win_count = win_sum.reshape(WIN_SHAPE), win_count.reshape(WIN_SHAPE)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        expected_runs = runs_sum / runs_count
+        smoothed = _smooth(win_sum) / _smooth(win_count)
+        win_rate = np.where(win_count >= MIN_SAMPLES, win_sum / win_count, smoothed)
+
+    path = path or Config.WIN_PROBABILITY_MODEL_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(
+        path,
+        expected_runs=expected_runs.astype(np.float32),
+        win_rate=win_rate.astype(np.float32),
+        samples=win_count.sum(axis=4).astype(np.int64),
+        built_at=np.array(time.time()),
+    )
+
+    with _model_lock:
+        global _model
+        _model = None
+    with _latest_lock:
+        _latest.clear()
+
+    return {
+        'innings': len(innings_ids),
+        'balls': int(win_count.sum()),
+        'batches': len(batches),
+        'seconds': round(time.time() - started, 2),
+        'path': path,
+    }
+
+
+# --- Serving -------------------------------------------------------------
+
+def load_model():
+    """Lookup tables, loaded once per process (None until the first build)"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                path = Config.WIN_PROBABILITY_MODEL_PATH
+                if not os.path.exists(path):
+                    return None
+                with np.load(path) as data:
+                    _model = {key: data[key] for key in data.files}
+    return _model
+
+
+def predict(match_format, innings_number, legal_balls, wickets, score, target=None):
+    """Projected total and batting side's win probability for one match state"""
+    model = load_model()
+    if model is None:
+        return None
+
+    if match_format not in FORMAT_OVERS:
+        match_format = 'Other'
+    f = FORMATS.index(match_format)
+    inn = 1 if innings_number >= 2 else 0
+    over = min(legal_balls // 6, MAX_OVERS)
+    in_hand = min(max(MAX_WICKETS - wickets, 0), MAX_WICKETS)
+    balls_left = max(FORMAT_OVERS[match_format] * 6 - legal_balls, 0)
+
+    remaining = float(model['expected_runs'][f, inn, over, in_hand])
+    if remaining != remaining:  # NaN: unseen state, extrapolate the run rate
+        remaining = score * balls_left / legal_balls if legal_balls else 0.0
+    projected = score + remaining
+
+    if inn == 1 and target:
+        required = target - score
+        if required <= 0:
+            win = 1.0
+        elif in_hand == 0 or balls_left == 0:
+            win = 0.0
+        else:
+            bucket = min(required // REQUIRED_BUCKET, N_BUCKETS - 1)
+            win = float(model['win_rate'][f, inn, over, in_hand, bucket])
+    else:
+        bucket = min(score // SCORE_BUCKET, N_BUCKETS - 1)
+        win = float(model['win_rate'][f, inn, over, in_hand, bucket])
+    if win != win:
+        win = 0.5
+
+    return {
+        'projected_score': round(projected),
+        'win_probability': round(win, 3),
+        'runs_required': target - score if inn == 1 and target else None,
+        'balls_remaining': balls_left,
+    }
+
+
+# The prediction follows the innings totals, the first innings (for the
+# chase) and the match format, so it is cached against every innings version
+# of the match and the match row; a corrected or deleted ball, from any
+# worker, moves one of them.
+_STATE_SQL = """
+    SELECT i.innings_number, i.total_runs, i.total_wickets, i.total_overs,
+           m.match_format, m.updated_at,
+           (SELECT i1.total_runs FROM innings i1
+            WHERE i1.match_id = i.match_id AND i1.innings_number = 1) as first_innings_runs,
+           (SELECT COALESCE(SUM(v.version), 0) FROM innings i2
+            JOIN innings_version v ON v.innings_id = i2.id
+            WHERE i2.match_id = i.match_id) as versions
+    FROM innings i
+    JOIN matches m ON i.match_id = m.id
+    WHERE i.id = ?
+"""
+
+
+def _token(state):
+    return (state['versions'], state['updated_at'])
+
+
+def _refresh(innings_id, state):
+    overs = int(state['total_overs'] or 0)
+    legal_balls = overs * 6 + round(((state['total_overs'] or 0) - overs) * 10)
+    target = None
+    if state['innings_number'] >= 2 and state['first_innings_runs'] is not None:
+        target = state['first_innings_runs'] + 1
+
+    prediction = predict(
+        state['match_format'], state['innings_number'], legal_balls,
+        state['total_wickets'] or 0, state['total_runs'] or 0, target
+    )
+    if prediction is not None:
+        with _latest_lock:
+            _latest[innings_id] = (_token(state), prediction)
+            _latest.move_to_end(innings_id)
+            while len(_latest) > CACHE_SIZE:
+                _latest.popitem(last=False)
+    return prediction
+
+
+def on_delivery(innings_id):
+    """Refresh the live prediction for an innings after a ball is recorded"""
+    state = db.fetch_one(_STATE_SQL, (innings_id,))
+    return _refresh(innings_id, state) if state else None
+
+
+def latest_prediction(innings_id):
+    state = db.fetch_one(_STATE_SQL, (innings_id,))
+    if not state:
+        return None
+    with _latest_lock:
+        entry = _latest.get(innings_id)
+        if entry is not None and entry[0] == _token(state):
+            _latest.move_to_end(innings_id)
+            return entry[1]
+    return _refresh(innings_id, state)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Projected score / win probability model')
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--output', default=None, help='Model file (default: Config.WIN_PROBABILITY_MODEL_PATH)')
+    args = parser.parse_args()
+
+    result = build_model(workers=args.workers, path=args.output)
+    print(f"Built from {result['balls']} balls in {result['innings']} innings "
+          f"({result['batches']} batches) in {result['seconds']}s -> {result['path']}")
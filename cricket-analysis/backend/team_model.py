@@ -0,0 +1,22 @@
+# backend/team_model.py
+#
+# Team logos for the landing page, kept through Flask-SQLAlchemy in
+# backend/cricket.db. Imported lazily via `models` (SQLAlchemy is the
+# slowest import in the app).
+
+from flask_sqlalchemy import SQLAlchemy
+
+orm = SQLAlchemy()
+
+class Team(orm.Model):
+    id = orm.Column(orm.Integer, primary_key=True)
+    name = orm.Column(orm.String(100), nullable=False)
+    # This stores the URL for the team logo image
+    logo_url = orm.Column(orm.String(500), nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "logo_url": self.logo_url or "https://via.placeholder.com/150"
+        }
@@ -0,0 +1,95 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from models import db  # noqa: E402
+
+
+def _reset_caches():
+    db._shards.clear()
+    db._match_seasons.clear()
+    db._innings_matches.clear()
+    db.__dict__.pop('_shard_trigger_sql', None)
+    from responses import body_cache
+    from services import match_state, partnership_engine, player_directory
+    body_cache.clear()
+    match_state._cache.clear()
+    partnership_engine._cache.clear()
+    player_directory._cache.clear()
+
+
+@pytest.fixture
+def database(tmp_path):
+    """The shared db, pointed at a new single-file database built from schema.sql"""
+    saved = db.db_path, db.shard_dir
+    db.db_path = str(tmp_path / 'cricket.db')
+    db.shard_dir = ''
+    _reset_caches()
+    db.init_db()
+    yield db
+    db.db_path, db.shard_dir = saved
+    _reset_caches()
+
+
+@pytest.fixture
+def client(database):
+    from app import create_app
+    app = create_app()
+    app.extensions['warmed_up'] = True  # The database fixture already built the schema
+    return app.test_client()
+
+
+@pytest.fixture
+def sharded(database, tmp_path):
+    """The database fixture with deliveries kept in per-season shard files"""
+    database.shard_dir = str(tmp_path / 'shards')
+    return database
+
+
+@pytest.fixture
+def match(database):
+    return add_match(database)
+
+
+def add_match(database, match_date='2024-04-01', match_format='T20'):
+    """A match between two new eleven-player teams, with both innings created"""
+    teams = [database.insert("INSERT INTO teams (name, short_name) VALUES (?, ?)", (name, name[:3].upper()))
+             for name in ('Home', 'Away')]
+    squads = {
+        team_id: [database.insert(
+            "INSERT INTO players (first_name, last_name, team_id) VALUES (?, ?, ?)",
+            (f'Player{n}', f'Team{team_id}', team_id)
+        ) for n in range(11)]
+        for team_id in teams
+    }
+    match_id = database.insert("""
+        INSERT INTO matches (match_title, match_format, team_home_id, team_away_id, match_date, status)
+        VALUES ('Home v Away', ?, ?, ?, ?, 'Live')
+    """, (match_format, *teams, match_date))
+    innings = [database.insert("""
+        INSERT INTO innings (match_id, innings_number, batting_team_id, bowling_team_id)
+        VALUES (?, ?, ?, ?)
+    """, (match_id, number, batting, bowling))
+        for number, (batting, bowling) in enumerate((teams, teams[::-1]), start=1)]
+    return {'id': match_id, 'teams': teams, 'squads': squads, 'innings': innings}
+
+
+def bowl(client, match, innings=0, **fields):
+    """Score one delivery through the API; returns its id"""
+    number = match['innings'][innings]
+    batting, bowling = (match['squads'][t] for t in (match['teams'] if innings == 0 else match['teams'][::-1]))
+    data = {
+        'match_id': match['id'], 'innings_id': number,
+        'over_number': 0, 'ball_number': 1,
+        'batsman_id': batting[0], 'non_striker_id': batting[1], 'bowler_id': bowling[10],
+        'runs_scored': 0, 'runs_off_bat': 0,
+    }
+    data.update(fields)
+    response = client.post('/api/deliveries/', json=data)
+    assert response.status_code == 201, response.get_data(as_text=True)
+    return response.get_json()['id']
@@ -0,0 +1,49 @@
+from conftest import bowl
+from services.delivery_search import build_match_query
+
+
+def _search(client, **body):
+    return client.post('/api/deliveries/search', json=body)
+
+
+def _ids(response):
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return [d['id'] for d in response.get_json()['results']]
+
+
+def test_tags_are_matched_as_escaped_phrases(client, match):
+    quoted = bowl(client, match, tags=['say "what"', 'edge'])
+    dropped = bowl(client, match, ball_number=2, tags=['drop catch'])
+    catch_only = bowl(client, match, ball_number=3, tags=['catch', 'drop'])
+
+    assert build_match_query(tags=['say "what"']) == 'tags : "say ""what"""'
+    assert _ids(_search(client, tags=['say "what"'])) == [quoted]
+    assert _ids(_search(client, tags=['drop catch'])) == [dropped]
+    assert sorted(_ids(_search(client, tags=['catch']))) == sorted([dropped, catch_only])
+    # FTS syntax inside a tag is literal text, not an OR that matches everything
+    assert _ids(_search(client, tags=['edge" OR "catch'])) == []
+
+
+def test_free_text_combines_with_tags_and_filters(client, match):
+    edged = bowl(client, match, notes='thick edge past slip', tags=['edge'])
+    bowl(client, match, ball_number=2, notes='thick edge past gully', tags=['misfield'])
+    bowl(client, match, innings=1, notes='edge to slip', tags=['edge'])
+
+    assert _ids(_search(client, q='edge AND slip', tags=['edge'], innings_id=match['innings'][0])) == [edged]
+    assert _search(client, q='edge', limit=1).get_json()['total'] == 3
+
+
+def test_bad_queries_are_rejected(client, match):
+    bowl(client, match, notes='beaten outside off')
+    assert _search(client).status_code == 400
+    assert _search(client, q='"unbalanced').status_code == 400
+    assert _search(client, q='beaten AND').status_code == 400
+
+
+def test_player_names_are_searchable_and_follow_renames(database, client, match):
+    batter = match['squads'][match['teams'][0]][0]
+    delivery = bowl(client, match, shot_type='Drive')
+    database.execute("UPDATE players SET first_name = 'Zaheer' WHERE id = ?", (batter,))
+
+    assert _ids(_search(client, q='batsman_name : zaheer')) == [delivery]
+    assert _ids(_search(client, q='bowler_name : Player10 AND Drive')) == [delivery]  # Bowler still matches
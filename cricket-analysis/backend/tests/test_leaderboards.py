@@ -0,0 +1,106 @@
+import threading
+
+from conftest import add_match, bowl
+from services import leaderboards
+
+
+def _totals(database):
+    return database.fetch_all("SELECT * FROM leaderboard_totals ORDER BY season, match_format, player_id")
+
+
+def _score_over(client, match, innings=0, over=0):
+    batting = match['squads'][match['teams'][innings]]
+    bowl(client, match, innings, over_number=over, ball_number=1,
+         runs_scored=4, runs_off_bat=4, is_boundary=1)
+    bowl(client, match, innings, over_number=over, ball_number=2,
+         runs_scored=1, extras=1, extra_type='Wide')
+    bowl(client, match, innings, over_number=over, ball_number=2,
+         is_wicket=1, wicket_type='Caught')
+    bowl(client, match, innings, over_number=over, ball_number=3,
+         batsman_id=batting[2], runs_scored=1, runs_off_bat=1, is_wicket=1, wicket_type='Run Out',
+         dismissed_batsman_id=batting[2])
+
+
+def test_incremental_deltas_match_rebuild(database, client, match):
+    _score_over(client, match)
+    _score_over(client, match, innings=1)
+    edited = bowl(client, match, over_number=1, runs_scored=2, runs_off_bat=2)
+    removed = bowl(client, match, over_number=1, ball_number=2, runs_scored=6, runs_off_bat=6, is_six=1)
+    client.put(f'/api/deliveries/{edited}', json={'runs_scored': 0, 'runs_off_bat': 0, 'is_dot': 1})
+    client.delete(f'/api/deliveries/{removed}')
+
+    incremental = _totals(database)
+    assert leaderboards.rebuild_leaderboards() == len(incremental)
+    assert incremental == _totals(database)
+
+    bowler = match['squads'][match['teams'][1]][10]
+    row = next(r for r in incremental
+               if (r['season'], r['match_format'], r['player_id']) == (2024, 'T20', bowler))
+    # The wide is no legal ball; the run out is not the bowler's wicket
+    assert (row['bowl_balls'], row['bowl_runs'], row['bowl_wickets'], row['bowl_dots']) == (4, 6, 1, 2)
+    # Every match counts towards the all-seasons / all-formats scopes too
+    assert {(r['season'], r['match_format']) for r in incremental} == {
+        (0, ''), (0, 'T20'), (2024, ''), (2024, 'T20')}
+
+
+def test_rebuild_adds_up_every_shard(sharded, client):
+    for match_date in ('2023-05-01', '2024-05-01'):
+        _score_over(client, add_match(sharded, match_date))
+    assert len(sharded.shards()) == 3
+
+    incremental = _totals(sharded)
+    leaderboards.rebuild_leaderboards()
+    assert incremental == _totals(sharded)
+
+
+def test_rebuild_during_live_scoring_counts_every_ball_once(database, client, match):
+    scoring = threading.Thread(target=lambda: [_score_over(client, match, over=o) for o in range(10)])
+    scoring.start()
+    while scoring.is_alive():
+        leaderboards.rebuild_leaderboards()
+    scoring.join()
+
+    live = _totals(database)
+    leaderboards.rebuild_leaderboards()
+    assert live == _totals(database)
+
+
+def test_failed_delta_rolls_back_the_delivery(database, client, match, monkeypatch):
+    def fail(conn, old=None, new=None):
+        raise RuntimeError('delta failed')
+    monkeypatch.setattr('api.deliveries.update_leaderboards', fail)
+
+    response = client.post('/api/deliveries/', json={
+        'match_id': match['id'], 'innings_id': match['innings'][0], 'over_number': 0, 'ball_number': 1,
+        'batsman_id': match['squads'][match['teams'][0]][0], 'bowler_id': match['squads'][match['teams'][1]][10],
+    })
+    assert response.status_code == 500
+    assert database.fetch_one("SELECT COUNT(*) as n FROM deliveries")['n'] == 0
+    assert database.fetch_one("SELECT COUNT(*) as n FROM matchup_batter_bowler")['n'] == 0
+
+
+def test_new_date_moves_totals_to_its_season(database, client, match):
+    _score_over(client, match)
+    client.put(f"/api/matches/{match['id']}", json={'match_date': '2025-04-01', 'match_format': 'T20',
+                                                     'status': 'Live'})
+
+    scopes = {(r['season'], r['match_format']) for r in _totals(database)}
+    assert scopes == {(0, ''), (0, 'T20'), (2025, ''), (2025, 'T20')}
+    moved = _totals(database)
+    leaderboards.rebuild_leaderboards()
+    assert moved == _totals(database)
+
+
+def test_format_changes_during_live_scoring_count_every_ball_once(database, client, match):
+    scoring = threading.Thread(target=lambda: [_score_over(client, match, over=o) for o in range(10)])
+    scoring.start()
+    formats = iter(['ODI', 'T20'] * 1000)
+    while scoring.is_alive():
+        client.put(f"/api/matches/{match['id']}", json={'match_date': '2024-04-01', 'match_format': next(formats),
+                                                         'status': 'Live'})
+    scoring.join()
+
+    live = _totals(database)
+    assert all(r[m] >= 0 for r in live for m in leaderboards.MEASURES)
+    leaderboards.rebuild_leaderboards()
+    assert live == _totals(database)
@@ -0,0 +1,61 @@
+def _walk(client, url, limit, **args):
+    """Every page of a listing, following X-Next-Cursor; returns (rows, pages)"""
+    rows, pages, cursor = [], 0, None
+    while True:
+        response = client.get(url, query_string={'limit': limit, **args, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        rows += response.get_json()
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return rows, pages
+        assert 'rel="next"' in response.headers['Link']
+
+
+def _add_matches(database, count, created_at='2024-01-01 10:00:00', match_format='T20'):
+    team = database.insert("INSERT INTO teams (name) VALUES ('Home')")
+    return [database.insert("""
+        INSERT INTO matches (match_title, match_format, team_home_id, created_at) VALUES (?, ?, ?, ?)
+    """, (f'Match {n}', match_format, team, created_at)) for n in range(count)]
+
+
+def test_pages_cover_every_row_once_across_timestamp_ties(database, client):
+    tied = _add_matches(database, 7)
+    newer = _add_matches(database, 3, created_at='2024-02-01 10:00:00', match_format='ODI')
+
+    rows, pages = _walk(client, '/api/matches/', 3)
+    assert [r['id'] for r in rows] == sorted(newer, reverse=True) + sorted(tied, reverse=True)
+    assert pages == 4
+
+    rows, _ = _walk(client, '/api/matches/', 2, format='T20')
+    assert [r['id'] for r in rows] == sorted(tied, reverse=True)
+
+
+def test_rows_added_while_paging_do_not_shift_later_pages(database, client):
+    ids = _add_matches(database, 4)
+    first = client.get('/api/matches/', query_string={'limit': 2})
+    _add_matches(database, 2, created_at='2025-01-01 00:00:00')
+    second = client.get('/api/matches/', query_string={'limit': 2, 'cursor': first.headers['X-Next-Cursor']})
+    seen = [r['id'] for r in first.get_json() + second.get_json()]
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_null_sort_keys_are_paged_in_order(database, client):
+    match_id = _add_matches(database, 1)[0]
+    for start in (None, 30.0, None, 5.0, 30.0):
+        database.insert("INSERT INTO video_clips (match_id, start_time) VALUES (?, ?)", (match_id, start))
+
+    rows, _ = _walk(client, f'/api/video/clips/{match_id}', 2)
+    assert [(r['start_time'], r['id']) for r in rows] == [(None, 1), (None, 3), (5.0, 4), (30.0, 2), (30.0, 5)]
+
+
+def test_sparse_fields_and_bad_arguments(database, client):
+    _add_matches(database, 2)
+    response = client.get('/api/matches/', query_string={'fields': 'id,home_team_name', 'limit': 1})
+    assert response.get_json() == [{'id': 2, 'home_team_name': 'Home'}]
+    cursor = response.headers['X-Next-Cursor']
+    assert client.get('/api/matches/', query_string={'fields': 'id', 'cursor': cursor}).get_json() == [{'id': 1}]
+
+    assert client.get('/api/matches/', query_string={'fields': 'id,password'}).status_code == 400
+    assert client.get('/api/matches/', query_string={'cursor': 'not-a-cursor'}).status_code == 400
+    assert client.get('/api/matches/', query_string={'cursor': cursor[:-4]}).status_code == 400
@@ -0,0 +1,76 @@
+import random
+
+from conftest import bowl
+from services import match_state
+
+
+def _score_innings(client, match, innings, overs=3, seed=0):
+    rng = random.Random(seed)
+    batting = match['squads'][match['teams'][innings]]
+    bowling = match['squads'][match['teams'][1 - innings]]
+    striker, non_striker, next_in = batting[0], batting[1], 2
+    for over in range(overs):
+        ball = 1
+        while ball <= 6:
+            extra = rng.choice(['None'] * 8 + ['Wide', 'No Ball', 'Leg Bye'])
+            runs = rng.choice([0, 0, 1, 1, 2, 4, 6]) if extra in ('None', 'No Ball') else 0
+            extras = 1 if extra != 'None' else 0
+            wicket = extra == 'None' and rng.random() < 0.12
+            bowl(client, match, innings, over_number=over, ball_number=ball,
+                 batsman_id=striker, non_striker_id=non_striker, bowler_id=bowling[10 - over % 2],
+                 runs_scored=runs + extras, runs_off_bat=runs, extras=extras, extra_type=extra,
+                 is_boundary=int(runs == 4), is_six=int(runs == 6),
+                 is_wicket=int(wicket), wicket_type='Bowled' if wicket else None)
+            if extra in ('None', 'Bye', 'Leg Bye'):
+                ball += 1
+            if wicket:
+                striker, next_in = batting[next_in], next_in + 1
+            elif runs % 2:
+                striker, non_striker = non_striker, striker
+        striker, non_striker = non_striker, striker
+
+
+def test_checkpoint_replay_matches_the_full_fold(database, client, match):
+    _score_innings(client, match, 0)
+    _score_innings(client, match, 1, seed=1)
+
+    for innings_id in match['innings']:
+        version, target, max_balls, states = match_state.get_states(innings_id)
+        assert max_balls == 120
+        assert match_state._has_checkpoints(innings_id, version)
+        assert (target is None) == (innings_id == match['innings'][0])
+        assert states[-1].runs == database.fetch_one(
+            "SELECT SUM(runs_scored) as runs FROM deliveries WHERE innings_id = ?", (innings_id,))['runs']
+
+        for state in states:
+            match_state._cache.clear()  # As a worker that never folded this innings would
+            assert match_state.state_at(innings_id, delivery_id=state.delivery_id) == state
+
+        # By (over, ball): the last state of the over up to that ball
+        last_of_over = [s for s in states if s.over_number == 1][-1]
+        match_state._cache.clear()
+        assert match_state.state_at(innings_id, over_number=1, ball_number=6) == last_of_over
+
+
+def test_corrections_rebuild_the_checkpoints(database, client, match):
+    _score_innings(client, match, 0, overs=2)
+    innings_id = match['innings'][0]
+    states = match_state.get_states(innings_id)[3]
+    first = states[0]
+
+    client.put(f'/api/deliveries/{first.delivery_id}', json={'runs_scored': 5, 'runs_off_bat': 5})
+    match_state._cache.clear()
+    last = match_state.state_at(innings_id, delivery_id=states[-1].delivery_id)
+    assert last.runs == states[-1].runs - states[0].runs + 5
+    assert {row['innings_version'] for row in database.fetch_all(
+        "SELECT innings_version FROM innings_state_checkpoints WHERE innings_id = ?", (innings_id,)
+    )} == {match_state.innings_version(innings_id)}
+
+
+def test_fold_round_trips_through_a_checkpoint():
+    fold = match_state.Fold(target=150, max_balls=120)
+    fold.apply({'id': 1, 'over_number': 0, 'ball_number': 1, 'batsman_id': 7, 'non_striker_id': 8,
+                'bowler_id': 9, 'runs_scored': 5, 'runs_off_bat': 4, 'extras': 1, 'extra_type': 'No Ball',
+                'is_wicket': 0, 'wicket_type': None})
+    copy = match_state.Fold.from_checkpoint(fold.to_checkpoint(), 150, 120)
+    assert vars(copy) == vars(fold)
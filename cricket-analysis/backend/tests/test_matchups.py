@@ -0,0 +1,77 @@
+import threading
+
+from conftest import add_match, bowl
+from services import matchup_matrix
+
+
+def _cells(database):
+    return {table: database.fetch_all(f"SELECT * FROM {table} ORDER BY batsman_id, {key}")
+            for table, key in matchup_matrix._TABLES}
+
+
+def _score_over(client, match, innings=0, over=0):
+    batting = match['squads'][match['teams'][innings]]
+    bowl(client, match, innings, over_number=over, ball_number=1, bowling_type='Fast',
+         runs_scored=4, runs_off_bat=4, is_boundary=1)
+    bowl(client, match, innings, over_number=over, ball_number=2, bowling_type='Fast',
+         runs_scored=1, extras=1, extra_type='Wide')
+    bowl(client, match, innings, over_number=over, ball_number=2, bowling_type='Fast',
+         is_wicket=1, wicket_type='Caught')
+    bowl(client, match, innings, over_number=over, ball_number=3, bowling_type='Fast',
+         batsman_id=batting[2], runs_scored=1, runs_off_bat=1, is_wicket=1, wicket_type='Run Out',
+         dismissed_batsman_id=batting[2])
+
+
+def test_incremental_deltas_match_rebuild(database, client, match):
+    _score_over(client, match)
+    _score_over(client, match, innings=1)
+    edited = bowl(client, match, over_number=1, bowling_type='Leg Spin', runs_scored=2, runs_off_bat=2)
+    removed = bowl(client, match, over_number=1, ball_number=2, runs_scored=6, runs_off_bat=6, is_six=1)
+    client.put(f'/api/deliveries/{edited}', json={'runs_scored': 0, 'runs_off_bat': 0, 'is_dot': 1})
+    client.delete(f'/api/deliveries/{removed}')
+
+    incremental = _cells(database)
+    matchup_matrix.rebuild_matchups()
+    assert incremental == _cells(database)
+
+    batter, bowler = match['squads'][match['teams'][0]][0], match['squads'][match['teams'][1]][10]
+    cell = next(c for c in incremental['matchup_batter_bowler']
+                if (c['batsman_id'], c['bowler_id']) == (batter, bowler))
+    # The wide is no ball faced; the run out is not the bowler's wicket
+    assert (cell['balls'], cell['runs'], cell['dismissals'], cell['dots']) == (3, 4, 1, 2)
+
+
+def test_rebuild_adds_up_every_shard(sharded, client):
+    for match_date in ('2023-05-01', '2024-05-01'):
+        _score_over(client, add_match(sharded, match_date))
+    assert len(sharded.shards()) == 3
+
+    incremental = _cells(sharded)
+    matchup_matrix.rebuild_matchups()
+    assert incremental == _cells(sharded)
+
+
+def test_rebuild_during_live_scoring_counts_every_ball_once(database, client, match):
+    scoring = threading.Thread(target=lambda: [_score_over(client, match, over=o) for o in range(10)])
+    scoring.start()
+    while scoring.is_alive():
+        matchup_matrix.rebuild_matchups()
+    scoring.join()
+
+    live = _cells(database)
+    matchup_matrix.rebuild_matchups()
+    assert live == _cells(database)
+
+
+def test_failed_delta_rolls_back_the_delivery(database, client, match, monkeypatch):
+    def fail(conn, old=None, new=None):
+        raise RuntimeError('delta failed')
+    monkeypatch.setattr('api.deliveries.update_matchups', fail)
+
+    response = client.post('/api/deliveries/', json={
+        'match_id': match['id'], 'innings_id': match['innings'][0], 'over_number': 0, 'ball_number': 1,
+        'batsman_id': match['squads'][match['teams'][0]][0], 'bowler_id': match['squads'][match['teams'][1]][10],
+    })
+    assert response.status_code == 500
+    assert database.fetch_one("SELECT COUNT(*) as n FROM deliveries")['n'] == 0
+    assert database.fetch_one("SELECT COUNT(*) as n FROM over_summary")['n'] == 0
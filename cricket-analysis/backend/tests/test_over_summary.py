@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from conftest import add_match, bowl
+from services import analytics_engine
+
+COLUMNS = 'innings_id, match_id, over_number, runs, wickets, dots, fours, sixes, extras, legal_balls'
+
+
+def _summary(database):
+    return database.fetch_all(f"SELECT {COLUMNS} FROM over_summary ORDER BY innings_id, over_number")
+
+
+def test_incremental_refresh_matches_rebuild(database, client, match):
+    bowl(client, match, runs_scored=4, runs_off_bat=4, is_boundary=1)
+    wide = bowl(client, match, ball_number=2, runs_scored=1, extras=1, extra_type='Wide')
+    bowl(client, match, ball_number=2, is_wicket=1, wicket_type='Bowled')
+    bowl(client, match, over_number=1, runs_scored=6, runs_off_bat=6, is_six=1)
+    last = bowl(client, match, over_number=2, runs_scored=1, runs_off_bat=1)
+    bowl(client, match, innings=1, runs_scored=2, runs_off_bat=2)
+
+    assert client.put(f'/api/deliveries/{wide}', json={'runs_scored': 5, 'extras': 5}).status_code == 200
+    assert client.delete(f'/api/deliveries/{last}').status_code == 200
+
+    incremental = _summary(database)
+    analytics_engine.rebuild_over_summary()
+    assert incremental == _summary(database)
+
+    first_over = incremental[0]
+    assert (first_over['runs'], first_over['wickets'], first_over['legal_balls']) == (9, 1, 2)
+    # Deleting the only ball of an over removes the over
+    assert [row['over_number'] for row in incremental if row['innings_id'] == match['innings'][0]] == [0, 1]
+
+
+def test_rebuild_adds_up_every_shard(sharded, client):
+    matches = [add_match(sharded, match_date) for match_date in ('2023-05-01', '2024-05-01')]
+    for match in matches:
+        bowl(client, match, runs_scored=4, runs_off_bat=4, is_boundary=1)
+        bowl(client, match, over_number=1, innings=1, runs_scored=1, runs_off_bat=1)
+    incremental = _summary(sharded)
+    assert len(incremental) == 4
+
+    analytics_engine.rebuild_over_summary()
+    assert incremental == _summary(sharded)
+    analytics_engine.rebuild_over_summary(matches[0]['innings'][1])
+    assert incremental == _summary(sharded)
+
+
+def test_failed_rebuild_keeps_the_old_rows(sharded, client, monkeypatch):
+    bowl(client, add_match(sharded, '2023-05-01'), runs_scored=4, runs_off_bat=4)
+    before = _summary(sharded)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('shard unreadable')
+    monkeypatch.setattr(sharded.shard(2023), 'fetch_all', fail)
+    with pytest.raises(RuntimeError):
+        analytics_engine.rebuild_over_summary()
+    assert _summary(sharded) == before
+
+
+def test_rebuild_during_live_scoring_keeps_every_over(database, client, match):
+    scoring = threading.Thread(target=lambda: [
+        bowl(client, match, over_number=over, ball_number=ball, runs_scored=1, runs_off_bat=1)
+        for over in range(10) for ball in range(1, 4)])
+    scoring.start()
+    while scoring.is_alive():
+        analytics_engine.rebuild_over_summary()
+        # Readers never see the table emptied mid-rebuild
+        scored = database.fetch_one("SELECT COUNT(*) as n FROM deliveries")['n']
+        assert not scored or _summary(database)
+    scoring.join()
+
+    live = _summary(database)
+    analytics_engine.rebuild_over_summary()
+    assert live == _summary(database) and len(live) == 10
+
+
+def test_failed_refresh_rolls_back_the_delivery(database, client, match, monkeypatch):
+    def fail(conn, innings_id, over_number):
+        raise RuntimeError('refresh failed')
+    monkeypatch.setattr('api.deliveries.refresh_over_summary', fail)
+
+    response = client.post('/api/deliveries/', json={
+        'match_id': match['id'], 'innings_id': match['innings'][0], 'over_number': 0, 'ball_number': 1,
+        'batsman_id': match['squads'][match['teams'][0]][0], 'bowler_id': match['squads'][match['teams'][1]][10],
+    })
+    assert response.status_code == 500
+    assert database.fetch_one("SELECT COUNT(*) as n FROM deliveries")['n'] == 0
+
+
+def test_compare_rejects_bad_match_ids(client, match):
+    bowl(client, match, runs_scored=1, runs_off_bat=1)
+    for body in ({}, {'match_ids': []}, {'match_ids': 'abc'}, {'match_ids': [match['id'], 'x']},
+                 {'match_ids': [None]}):
+        assert client.post('/api/analysis/over_summary/compare', json=body).status_code == 400, body
+
+    response = client.post('/api/analysis/over_summary/compare', json={'match_ids': [str(match['id'])]})
+    assert response.status_code == 200
+    assert response.get_json()[0]['innings'][0]['total_runs'] == 1
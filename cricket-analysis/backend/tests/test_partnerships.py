@@ -0,0 +1,57 @@
+from conftest import bowl
+from services import partnership_engine
+from services.partnership_engine import compute_partnerships
+
+
+def _ball(n, striker, non_striker, runs=0, extra_type='None', extras=0, wicket_type=None, dismissed=None):
+    return {
+        'id': n, 'innings_id': 1, 'match_id': 1, 'over_number': (n - 1) // 6, 'ball_number': (n - 1) % 6 + 1,
+        'batsman_id': striker, 'non_striker_id': non_striker,
+        'runs_scored': runs + extras, 'runs_off_bat': runs, 'extras': extras, 'extra_type': extra_type,
+        'is_wicket': 1 if wicket_type else 0, 'wicket_type': wicket_type, 'dismissed_batsman_id': dismissed,
+    }
+
+
+def test_wicket_ends_the_stand_and_the_last_one_is_unbroken():
+    first, second = compute_partnerships([
+        _ball(1, 1, None, runs=4),
+        _ball(2, 1, 2, runs=1),
+        _ball(3, 2, 1, extra_type='Wide', extras=1),
+        _ball(4, 2, 1, wicket_type='Bowled'),
+        _ball(5, 3, 1, runs=6),
+    ])
+    assert (first['batter1_id'], first['batter2_id']) == (1, 2)  # Partner filled in from ball 2
+    assert (first['runs'], first['balls'], first['extras']) == (6, 3, 1)
+    assert (first['batter1_runs'], first['batter1_balls'], first['batter2_balls']) == (5, 2, 1)
+    assert (first['unbroken'], first['end_wicket_type'], first['dismissed_batsman_id']) == (0, 'Bowled', 2)
+    assert (second['wicket_number'], second['runs'], second['unbroken']) == (2, 6, 1)
+    assert second['dismissed_batsman_id'] is None
+
+
+def test_non_striker_run_out_is_credited_to_the_non_striker():
+    stand, = compute_partnerships([_ball(1, 1, 2, runs=1, wicket_type='Run Out', dismissed=2)])
+    assert (stand['runs'], stand['dismissed_batsman_id']) == (1, 2)
+
+
+def test_retirement_followed_by_a_wicket_credits_one_dismissal():
+    retired, next_stand = compute_partnerships([
+        _ball(1, 1, 2, runs=2),
+        # Batter 2 retires; batter 3's first ball is a wicket
+        _ball(2, 3, 1, wicket_type='Caught', dismissed=3),
+    ])
+    assert (retired['unbroken'], retired['end_wicket_type'], retired['dismissed_batsman_id']) == (0, None, None)
+    assert (retired['runs'], retired['end_delivery_id']) == (2, 1)
+    assert (next_stand['wicket_number'], next_stand['dismissed_batsman_id']) == (1, 3)
+    assert sum(1 for p in (retired, next_stand) if p['dismissed_batsman_id']) == 1
+
+
+def test_cached_partnerships_follow_the_innings_version(database, client, match):
+    innings_id = match['innings'][0]
+    bowl(client, match, runs_scored=4, runs_off_bat=4)
+    stand, = partnership_engine.get_partnerships(innings_id)
+    assert (stand['runs'], stand['unbroken']) == (4, 1)
+
+    bowl(client, match, ball_number=2, is_wicket=1, wicket_type='Bowled')
+    stand, = partnership_engine.get_partnerships(innings_id)
+    assert (stand['runs'], stand['balls'], stand['unbroken']) == (4, 2, 0)
+    assert stand['innings_version'] == partnership_engine.innings_version(innings_id)
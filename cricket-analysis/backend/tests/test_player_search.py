@@ -0,0 +1,63 @@
+import pytest
+
+from services.player_search import search_players
+
+NAMES = [('Virat', 'Kohli'), ('Vinay', 'Kumar'), ('Rohit', 'Sharma'), ('Ishant', 'Sharma'),
+         ('Mohit', 'Sharma'), ('Ravi', 'Bishnoi'), ('Jos', 'Buttler'), ('Kane', 'Williamson')]
+
+
+@pytest.fixture
+def players(database):
+    teams = [database.insert("INSERT INTO teams (name, short_name) VALUES (?, ?)", (name, name[:3]))
+             for name in ('India', 'Visitors')]
+    ids = {}
+    for n, (first, last) in enumerate(NAMES):
+        ids[last if last != 'Sharma' else first] = database.insert(
+            "INSERT INTO players (first_name, last_name, team_id) VALUES (?, ?, ?)",
+            (first, last, teams[n >= 6])
+        )
+    match_id = database.insert(
+        "INSERT INTO matches (match_title, team_home_id, team_away_id) VALUES ('Test', ?, ?)", teams
+    )
+    return {'ids': ids, 'teams': teams, 'match_id': match_id}
+
+
+def _names(results):
+    return [f"{p['first_name']} {p['last_name']}" for p in results]
+
+
+def test_substring_and_prefix_words(players):
+    assert _names(search_players('ohl')) == ['Virat Kohli']
+    assert _names(search_players('shar mo')) == ['Mohit Sharma']
+    assert _names(search_players('vi')) == ['Vinay Kumar', 'Virat Kohli']
+    assert _names(search_players('r s', limit=10)) == ['Rohit Sharma']
+
+
+def test_like_and_fts_syntax_in_the_query_is_literal(players):
+    assert search_players('_') == []
+    assert search_players('%a') == []
+    assert search_players('ko"hl') == []
+    assert search_players('kohli OR') == []
+
+
+def test_squad_players_and_name_prefixes_rank_first(database, players):
+    outsider = database.insert("INSERT INTO players (first_name, last_name) VALUES ('Abhishek', 'Sharma')")
+    results = search_players('sharma', match_id=players['match_id'])
+    assert [p['id'] for p in results][-1] == outsider
+    assert all(p['in_squad'] for p in results[:-1])
+
+    # A name that starts with the word outranks one that only contains it
+    database.insert("INSERT INTO players (first_name, last_name) VALUES ('Rabisankar', 'Das')")
+    assert _names(search_players('bis')) == ['Ravi Bishnoi', 'Rabisankar Das']
+
+
+def test_empty_query_offers_the_squads(players):
+    assert len(search_players('', match_id=players['match_id'])) == len(NAMES)
+    assert search_players('') == []
+
+
+def test_index_follows_renames_and_deletes(database, players):
+    database.execute("UPDATE players SET last_name = 'Kohli-Sharma' WHERE id = ?", (players['ids']['Kohli'],))
+    assert _names(search_players('kohli')) == ['Virat Kohli-Sharma']
+    database.execute("DELETE FROM players WHERE id = ?", (players['ids']['Buttler'],))
+    assert search_players('buttler') == []
@@ -0,0 +1,76 @@
+import sqlite3
+
+from conftest import bowl
+
+
+def _finish(database, match):
+    database.execute("UPDATE matches SET status = 'Completed' WHERE id = ?", (match['id'],))
+
+
+def test_finished_bodies_are_cached_and_revalidated(database, client, match):
+    bowl(client, match, runs_scored=4, runs_off_bat=4)
+    _finish(database, match)
+    url = f"/api/deliveries/innings/{match['innings'][0]}"
+
+    first = client.get(url)
+    etag = first.headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(url).get_data() == first.get_data()
+
+    # A corrected ball moves the innings version and with it the cached body
+    delivery = first.get_json()[0]['id']
+    client.put(f'/api/deliveries/{delivery}', json={'runs_scored': 6, 'runs_off_bat': 6})
+    corrected = client.get(url, headers={'If-None-Match': etag})
+    assert corrected.status_code == 200 and corrected.get_json()[0]['runs_scored'] == 6
+
+
+def test_a_rename_from_another_process_reaches_cached_bodies(database, client, match):
+    bowl(client, match)
+    _finish(database, match)
+    url = f"/api/deliveries/innings/{match['innings'][0]}"
+    batter = match['squads'][match['teams'][0]][0]
+    assert b'Player0 Team1' in client.get(url).get_data()
+
+    # Another worker renames the player: nothing in this process is told
+    other = sqlite3.connect(database.db_path)
+    with other:
+        other.execute("UPDATE players SET last_name = 'Renamed' WHERE id = ?", (batter,))
+    other.close()
+
+    body = client.get(url).get_data()
+    assert b'Player0 Renamed' in body and b'Player0 Team1' not in body
+
+
+def test_body_cache_is_bounded_in_bytes():
+    from responses import BodyCache, _CachedBody
+    cache = BodyCache(max_bytes=100)
+    for n in range(5):
+        cache.put(n, _CachedBody(b'x' * 40, 'application/json', [], str(n)))
+    assert cache.get(0) is None and cache.get(1) is None and cache.get(2) is None
+    assert cache.get(4) is not None
+
+
+def test_video_tag_reaches_cached_finished_bodies(database, client, match):
+    delivery = bowl(client, match)
+    _finish(database, match)
+    url = f"/api/deliveries/innings/{match['innings'][0]}"
+    assert client.get(url).get_json()[0]['video_timestamp_start'] is None
+
+    response = client.post('/api/video/tag_delivery', json={
+        'delivery_id': delivery, 'start_time': 10.0, 'end_time': 14.5})
+    assert response.status_code == 200
+    assert client.get(url).get_json()[0]['video_timestamp_start'] == 10.0
+
+
+def test_confirmed_timestamps_reach_cached_finished_bodies(database, client, match):
+    delivery = bowl(client, match)
+    _finish(database, match)
+    url = f"/api/deliveries/innings/{match['innings'][0]}"
+    assert client.get(url).get_json()[0]['video_timestamp_start'] is None
+
+    database.execute("""
+        INSERT INTO video_timestamp_suggestions (delivery_id, match_id, innings_id, start_time, end_time)
+        VALUES (?, ?, ?, 20.0, 26.0)
+    """, (delivery, match['id'], match['innings'][0]))
+    assert client.post(f"/api/video/suggest_timestamps/{match['id']}/confirm", json={}).status_code == 200
+    assert client.get(url).get_json()[0]['video_timestamp_start'] == 20.0
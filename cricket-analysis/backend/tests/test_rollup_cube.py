@@ -0,0 +1,84 @@
+import pytest
+
+from conftest import add_match, bowl
+from services import rollup_cube
+
+# (venue, date, format) of each match
+MATCHES = [('Eden Gardens', '2023-04-01', 'T20'), ('Eden Gardens', '2024-04-01', 'T20'),
+           ('Wankhede', '2024-05-01', 'ODI')]
+
+
+@pytest.fixture
+def finished(database, client):
+    matches = []
+    for n, (venue, match_date, match_format) in enumerate(MATCHES):
+        match = add_match(database, match_date, match_format)
+        database.execute("UPDATE matches SET venue = ? WHERE id = ?", (venue, match['id']))
+        for innings in (0, 1):
+            for over in (0, 7, 17 + n):
+                bowl(client, match, innings, over_number=over, runs_scored=over % 7, runs_off_bat=over % 7,
+                     is_boundary=int(over % 7 == 4))
+                bowl(client, match, innings, over_number=over, ball_number=2, is_wicket=int(innings == n % 2),
+                     wicket_type='Bowled')
+        matches.append(match)
+    database.execute("UPDATE matches SET status = 'Completed'")
+    assert rollup_cube.refresh() == len(MATCHES)
+    return matches
+
+
+def _direct(database, group_by, where='1=1'):
+    """The same figures aggregated straight from deliveries"""
+    keys = {'venue': 'm.venue', 'season': "CAST(strftime('%Y', m.match_date) AS INTEGER)",
+            'match_format': 'm.match_format', 'phase': 'd.phase'}
+    columns = ', '.join(f'{keys[g]} as {g}' for g in group_by)
+    return database.fetch_all(f"""
+        SELECT {columns}, COUNT(DISTINCT d.innings_id) as innings, SUM(d.runs_scored) as runs,
+            COUNT(CASE WHEN d.extra_type IN ('None', 'Bye', 'Leg Bye') THEN 1 END) as balls,
+            SUM(d.is_wicket) as wickets
+        FROM deliveries d JOIN matches m ON m.id = d.match_id
+        WHERE m.status = 'Completed' AND {where}
+        GROUP BY {', '.join(keys[g] for g in group_by)}
+        ORDER BY {', '.join(keys[g] for g in group_by)}
+    """)
+
+
+def _measures(cells, group_by):
+    return [{k: c[k] for k in (*group_by, 'innings', 'runs', 'balls', 'wickets')} for c in cells]
+
+
+@pytest.mark.parametrize('group_by', [['venue'], ['season', 'match_format'], ['phase'], ['venue', 'phase']])
+def test_slices_match_the_deliveries(database, finished, group_by):
+    assert _measures(rollup_cube.slice_cube(group_by), group_by) == _direct(database, group_by)
+
+
+def test_filters_and_whole_innings_counts(database, finished):
+    cells = rollup_cube.slice_cube(['venue'], {'season': [2024], 'match_format': 'T20'})
+    assert _measures(cells, ['venue']) == _direct(
+        database, ['venue'], "strftime('%Y', m.match_date) = '2024' AND m.match_format = 'T20'")
+
+    # Without phase each innings counts once, though it spans three phases
+    total, = rollup_cube.slice_cube()
+    assert total['innings'] == 2 * len(MATCHES)
+    death, = rollup_cube.slice_cube(filters={'phase': 'Death'})
+    assert death['innings'] == 2 * 2  # The ODI's over 19 is still its middle overs
+
+    with pytest.raises(ValueError):
+        rollup_cube.slice_cube(['batter'])
+    with pytest.raises(ValueError):
+        rollup_cube.slice_cube(filters={'phase': ['Powerplay', 'Death']})
+
+
+def test_corrections_reopening_and_deletes_leave_the_cube_consistent(database, client, finished):
+    first, second, _ = finished
+    delivery = database.fetch_one("SELECT id FROM deliveries WHERE match_id = ? LIMIT 1", (first['id'],))['id']
+    client.put(f'/api/deliveries/{delivery}', json={'runs_scored': 40})
+    assert rollup_cube.stale_matches() == [first['id']]
+    rollup_cube.refresh()
+
+    client.put(f"/api/matches/{second['id']}", json={
+        'match_title': 'Home v Away', 'match_format': 'T20', 'venue': 'Eden Gardens',
+        'match_date': '2024-04-01', 'status': 'Live'})
+    assert client.delete(f"/api/matches/{first['id']}").status_code == 200
+
+    assert _measures(rollup_cube.slice_cube(['venue']), ['venue']) == _direct(database, ['venue'])
+    assert rollup_cube.stale_matches() == []
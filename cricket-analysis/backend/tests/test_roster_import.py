@@ -0,0 +1,87 @@
+def _players(client, rows, **kwargs):
+    return client.post('/api/players/bulk', json=rows, **kwargs)
+
+
+def _count(database):
+    return database.fetch_one("SELECT COUNT(*) as n FROM players")['n']
+
+
+def _team(database, name='Lions'):
+    return database.insert("INSERT INTO teams (name, short_name) VALUES (?, ?)", (name, name[:3].upper()))
+
+
+def test_rows_match_on_name_team_and_jersey(database, client):
+    team = _team(database)
+    rows = [{'first_name': 'Ana', 'last_name': 'Silva', 'team_id': team, 'jersey_number': 7},
+            {'first_name': 'Ana', 'last_name': 'Silva', 'team_id': team, 'jersey_number': 8},
+            {'first_name': 'Ben', 'last_name': 'Cole', 'team': 'lions'}]
+    created = _players(client, rows).get_json()
+    assert created['created'] == 3 and len({r['id'] for r in created['players']}) == 3
+
+    again = _players(client, [
+        {'first_name': 'ANA', 'last_name': 'silva', 'team_id': team, 'jersey_number': 8, 'batting_style': 'Left'},
+        {'first_name': 'Ben', 'last_name': 'Cole', 'team_id': team},
+    ]).get_json()
+    assert [r['status'] for r in again['players']] == ['updated', 'unchanged']
+    assert again['players'][0]['id'] == created['players'][1]['id']
+    # Matching is case-insensitive; the stored spelling is kept
+    row = database.fetch_one("SELECT first_name, batting_style FROM players WHERE id = ?",
+                             (again['players'][0]['id'],))
+    assert (row['first_name'], row['batting_style']) == ('Ana', 'Left')
+    assert _count(database) == 3
+
+
+def test_new_player_given_twice_is_created_once(database, client):
+    team = _team(database)
+    result = _players(client, [
+        {'first_name': 'Ana', 'last_name': 'Silva', 'team_id': team},
+        {'first_name': 'Ana', 'last_name': 'Silva', 'team_id': team, 'jersey_number': 7},
+    ]).get_json()
+    assert result['players'][0]['id'] == result['players'][1]['id']
+    assert _count(database) == 1
+    assert database.fetch_one("SELECT jersey_number FROM players")['jersey_number'] == 7
+
+    # With the jersey first, a row without one is the same player too
+    result = _players(client, [
+        {'first_name': 'Ben', 'last_name': 'Cole', 'team_id': team, 'jersey_number': 9},
+        {'first_name': 'Ben', 'last_name': 'Cole', 'team_id': team, 'player_role': 'Bowler'},
+    ]).get_json()
+    assert result['players'][0]['id'] == result['players'][1]['id']
+    assert _count(database) == 2
+
+
+def test_empty_csv_cells_leave_values_unchanged(database, client):
+    team = _team(database)
+    _players(client, [{'first_name': 'Ana', 'last_name': 'Silva', 'team_id': team,
+                       'batting_style': 'Right', 'jersey_number': 7}])
+    csv = f"first_name,last_name,team_id,jersey_number,batting_style,player_role\nAna,Silva,{team},7,,Batter\n"
+    result = client.post('/api/players/bulk', data=csv, content_type='text/csv').get_json()
+    assert result['updated'] == 1
+    row = database.fetch_one("SELECT batting_style, player_role, team_id FROM players")
+    assert (row['batting_style'], row['player_role'], row['team_id']) == ('Right', 'Batter', team)
+
+
+def test_invalid_rows_are_rejected_and_nothing_is_written(database, client):
+    team = _team(database)
+    valid = {'first_name': 'Ana', 'last_name': 'Silva', 'team_id': team}
+    for bad, error in (({'first_name': 'Ben'}, 'first_name and last_name are required'),
+                       ({'first_name': 'Ben', 'last_name': 'Cole', 'team_id': 'abc'}, 'team_id must be an integer'),
+                       ({'first_name': 'Ben', 'last_name': 'Cole', 'team_id': 999}, 'unknown team_id 999')):
+        response = _players(client, [valid, bad])
+        assert response.status_code == 400
+        assert response.get_json()['rows'] == [{'row': 1, 'error': error}]
+
+    response = _players(client, [valid, {'first_name': 'Ben', 'last_name': 'Cole', 'team': 'Tigers'}])
+    assert response.status_code == 400
+    assert response.get_json()['rows'] == [{'team': 'tigers', 'error': 'unknown team'}]
+    assert _count(database) == 0
+
+
+def test_squad_creates_the_team_with_its_players(database, client):
+    response = client.post('/api/matches/teams/squad', json={
+        'team': {'name': 'Tigers', 'short_name': 'TIG'},
+        'players': [{'first_name': 'Ana', 'last_name': 'Silva'}, {'first_name': 'Ben', 'last_name': 'Cole'}],
+    })
+    result = response.get_json()
+    assert result['team']['status'] == 'created' and result['created'] == 2
+    assert {r['team_id'] for r in database.fetch_all("SELECT team_id FROM players")} == {result['team']['id']}
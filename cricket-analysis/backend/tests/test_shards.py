@@ -0,0 +1,41 @@
+from conftest import add_match, bowl, _reset_caches
+
+
+def _update(client, match, match_date):
+    return client.put(f"/api/matches/{match['id']}", json={'match_date': match_date, 'match_format': 'T20',
+                                                            'status': 'Live'})
+
+
+def test_deliveries_are_stored_in_their_season_shard(sharded, client):
+    match = add_match(sharded, '2023-05-01')
+    delivery = bowl(client, match, runs_scored=4, runs_off_bat=4)
+
+    assert sharded.for_match(match['id']).season == 2023
+    assert sharded.for_delivery(delivery) is sharded.for_match(match['id'])
+    assert sharded.fetch_one("SELECT COUNT(*) as n FROM main.deliveries")['n'] == 0
+
+
+def test_scored_match_cannot_move_to_another_season(sharded, client):
+    match = add_match(sharded, '2024-04-01')
+    bowl(client, match, runs_scored=4, runs_off_bat=4)
+
+    response = _update(client, match, '2025-05-01')
+    assert response.status_code == 400
+    assert sharded.fetch_one("SELECT match_date FROM matches WHERE id = ?", (match['id'],))['match_date'] == '2024-04-01'
+
+    # A restart loses the in-memory routing; the deliveries must still be found
+    _reset_caches()
+    deliveries = client.get(f"/api/deliveries/innings/{match['innings'][0]}").get_json()
+    assert [d['runs_scored'] for d in deliveries] == [4]
+
+    # The same season is fine
+    assert _update(client, match, '2024-06-01').status_code == 200
+
+
+def test_unscored_match_moves_to_its_new_season(sharded, client):
+    match = add_match(sharded, '2024-04-01')
+    sharded.for_match(match['id'])
+    assert _update(client, match, '2025-05-01').status_code == 200
+
+    bowl(client, match)
+    assert sharded.for_match(match['id']).season == 2025
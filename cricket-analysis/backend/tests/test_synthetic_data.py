@@ -0,0 +1,28 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+
+def test_generate_fills_an_empty_file(tmp_path):
+    path = str(tmp_path / 'synthetic.db')
+    # A fresh interpreter, so the services bind to the generated file
+    result = subprocess.run(
+        [sys.executable, os.path.join('benchmarks', 'synthetic_data.py'), path,
+         '--matches-per-season', '2', '--seed', '3'],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+
+    conn = sqlite3.connect(path)
+    count = lambda table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    assert count('matches') == 2
+    assert count('innings') == 4
+    assert count('players') > 0 and count('deliveries') > 0
+    for table in ('over_summary', 'partnerships', 'matchup_batter_bowler', 'leaderboard_totals'):
+        assert count(table) > 0, table
+    # Derived totals agree with the raw deliveries they came from
+    assert conn.execute("SELECT SUM(runs) FROM over_summary").fetchone() == \
+        conn.execute("SELECT SUM(runs_scored) FROM deliveries").fetchone()
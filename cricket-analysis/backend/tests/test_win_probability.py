@@ -0,0 +1,76 @@
+import pytest
+
+from config import Config
+from conftest import add_match, bowl
+from services import win_probability
+
+
+@pytest.fixture
+def model_path(database, tmp_path, monkeypatch):
+    path = str(tmp_path / 'model' / 'win_probability.npz')
+    monkeypatch.setattr(Config, 'WIN_PROBABILITY_MODEL_PATH', path)
+    win_probability._model = None
+    win_probability._latest.clear()
+    yield path
+    win_probability._model = None
+    win_probability._latest.clear()
+
+
+def _archive(database, client):
+    """One finished T20: six singles in the first innings, a chase that falls short"""
+    match = add_match(database, '2023-04-01')
+    for ball in range(1, 7):
+        bowl(client, match, ball_number=ball, runs_scored=1, runs_off_bat=1)
+    bowl(client, match, innings=1, runs_scored=4, runs_off_bat=4)
+    database.execute("UPDATE matches SET status = 'Completed', winner_id = ? WHERE id = ?",
+                     (match['teams'][0], match['id']))
+    return match
+
+
+def test_build_model_reduces_the_archive(database, client, model_path):
+    _archive(database, client)
+    result = win_probability.build_model(workers=1, path=model_path)
+    assert (result['innings'], result['balls']) == (2, 7)
+
+    model = win_probability.load_model()
+    # After each of the first five singles the innings went on to 6
+    assert model['expected_runs'][0, 0, 0, 10] == pytest.approx(3.0)
+    assert model['samples'][0, 0, 0, 10] == 5
+
+
+def test_predict(database, client, model_path):
+    assert win_probability.predict('T20', 1, 0, 0, 0) is None
+
+    _archive(database, client)
+    win_probability.build_model(workers=1, path=model_path)
+    first = win_probability.predict('T20', 1, 2, 0, 2)
+    assert first['projected_score'] == 5 and first['balls_remaining'] == 118
+    assert first['runs_required'] is None and 0 <= first['win_probability'] <= 1
+
+    chase = win_probability.predict('T20', 2, 12, 3, 40, target=50)
+    assert (chase['runs_required'], chase['balls_remaining']) == (10, 108)
+    assert win_probability.predict('T20', 2, 12, 3, 50, target=50)['win_probability'] == 1.0
+    assert win_probability.predict('T20', 2, 120, 3, 40, target=50)['win_probability'] == 0.0
+    # Unknown formats fall back to the 50 over tables
+    assert win_probability.predict('Hundred', 1, 0, 0, 0)['balls_remaining'] == 300
+
+
+def test_corrections_reach_the_cached_prediction(database, client, model_path):
+    _archive(database, client)
+    win_probability.build_model(workers=1, path=model_path)
+    match = add_match(database)
+    url = f"/api/analysis/win_probability/{match['innings'][1]}"
+
+    bowl(client, match, runs_scored=4, runs_off_bat=4)
+    six = bowl(client, match, ball_number=2, runs_scored=6, runs_off_bat=6, is_six=1)
+    bowl(client, match, innings=1)
+    assert client.get(url).get_json()['runs_required'] == 11
+
+    # A corrected first innings moves the chase's target
+    client.delete(f'/api/deliveries/{six}')
+    assert client.get(url).get_json()['runs_required'] == 5
+
+    # So does a deleted ball of the chase itself
+    chase_ball = client.get(f"/api/deliveries/innings/{match['innings'][1]}").get_json()[0]['id']
+    client.delete(f'/api/deliveries/{chase_ball}')
+    assert client.get(url).get_json()['balls_remaining'] == 120
@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+from database import Database, WriteQueue
+
+
+class DiskFullOnCommit(sqlite3.Connection):
+    """Fails every COMMIT the way SQLITE_FULL does: the transaction is already gone"""
+
+    def execute(self, sql, *args):
+        if sql == 'COMMIT':
+            super().execute('ROLLBACK')
+            raise sqlite3.OperationalError('database or disk is full')
+        return super().execute(sql, *args)
+
+
+def _add_team(name):
+    return lambda conn: conn.execute("INSERT INTO teams (name) VALUES (?)", (name,)).lastrowid
+
+
+def _teams(target):
+    return [row['name'] for row in target.fetch_all("SELECT name FROM teams ORDER BY id")]
+
+
+def test_a_failing_write_is_rolled_back_alone(database):
+    queue = WriteQueue(database, window=0.2)  # Wide enough to put every op in one batch
+
+    def fail(conn):
+        conn.execute("INSERT INTO teams (name) VALUES ('Lost')")
+        raise ValueError('bad row')
+
+    futures = [queue.submit(database, _add_team('First')), queue.submit(database, fail),
+               queue.submit(database, _add_team('Second'))]
+    assert futures[0].result(5) and futures[2].result(5)
+    with pytest.raises(ValueError):
+        futures[1].result(5)
+    assert _teams(database) == ['First', 'Second']
+
+
+def test_a_failed_commit_fails_only_that_files_writes(database, tmp_path):
+    broken = Database(db_path=str(tmp_path / 'broken.db'), shard_dir='')
+    broken.init_db()
+    broken.connection_factory = DiskFullOnCommit
+    queue = WriteQueue(database, window=0.2)
+
+    lost = [queue.submit(broken, _add_team('Lost')), queue.submit(broken, _add_team('Also lost'))]
+    kept = queue.submit(database, _add_team('Kept'))
+    for future in lost:
+        with pytest.raises(sqlite3.OperationalError, match='disk is full'):
+            future.result(5)
+    assert kept.result(5)
+    assert _teams(database) == ['Kept'] and _teams(broken) == []
+
+    # The writer carries on with the next batch
+    assert queue.submit(database, _add_team('Later')).result(5)
+    assert _teams(database) == ['Kept', 'Later']
+
+
+def test_nested_writes_from_the_writer_run_inline(database):
+    outer = database.write(lambda conn: database.write(_add_team('Inner')))
+    assert outer and _teams(database) == ['Inner']
@@ -1,15 +1,21 @@
 DROP TABLE IF EXISTS players;
 DROP TABLE IF EXISTS batting_stats;
 
-CREATE TABLE players (
+CREATE TABLE IF NOT EXISTS players (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     first_name TEXT NOT NULL,
     last_name TEXT NOT NULL,
-    role TEXT NOT NULL,
-    country TEXT NOT NULL
+    team_id INTEGER,
+    batting_style TEXT,
+    bowling_style TEXT,
+    player_role TEXT,
+    jersey_number INTEGER,
+    role TEXT,
+    country TEXT,
+    FOREIGN KEY (team_id) REFERENCES teams (id)
 );
 
-CREATE TABLE batting_stats (
+CREATE TABLE IF NOT EXISTS batting_stats (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     player_id INTEGER NOT NULL,
     runs INTEGER NOT NULL,
@@ -18,4 +24,431 @@ CREATE TABLE batting_stats (
     sixes INTEGER DEFAULT 0,
     match_date DATE DEFAULT CURRENT_DATE,
     FOREIGN KEY (player_id) REFERENCES players (id)
-);
\ No newline at end of file
+);
+
+CREATE TABLE IF NOT EXISTS teams (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    short_name TEXT,
+    logo_url TEXT
+);
+
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    match_title TEXT,
+    match_format TEXT DEFAULT 'T20',
+    team_home_id INTEGER,
+    team_away_id INTEGER,
+    venue TEXT,
+    match_date DATE,
+    toss_winner_id INTEGER,
+    toss_decision TEXT,
+    status TEXT DEFAULT 'Scheduled',
+    match_result TEXT,
+    winner_id INTEGER,
+    video_path TEXT,
+    video_duration REAL,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (team_home_id) REFERENCES teams (id),
+    FOREIGN KEY (team_away_id) REFERENCES teams (id),
+    FOREIGN KEY (winner_id) REFERENCES teams (id)
+);
+
+CREATE TABLE IF NOT EXISTS innings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    match_id INTEGER NOT NULL,
+    innings_number INTEGER NOT NULL,
+    batting_team_id INTEGER,
+    bowling_team_id INTEGER,
+    total_runs INTEGER DEFAULT 0,
+    total_wickets INTEGER DEFAULT 0,
+    total_overs REAL DEFAULT 0,
+    extras_total INTEGER DEFAULT 0,
+    extras_wides INTEGER DEFAULT 0,
+    extras_noballs INTEGER DEFAULT 0,
+    extras_byes INTEGER DEFAULT 0,
+    extras_legbyes INTEGER DEFAULT 0,
+    FOREIGN KEY (match_id) REFERENCES matches (id)
+);
+
+-- Ball-by-ball log; with DELIVERY_SHARDING each season's rows live in a
+-- shard file created from this definition (ids stay unique via sqlite_sequence).
+CREATE TABLE IF NOT EXISTS deliveries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    innings_id INTEGER NOT NULL,
+    match_id INTEGER,
+    over_number INTEGER NOT NULL,
+    ball_number INTEGER NOT NULL,
+    legal_ball_number INTEGER,
+    batsman_id INTEGER,
+    non_striker_id INTEGER,
+    bowler_id INTEGER,
+    video_timestamp_start REAL,
+    video_timestamp_end REAL,
+    video_bookmark TEXT,
+    bowling_type TEXT,
+    delivery_type TEXT,
+    line TEXT,
+    length TEXT,
+    pitch_x REAL,
+    pitch_y REAL,
+    movement TEXT,
+    pace REAL,
+    shot_type TEXT,
+    shot_connection TEXT,
+    wagon_x REAL,
+    wagon_y REAL,
+    wagon_zone TEXT,
+    runs_scored INTEGER DEFAULT 0,
+    runs_off_bat INTEGER DEFAULT 0,
+    extras INTEGER DEFAULT 0,
+    extra_type TEXT DEFAULT 'None',
+    is_boundary INTEGER DEFAULT 0,
+    is_six INTEGER DEFAULT 0,
+    is_dot INTEGER DEFAULT 0,
+    is_wicket INTEGER DEFAULT 0,
+    wicket_type TEXT,
+    fielder_id INTEGER,
+    dismissed_batsman_id INTEGER,
+    appeal INTEGER DEFAULT 0,
+    drs_review INTEGER DEFAULT 0,
+    drs_outcome TEXT,
+    control_percentage REAL,
+    is_scoring_shot INTEGER DEFAULT 0,
+    is_false_shot INTEGER DEFAULT 0,
+    is_beaten INTEGER DEFAULT 0,
+    is_play_and_miss INTEGER DEFAULT 0,
+    tags TEXT,
+    notes TEXT,
+    highlight INTEGER DEFAULT 0,
+    powerplay INTEGER DEFAULT 0,
+    phase TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (innings_id) REFERENCES innings (id),
+    FOREIGN KEY (match_id) REFERENCES matches (id)
+);
+
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    match_id INTEGER,
+    created_by TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (match_id) REFERENCES matches (id)
+);
+
+CREATE TABLE IF NOT EXISTS video_clips (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    match_id INTEGER,
+    title TEXT,
+    start_time REAL,
+    end_time REAL,
+    clip_type TEXT DEFAULT 'Custom',
+    tags TEXT,
+    description TEXT,
+    playlist_id INTEGER,
+    sort_order INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (match_id) REFERENCES matches (id),
+    FOREIGN KEY (playlist_id) REFERENCES playlists (id)
+);
+
+-- Keyset pagination: each listing's filter columns followed by its sort key
+CREATE INDEX IF NOT EXISTS idx_matches_created ON matches (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_matches_format ON matches (match_format, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_matches_status ON matches (status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_matches_venue ON matches (venue, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_matches_home ON matches (team_home_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_matches_away ON matches (team_away_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_matches_date ON matches (match_date);
+CREATE INDEX IF NOT EXISTS idx_teams_name ON teams (name, id);
+CREATE INDEX IF NOT EXISTS idx_video_clips_match ON video_clips (match_id, start_time, id);
+CREATE INDEX IF NOT EXISTS idx_playlists_match ON playlists (match_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_playlists_created ON playlists (created_at, id);
+
+-- Per-over aggregates, refreshed on every delivery write so that Manhattan,
+-- worm and run-rate charts never have to group the raw deliveries.
+CREATE TABLE IF NOT EXISTS over_summary (
+    innings_id INTEGER NOT NULL,
+    match_id INTEGER,
+    over_number INTEGER NOT NULL,
+    runs INTEGER DEFAULT 0,
+    wickets INTEGER DEFAULT 0,
+    dots INTEGER DEFAULT 0,
+    fours INTEGER DEFAULT 0,
+    sixes INTEGER DEFAULT 0,
+    extras INTEGER DEFAULT 0,
+    legal_balls INTEGER DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (innings_id, over_number),
+    FOREIGN KEY (innings_id) REFERENCES innings (id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_over_summary_match ON over_summary (match_id, innings_id, over_number);
+CREATE INDEX IF NOT EXISTS idx_deliveries_innings_over ON deliveries (innings_id, over_number);
+
+-- Bumped on every delivery write; derived data (partnerships etc.) is cached
+-- against this number and recomputed only when it moves.
+CREATE TABLE IF NOT EXISTS innings_version (
+    innings_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (innings_id) REFERENCES innings (id)
+);
+
+CREATE TABLE IF NOT EXISTS partnerships (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    innings_id INTEGER NOT NULL,
+    match_id INTEGER,
+    innings_version INTEGER NOT NULL DEFAULT 0,
+    wicket_number INTEGER NOT NULL,
+    batter1_id INTEGER,
+    batter2_id INTEGER,
+    batter1_runs INTEGER DEFAULT 0,
+    batter1_balls INTEGER DEFAULT 0,
+    batter2_runs INTEGER DEFAULT 0,
+    batter2_balls INTEGER DEFAULT 0,
+    runs INTEGER DEFAULT 0,
+    balls INTEGER DEFAULT 0,
+    extras INTEGER DEFAULT 0,
+    run_rate REAL,
+    start_delivery_id INTEGER,
+    end_delivery_id INTEGER,
+    end_wicket_type TEXT,
+    dismissed_batsman_id INTEGER,
+    unbroken INTEGER DEFAULT 0,
+    FOREIGN KEY (innings_id) REFERENCES innings (id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_partnerships_innings ON partnerships (innings_id, innings_version);
+CREATE INDEX IF NOT EXISTS idx_partnerships_runs ON partnerships (runs DESC);
+
+-- The ball-by-ball state fold of an innings as it stood before the first
+-- ball of each over (see services/match_state.py), for the innings version
+-- it was built from. seq is the number of deliveries already folded in.
+CREATE TABLE IF NOT EXISTS innings_state_checkpoints (
+    innings_id INTEGER NOT NULL,
+    over_number INTEGER NOT NULL,
+    innings_version INTEGER NOT NULL DEFAULT 0,
+    seq INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (innings_id, over_number)
+) WITHOUT ROWID;
+
+-- Sparse batter x bowler and batter x bowling type aggregates, adjusted on
+-- every delivery write so matchup grids are primary-key lookups.
+CREATE TABLE IF NOT EXISTS matchup_batter_bowler (
+    batsman_id INTEGER NOT NULL,
+    bowler_id INTEGER NOT NULL,
+    balls INTEGER DEFAULT 0,
+    runs INTEGER DEFAULT 0,
+    dismissals INTEGER DEFAULT 0,
+    dots INTEGER DEFAULT 0,
+    fours INTEGER DEFAULT 0,
+    sixes INTEGER DEFAULT 0,
+    PRIMARY KEY (batsman_id, bowler_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS matchup_batter_bowling_type (
+    batsman_id INTEGER NOT NULL,
+    bowling_type TEXT NOT NULL,
+    balls INTEGER DEFAULT 0,
+    runs INTEGER DEFAULT 0,
+    dismissals INTEGER DEFAULT 0,
+    dots INTEGER DEFAULT 0,
+    fours INTEGER DEFAULT 0,
+    sixes INTEGER DEFAULT 0,
+    PRIMARY KEY (batsman_id, bowling_type)
+) WITHOUT ROWID;
+
+-- Full-text index over delivery notes, tags and names (rowid = deliveries.id),
+-- kept in sync by the triggers below.
+CREATE VIRTUAL TABLE IF NOT EXISTS deliveries_fts USING fts5 (
+    notes, tags, shot_type, wicket_type,
+    batsman_name, bowler_name, fielder_name,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS deliveries_fts_insert AFTER INSERT ON deliveries BEGIN
+    INSERT INTO deliveries_fts (rowid, notes, tags, shot_type, wicket_type, batsman_name, bowler_name, fielder_name)
+    VALUES (
+        new.id, new.notes, new.tags, new.shot_type, new.wicket_type,
+        (SELECT first_name || ' ' || last_name FROM players WHERE id = new.batsman_id),
+        (SELECT first_name || ' ' || last_name FROM players WHERE id = new.bowler_id),
+        (SELECT first_name || ' ' || last_name FROM players WHERE id = new.fielder_id)
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS deliveries_fts_delete AFTER DELETE ON deliveries BEGIN
+    DELETE FROM deliveries_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS deliveries_fts_update
+AFTER UPDATE OF notes, tags, shot_type, wicket_type, batsman_id, bowler_id, fielder_id ON deliveries BEGIN
+    DELETE FROM deliveries_fts WHERE rowid = old.id;
+    INSERT INTO deliveries_fts (rowid, notes, tags, shot_type, wicket_type, batsman_name, bowler_name, fielder_name)
+    VALUES (
+        new.id, new.notes, new.tags, new.shot_type, new.wicket_type,
+        (SELECT first_name || ' ' || last_name FROM players WHERE id = new.batsman_id),
+        (SELECT first_name || ' ' || last_name FROM players WHERE id = new.bowler_id),
+        (SELECT first_name || ' ' || last_name FROM players WHERE id = new.fielder_id)
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS deliveries_fts_player_rename
+AFTER UPDATE OF first_name, last_name ON players BEGIN
+    DELETE FROM deliveries_fts WHERE rowid IN (
+        SELECT id FROM deliveries
+        WHERE batsman_id = new.id OR bowler_id = new.id OR fielder_id = new.id
+    );
+    INSERT INTO deliveries_fts (rowid, notes, tags, shot_type, wicket_type, batsman_name, bowler_name, fielder_name)
+    SELECT d.id, d.notes, d.tags, d.shot_type, d.wicket_type,
+        bp.first_name || ' ' || bp.last_name,
+        bwp.first_name || ' ' || bwp.last_name,
+        fp.first_name || ' ' || fp.last_name
+    FROM deliveries d
+    LEFT JOIN players bp ON d.batsman_id = bp.id
+    LEFT JOIN players bwp ON d.bowler_id = bwp.id
+    LEFT JOIN players fp ON d.fielder_id = fp.id
+    WHERE d.batsman_id = new.id OR d.bowler_id = new.id OR d.fielder_id = new.id;
+END;
+
+-- Typeahead over player names. Trigram tokens match any 3+ character
+-- substring; shorter prefixes use the NOCASE name indexes instead.
+CREATE VIRTUAL TABLE IF NOT EXISTS players_fts USING fts5 (
+    first_name, last_name,
+    content = 'players', content_rowid = 'id',
+    tokenize = 'trigram'
+);
+
+CREATE INDEX IF NOT EXISTS idx_players_first_name ON players (first_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_players_last_name ON players (last_name COLLATE NOCASE);
+
+CREATE TRIGGER IF NOT EXISTS players_fts_insert AFTER INSERT ON players BEGIN
+    INSERT INTO players_fts (rowid, first_name, last_name) VALUES (new.id, new.first_name, new.last_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS players_fts_delete AFTER DELETE ON players BEGIN
+    INSERT INTO players_fts (players_fts, rowid, first_name, last_name)
+    VALUES ('delete', old.id, old.first_name, old.last_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS players_fts_update AFTER UPDATE OF first_name, last_name ON players BEGIN
+    INSERT INTO players_fts (players_fts, rowid, first_name, last_name)
+    VALUES ('delete', old.id, old.first_name, old.last_name);
+    INSERT INTO players_fts (rowid, first_name, last_name) VALUES (new.id, new.first_name, new.last_name);
+END;
+
+-- Bumped by every player or team edit, from any process. Cached response
+-- bodies carry names, so their cache tokens include it (see responses.py).
+CREATE TABLE IF NOT EXISTS names_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO names_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS names_version_player_update AFTER UPDATE ON players BEGIN
+    UPDATE names_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS names_version_player_delete AFTER DELETE ON players BEGIN
+    UPDATE names_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS names_version_team_update AFTER UPDATE ON teams BEGIN
+    UPDATE names_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS names_version_team_delete AFTER DELETE ON teams BEGIN
+    UPDATE names_version SET version = version + 1 WHERE id = 1;
+END;
+
+-- Delivery video windows found by scene-change detection, waiting for an
+-- analyst to confirm them onto deliveries.video_timestamp_start/end.
+CREATE TABLE IF NOT EXISTS video_timestamp_suggestions (
+    delivery_id INTEGER PRIMARY KEY,
+    match_id INTEGER NOT NULL,
+    innings_id INTEGER,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    confidence REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_video_suggestions_match ON video_timestamp_suggestions (match_id, start_time);
+
+-- Rollups of finished matches (services/rollup_cube.py). rollup_match_cells
+-- holds each match reduced per innings and phase ('All' = the whole
+-- innings); rollup_cube is their sum per dimension combination.
+CREATE TABLE IF NOT EXISTS rollup_match_cells (
+    match_id INTEGER NOT NULL,
+    venue TEXT NOT NULL,
+    season INTEGER NOT NULL,
+    match_format TEXT NOT NULL,
+    batting_team_id INTEGER NOT NULL,
+    phase TEXT NOT NULL,
+    innings_number INTEGER NOT NULL,
+    innings INTEGER DEFAULT 0,
+    runs INTEGER DEFAULT 0,
+    balls INTEGER DEFAULT 0,
+    wickets INTEGER DEFAULT 0,
+    boundaries INTEGER DEFAULT 0,
+    dots INTEGER DEFAULT 0,
+    extras INTEGER DEFAULT 0,
+    PRIMARY KEY (match_id, innings_number, phase)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_cube (
+    venue TEXT NOT NULL,
+    season INTEGER NOT NULL,
+    match_format TEXT NOT NULL,
+    batting_team_id INTEGER NOT NULL,
+    phase TEXT NOT NULL,
+    innings_number INTEGER NOT NULL,
+    innings INTEGER DEFAULT 0,
+    runs INTEGER DEFAULT 0,
+    balls INTEGER DEFAULT 0,
+    wickets INTEGER DEFAULT 0,
+    boundaries INTEGER DEFAULT 0,
+    dots INTEGER DEFAULT 0,
+    extras INTEGER DEFAULT 0,
+    PRIMARY KEY (venue, season, match_format, batting_team_id, phase, innings_number)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_rollup_cube_season ON rollup_cube (season, phase);
+
+-- Sum of the innings versions each match was reduced at, to spot corrections
+CREATE TABLE IF NOT EXISTS rollup_matches (
+    match_id INTEGER PRIMARY KEY,
+    versions INTEGER NOT NULL DEFAULT 0
+);
+
+-- Player totals per leaderboard scope (services/leaderboards.py): a season
+-- and match format, with season 0 / format '' for all of them. Adjusted on
+-- every delivery write; each leaderboard metric has an index in its order so
+-- the top N of a scope is read off the front of it.
+CREATE TABLE IF NOT EXISTS leaderboard_totals (
+    season INTEGER NOT NULL,
+    match_format TEXT NOT NULL,
+    player_id INTEGER NOT NULL,
+    bat_runs INTEGER DEFAULT 0,
+    bat_balls INTEGER DEFAULT 0,
+    bat_dismissals INTEGER DEFAULT 0,
+    bat_fours INTEGER DEFAULT 0,
+    bat_sixes INTEGER DEFAULT 0,
+    bowl_balls INTEGER DEFAULT 0,
+    bowl_runs INTEGER DEFAULT 0,
+    bowl_wickets INTEGER DEFAULT 0,
+    bowl_dots INTEGER DEFAULT 0,
+    PRIMARY KEY (season, match_format, player_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_leaderboard_runs ON leaderboard_totals (season, match_format, bat_runs DESC, player_id);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_sixes ON leaderboard_totals (season, match_format, bat_sixes DESC, player_id);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_strike_rate ON leaderboard_totals (season, match_format, (bat_runs * 100.0 / bat_balls) DESC, player_id);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_wickets ON leaderboard_totals (season, match_format, bowl_wickets DESC, player_id);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_economy ON leaderboard_totals (season, match_format, (bowl_runs * 6.0 / bowl_balls), player_id);